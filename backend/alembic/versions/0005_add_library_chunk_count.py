@@ -0,0 +1,37 @@
+"""Track per-library chunk counts for retrieval planning."""
+
+from alembic import op
+
+
+revision = "0005_add_library_chunk_count"
+down_revision = "0004_add_user_auth_session_nonce"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE library
+          ADD COLUMN IF NOT EXISTS chunk_count BIGINT NOT NULL DEFAULT 0;
+
+        UPDATE library AS l
+          SET chunk_count = s.n
+        FROM (
+          SELECT d.library_id, count(*) AS n
+          FROM document_chunk c
+          JOIN library_document d ON d.id = c.document_id
+          GROUP BY d.library_id
+        ) AS s
+        WHERE s.library_id = l.id;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE library
+          DROP COLUMN IF EXISTS chunk_count;
+        """
+    )
@@ -0,0 +1,37 @@
+"""Store content hashes on documents and chunks for incremental reindexing."""
+
+from alembic import op
+
+
+revision = "0006_add_content_hashes"
+down_revision = "0005_add_library_chunk_count"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE library_document
+          ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+        ALTER TABLE document_chunk
+          ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+        UPDATE document_chunk
+          SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+        WHERE content_hash IS NULL;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE document_chunk
+          DROP COLUMN IF EXISTS content_hash;
+
+        ALTER TABLE library_document
+          DROP COLUMN IF EXISTS content_hash;
+        """
+    )
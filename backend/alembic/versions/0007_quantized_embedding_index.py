@@ -0,0 +1,68 @@
+"""Opt-in halfvec / binary-quantized HNSW index on document_chunk.embedding.
+
+Select the mode with ``alembic -x embedding_index=halfvec upgrade head`` (or
+``EMBEDDING_INDEX_MODE``); the default ``full`` leaves the float32 index as is.
+Quantized modes replace it with an expression index over the quantized
+embedding while full vectors stay in the table for rescoring. To switch modes
+later, downgrade to 0006 and upgrade again with the new mode.
+"""
+
+import os
+
+from alembic import context, op
+
+
+revision = "0007_quantized_embedding_index"
+down_revision = "0006_add_content_hashes"
+branch_labels = None
+depends_on = None
+
+_QUANTIZED_INDEXES = {
+    "halfvec": """
+        CREATE INDEX IF NOT EXISTS idx_document_chunk_embedding_halfvec_hnsw
+          ON document_chunk USING hnsw ((embedding::halfvec(768)) halfvec_cosine_ops);
+    """,
+    "binary": """
+        CREATE INDEX IF NOT EXISTS idx_document_chunk_embedding_binary_hnsw
+          ON document_chunk USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops);
+    """,
+}
+
+
+def _mode() -> str:
+    mode = (
+        context.get_x_argument(as_dictionary=True).get("embedding_index")
+        or os.getenv("EMBEDDING_INDEX_MODE")
+        or "full"
+    )
+    if mode != "full" and mode not in _QUANTIZED_INDEXES:
+        raise ValueError(f"unknown embedding_index mode: {mode}")
+    return mode
+
+
+def upgrade() -> None:
+    mode = _mode()
+    if mode == "full":
+        return
+    op.execute(
+        _QUANTIZED_INDEXES[mode]
+        + """
+        DROP INDEX IF EXISTS idx_document_chunk_embedding_hnsw;
+
+        ANALYZE document_chunk;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_document_chunk_embedding_hnsw
+          ON document_chunk USING hnsw (embedding vector_cosine_ops);
+
+        DROP INDEX IF EXISTS idx_document_chunk_embedding_halfvec_hnsw;
+        DROP INDEX IF EXISTS idx_document_chunk_embedding_binary_hnsw;
+
+        ANALYZE document_chunk;
+        """
+    )
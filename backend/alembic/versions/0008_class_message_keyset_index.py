@@ -0,0 +1,35 @@
+"""Composite index for keyset pagination of room messages."""
+
+from alembic import op
+
+
+revision = "0008_class_message_keyset_index"
+down_revision = "0007_quantized_embedding_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_class_message_room_created_id
+          ON class_message (class_room_id, created_at DESC, id DESC);
+
+        -- Both are leading prefixes of the index above.
+        DROP INDEX IF EXISTS idx_class_message_room;
+        DROP INDEX IF EXISTS idx_class_message_room_created;
+
+        ANALYZE class_message;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_class_message_room
+          ON class_message (class_room_id);
+
+        DROP INDEX IF EXISTS idx_class_message_room_created_id;
+        """
+    )
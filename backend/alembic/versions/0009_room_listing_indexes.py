@@ -0,0 +1,30 @@
+"""Indexes for listing the rooms a user created or belongs to."""
+
+from alembic import op
+
+
+revision = "0009_room_listing_indexes"
+down_revision = "0008_class_message_keyset_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_class_room_member_user
+          ON class_room_member (user_id);
+
+        CREATE INDEX IF NOT EXISTS idx_class_room_creator_created
+          ON class_room (created_by_user_id, created_at DESC);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP INDEX IF EXISTS idx_class_room_creator_created;
+        DROP INDEX IF EXISTS idx_class_room_member_user;
+        """
+    )
@@ -0,0 +1,33 @@
+"""Index replies by parent on the (created_at, id) keyset for thread reads."""
+
+from alembic import op
+
+
+revision = "0010_class_message_thread_index"
+down_revision = "0009_room_listing_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_class_message_parent_created_id
+          ON class_message (parent_id, created_at, id)
+          WHERE parent_id IS NOT NULL;
+
+        DROP INDEX IF EXISTS idx_class_message_parent;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_class_message_parent
+          ON class_message (parent_id, created_at)
+          WHERE parent_id IS NOT NULL;
+
+        DROP INDEX IF EXISTS idx_class_message_parent_created_id;
+        """
+    )
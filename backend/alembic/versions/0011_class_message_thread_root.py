@@ -0,0 +1,51 @@
+"""Materialize each reply's thread root and depth so thread pages are index range scans."""
+
+from alembic import op
+
+
+revision = "0011_class_message_thread_root"
+down_revision = "0010_class_message_thread_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE class_message
+          ADD COLUMN IF NOT EXISTS thread_root_id uuid REFERENCES class_message(id) ON DELETE CASCADE,
+          ADD COLUMN IF NOT EXISTS thread_depth integer NOT NULL DEFAULT 0;
+
+        WITH RECURSIVE tree AS (
+          SELECT id, id AS root_id, 0 AS depth
+            FROM class_message
+           WHERE parent_id IS NULL
+          UNION ALL
+          SELECT m.id, tree.root_id, tree.depth + 1
+            FROM class_message AS m
+            JOIN tree ON m.parent_id = tree.id
+        )
+        UPDATE class_message AS m
+           SET thread_root_id = tree.root_id,
+               thread_depth = tree.depth
+          FROM tree
+         WHERE m.id = tree.id
+           AND tree.depth > 0;
+
+        CREATE INDEX IF NOT EXISTS idx_class_message_thread_root_created_id
+          ON class_message (thread_root_id, created_at, id)
+          WHERE thread_root_id IS NOT NULL;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP INDEX IF EXISTS idx_class_message_thread_root_created_id;
+
+        ALTER TABLE class_message
+          DROP COLUMN IF EXISTS thread_depth,
+          DROP COLUMN IF EXISTS thread_root_id;
+        """
+    )
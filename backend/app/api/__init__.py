@@ -4,7 +4,8 @@
 from fastapi import APIRouter, Depends
 
 from ..core.csrf import require_csrf
-from . import auth, health, libraries, models, ollama_proxy, prompts, rooms, tools
+from ..core.settings import get_settings
+from . import auth, health, libraries, models, ollama_proxy, prompts, rooms, rooms_async, tools
 
 api_router = APIRouter()
 api_router.include_router(health.router, prefix="/health", tags=["health"])
@@ -13,5 +14,13 @@ api_router.include_router(tools.router, dependencies=[Depends(require_csrf)])
 api_router.include_router(models.router, dependencies=[Depends(require_csrf)])
 api_router.include_router(prompts.router, dependencies=[Depends(require_csrf)])
 api_router.include_router(libraries.router, dependencies=[Depends(require_csrf)])
+if get_settings().database_async:
+    # Registered first so these routes shadow their sync twins; the sync ones
+    # stay in the OpenAPI schema since the contract is identical.
+    api_router.include_router(
+        rooms_async.router,
+        dependencies=[Depends(require_csrf)],
+        include_in_schema=False,
+    )
 api_router.include_router(rooms.router, dependencies=[Depends(require_csrf)])
 api_router.include_router(ollama_proxy.router, dependencies=[Depends(require_csrf)])
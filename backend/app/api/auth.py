@@ -8,8 +8,11 @@ from typing import Final
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from ..core.security import utc_now_ms, verify_password
+from ..core.rate_limit import get_login_limiters
+from ..core.security import PasswordHasherBusy, get_password_hasher, utc_now_ms
+from ..core.session_cache import get_session_cache
 from ..core.settings import get_settings
 from ..db.models import UserAuth
 from ..db.session import get_db
@@ -17,11 +20,11 @@ from .deps import get_current_user
 
 router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 
-_MAX_FAILED_ATTEMPTS: Final[int] = 5
-_LOCKOUT_DURATION_MS: Final[int] = 15 * 60 * 1000  # 15 minutes
-
 settings = get_settings()
 
+_MAX_FAILED_ATTEMPTS: Final[int] = settings.login_max_failed_attempts
+_LOCKOUT_DURATION_MS: Final[int] = settings.login_lockout_seconds * 1000
+
 
 class LoginRequest(BaseModel):
     email: EmailStr
@@ -41,21 +44,82 @@ class MeResponse(BaseModel):
     requires_password_change: bool
 
 
+def _find_user(db: Session, email: str) -> UserAuth | None:
+    return db.query(UserAuth).filter(UserAuth.email == email).one_or_none()
+
+
+def _lock_account(db: Session, user: UserAuth, now_ms: int) -> None:
+    user.locked_until = now_ms + _LOCKOUT_DURATION_MS
+    user.failed_attempts = 0
+    user.updated_at = now_ms
+    db.commit()
+
+
+def _record_failed_login(db: Session, user: UserAuth, now_ms: int) -> None:
+    """Count a failure on the row; only used when Redis throttling is unavailable."""
+
+    failed_attempts = (user.failed_attempts or 0) + 1
+    user.failed_attempts = failed_attempts
+    if failed_attempts >= _MAX_FAILED_ATTEMPTS:
+        user.locked_until = now_ms + _LOCKOUT_DURATION_MS
+        user.failed_attempts = 0
+    user.updated_at = now_ms
+    db.commit()
+
+
+def _record_login(db: Session, user: UserAuth, now_ms: int, new_hash: str | None) -> str:
+    """Reset counters, store an upgraded hash if any, and rotate the session nonce."""
+
+    user.failed_attempts = 0
+    user.locked_until = None
+    user.last_login_at = now_ms
+    user.updated_at = now_ms
+    if new_hash is not None:
+        user.password = new_hash
+    new_session_nonce = secrets.token_hex(16)
+    user.session_nonce = new_session_nonce
+    db.commit()
+    # Reload here so the async caller never triggers a lazy refresh on the event loop.
+    db.refresh(user)
+    get_session_cache().remember(user.id, new_session_nonce)
+    return new_session_nonce
+
+
 @router.post("/login", response_model=LoginResponse)
-def login(
+async def login(
     payload: LoginRequest,
     request: Request,
     response: Response,
     db: Session = Depends(get_db),
 ) -> LoginResponse:
-    """Authenticate a user with email/password and start a session."""
+    """Authenticate a user with email/password and start a session.
+
+    Attempts per client IP and per email are throttled in Redis before any
+    database or bcrypt work. The email attempt is recorded before the
+    password is checked and cleared on success, so parallel guesses cannot
+    all get past the limit; only the lockout itself is written to
+    ``user_auth``. Database work runs on the default threadpool and bcrypt on
+    the bounded password hashing pool.
+    """
 
     normalized_email = payload.email.strip().lower()
-    user = (
-        db.query(UserAuth)
-        .filter(UserAuth.email == normalized_email)
-        .one_or_none()
-    )
+    limiters = get_login_limiters()
+    attempt = await limiters.by_ip.hit(limiters.client_address(request))
+    if attempt is not None and attempt.limited:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="too_many_attempts",
+            headers={"Retry-After": str(attempt.retry_after)},
+        )
+    email_attempt = await limiters.by_email.hit(normalized_email)
+    if email_attempt is not None and email_attempt.limited:
+        raise HTTPException(
+            status_code=status.HTTP_423_LOCKED,
+            detail="account_locked",
+            headers={"Retry-After": str(email_attempt.retry_after)},
+        )
+
+    user = await run_in_threadpool(_find_user, db, normalized_email)
 
     # Always return the same error for unknown users.
     if user is None or not user.is_active:
@@ -72,27 +136,32 @@ def login(
             detail="account_locked",
         )
 
-    if not verify_password(payload.password, user.password):
-        failed_attempts = (user.failed_attempts or 0) + 1
-        user.failed_attempts = failed_attempts
-        if failed_attempts >= _MAX_FAILED_ATTEMPTS:
-            user.locked_until = now_ms + _LOCKOUT_DURATION_MS
-            user.failed_attempts = 0
-        user.updated_at = now_ms
-        db.commit()
+    try:
+        verified, new_hash = await get_password_hasher().verify_and_update(
+            payload.password, user.password
+        )
+    except PasswordHasherBusy as exc:
+        # Not a guess: the password was never checked.
+        await limiters.by_email.undo(normalized_email, email_attempt)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="login_busy",
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+
+    if not verified:
+        if email_attempt is None:
+            await run_in_threadpool(_record_failed_login, db, user, now_ms)
+        elif email_attempt.count >= _MAX_FAILED_ATTEMPTS:
+            await run_in_threadpool(_lock_account, db, user, now_ms)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="invalid_credentials",
         )
 
+    await limiters.by_email.reset(normalized_email)
     # Successful login: reset counters, rotate nonce, and establish session.
-    user.failed_attempts = 0
-    user.locked_until = None
-    user.last_login_at = now_ms
-    user.updated_at = now_ms
-    new_session_nonce = secrets.token_hex(16)
-    user.session_nonce = new_session_nonce
-    db.commit()
+    new_session_nonce = await run_in_threadpool(_record_login, db, user, now_ms, new_hash)
 
     request.session.clear()
     request.session["user_id"] = user.id
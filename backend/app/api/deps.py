@@ -3,11 +3,14 @@
 from __future__ import annotations
 
 from fastapi import Depends, Header, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..core.session_cache import get_session_cache
 from ..core.settings import get_settings
 from ..db.models import UserAuth
-from ..db.session import get_db
+from ..db.session import get_async_db, get_db
 
 
 def get_current_user(
@@ -17,16 +20,47 @@ def get_current_user(
 ) -> str:
     """Resolve the authenticated user id from the session or dev overrides."""
 
-    settings = get_settings()
+    session_user = request.session.get("user_id")
+    session_nonce = request.session.get("nv")
+    if session_user and session_nonce:
+        # Cached nonces are invalidated on login, so this rarely reaches the database.
+        def load_nonce() -> str | None:
+            return db.execute(
+                select(UserAuth.session_nonce).where(UserAuth.id == session_user)
+            ).scalar()
+
+        if get_session_cache().validate(session_user, session_nonce, load_nonce):
+            return session_user
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="unauthenticated")
+
+    return _dev_user(dev_user_id_header)
+
+
+async def get_current_user_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    dev_user_id_header: str | None = Header(None, alias="X-Dev-User-Id"),
+) -> str:
+    """:func:`get_current_user` for routes on the async engine; never leaves the event loop."""
 
     session_user = request.session.get("user_id")
     session_nonce = request.session.get("nv")
     if session_user and session_nonce:
-        user = db.query(UserAuth).filter(UserAuth.id == session_user).one_or_none()
-        if user and user.session_nonce == session_nonce:
+
+        async def load_nonce() -> str | None:
+            return (
+                await db.execute(select(UserAuth.session_nonce).where(UserAuth.id == session_user))
+            ).scalar()
+
+        if await get_session_cache().validate_async(session_user, session_nonce, load_nonce):
             return session_user
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="unauthenticated")
 
+    return _dev_user(dev_user_id_header)
+
+
+def _dev_user(dev_user_id_header: str | None) -> str:
+    settings = get_settings()
     if settings.allow_dev_override:
         fallback_user = dev_user_id_header or settings.dev_user_id
         if fallback_user:
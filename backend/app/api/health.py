@@ -5,6 +5,18 @@ import os
 
 from fastapi import APIRouter
 
+from ..core.admission import get_ollama_admission
+from ..core.embedding_cache import get_embedding_cache
+from ..core.embeddings import get_embedding_batcher
+from ..core.ollama_pool import get_ollama_pool
+from ..core.rate_limit import get_login_limiters
+from ..core.room_events import get_room_event_hub
+from ..core.security import get_password_hasher
+from ..core.session_cache import get_session_cache
+from ..core.settings import get_settings
+from ..db.session import async_pool_telemetry, pool_telemetry
+from ..services.read_receipts import get_read_receipt_buffer
+
 router = APIRouter()
 
 
@@ -21,3 +33,39 @@ def schema_health() -> dict[str, str | None]:
 @router.get("/live", summary="Simple liveness probe")
 def live() -> dict[str, str]:
     return {"status": "alive"}
+
+
+@router.get("/ollama", summary="Ollama admission and upstream metrics for this worker")
+async def ollama_health() -> dict[str, object]:
+    # Async so the snapshot is taken on the event loop that mutates the queue.
+    return {
+        "admission": get_ollama_admission().snapshot(),
+        "upstreams": get_ollama_pool().snapshot(),
+        "embedding_batcher": get_embedding_batcher().snapshot(),
+        "embedding_cache": get_embedding_cache().snapshot(),
+    }
+
+
+@router.get("/rooms", summary="Room event stream and read receipt metrics for this worker")
+async def rooms_health() -> dict[str, object]:
+    return {
+        "events": get_room_event_hub().snapshot(),
+        "read_receipts": get_read_receipt_buffer().snapshot(),
+    }
+
+
+@router.get("/sessions", summary="Session cache, password hashing and login throttling metrics for this worker")
+async def sessions_health() -> dict[str, object]:
+    return {
+        "nonce_cache": get_session_cache().snapshot(),
+        "password_hasher": get_password_hasher().snapshot(),
+        "login_limits": get_login_limiters().snapshot(),
+    }
+
+
+@router.get("/database", summary="Connection pool metrics for this worker")
+async def database_health() -> dict[str, object]:
+    pools = {"sync": pool_telemetry.snapshot()}
+    if get_settings().database_async:
+        pools["async"] = async_pool_telemetry.snapshot()
+    return {"pools": pools}
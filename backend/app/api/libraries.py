@@ -1,21 +1,36 @@
-"""Library endpoints: list/add for user libraries."""
+"""Library endpoints: list/add for user libraries and hybrid search."""
 
 from __future__ import annotations
 
+import logging
+import shutil
+import time
 import uuid
+from pathlib import Path
 from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile, status
+from pydantic import BaseModel, Field
+import httpx
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from ..db.models import Library
+from ..core.admission import AdmissionRejected
+from ..core.embeddings import embed_texts
+from ..core.settings import get_settings
+from ..db.models import ClassKnowledge, ClassRoom, ClassRoomMember, Library, LibraryDocument
 from ..db.session import get_db
+from ..services.ingestion import IngestInProgress, ingest_document, ingest_running
+from ..services.reindex import reindex_document
+from ..services.retrieval import hybrid_search
 from .deps import get_current_user
 
 
 router = APIRouter(prefix="/api/v1/libraries", tags=["libraries"])
 
+logger = logging.getLogger(__name__)
+
 
 class LibraryIn(BaseModel):
     name: str
@@ -83,3 +98,311 @@ def create_library(
         data=lib.data or {},
         meta=lib.meta or {},
     )
+
+
+class SearchIn(BaseModel):
+    query: str = Field(..., min_length=1)
+    library_ids: list[str] = Field(default_factory=list)
+    class_room_id: Optional[str] = None
+    k: int = Field(10, ge=1, le=100)
+
+
+class SearchHitOut(BaseModel):
+    chunk_id: str
+    document_id: str
+    library_id: str
+    chunk_index: int
+    content: str
+    score: float
+    vector_rank: int | None = None
+    vector_distance: float | None = None
+    text_rank: int | None = None
+    text_score: float | None = None
+
+
+class SearchOut(BaseModel):
+    query: str
+    library_ids: list[str]
+    hits: list[SearchHitOut]
+    timings_ms: Dict[str, float]
+    vector_strategy: Optional[str] = None
+    vector_ef_search: Optional[int] = None
+    vector_index: Optional[str] = None
+    scoped_chunks: Optional[int] = None
+
+
+def _searchable_library_ids(db: Session, user_id: str, payload: SearchIn) -> list[str]:
+    """Requested libraries the user owns, plus knowledge attached to an accessible room."""
+
+    allowed: set[str] = set()
+    if payload.library_ids:
+        allowed.update(
+            lib_id
+            for (lib_id,) in db.query(Library.id)
+            .filter(Library.user_id == user_id)
+            .filter(Library.id.in_(payload.library_ids))
+        )
+
+    if payload.class_room_id:
+        member = (
+            db.query(ClassRoomMember.user_id)
+            .filter(
+                ClassRoomMember.class_room_id == ClassRoom.id,
+                ClassRoomMember.user_id == user_id,
+            )
+            .exists()
+        )
+        room_libraries = (
+            db.query(ClassKnowledge.library_id)
+            .join(ClassRoom, ClassRoom.id == ClassKnowledge.class_room_id)
+            .filter(ClassKnowledge.class_room_id == payload.class_room_id)
+            .filter(or_(ClassRoom.created_by_user_id == user_id, member))
+        )
+        if payload.library_ids:
+            room_libraries = room_libraries.filter(
+                ClassKnowledge.library_id.in_(payload.library_ids)
+            )
+        allowed.update(lib_id for (lib_id,) in room_libraries)
+
+    return sorted(allowed)
+
+
+@router.post("/search", response_model=SearchOut)
+async def search_libraries(
+    payload: SearchIn,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> SearchOut:
+    """Hybrid ANN + full-text search over chunks, fused with reciprocal rank fusion."""
+
+    settings = get_settings()
+    library_ids = await run_in_threadpool(_searchable_library_ids, db, user_id, payload)
+    # Each search leg checks out its own connection; return this one first.
+    await run_in_threadpool(db.close)
+    if not library_ids:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "library_not_found")
+
+    embed_started = time.perf_counter()
+    try:
+        query_vector: list[float] | None = (await embed_texts([payload.query]))[0]
+    except (AdmissionRejected, httpx.HTTPError, ValueError):
+        # Degrade to keyword-only retrieval rather than failing the request.
+        query_vector = None
+    embed_ms = (time.perf_counter() - embed_started) * 1000
+
+    result = await hybrid_search(
+        library_ids,
+        payload.query,
+        query_vector,
+        k=payload.k,
+        candidates=payload.k * settings.retrieval_candidate_multiplier,
+        rrf_k=settings.retrieval_rrf_k,
+    )
+    plan = result.vector_plan
+    return SearchOut(
+        query=payload.query,
+        library_ids=library_ids,
+        hits=[SearchHitOut(**vars(chunk)) for chunk in result.chunks],
+        timings_ms={"embed_ms": round(embed_ms, 3), **result.timings_ms},
+        vector_strategy=plan.strategy if plan else None,
+        vector_ef_search=plan.ef_search if plan else None,
+        vector_index=plan.index if plan else None,
+        scoped_chunks=plan.scoped_chunks if plan else None,
+    )
+
+
+class DocumentOut(BaseModel):
+    id: str
+    library_id: str
+    title: Optional[str] = None
+    status: str
+
+
+def _require_owned_library(db: Session, library_id: str, user_id: str) -> Library:
+    lib = (
+        db.query(Library)
+        .filter(Library.id == library_id, Library.user_id == user_id)
+        .first()
+    )
+    if not lib:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "library_not_found")
+    return lib
+
+
+def _get_document(db: Session, library_id: str, document_id: str) -> LibraryDocument:
+    document = (
+        db.query(LibraryDocument)
+        .filter(LibraryDocument.id == document_id, LibraryDocument.library_id == library_id)
+        .first()
+    )
+    if not document:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "document_not_found")
+    return document
+
+
+def _spool_target(document_id: str, filename: str | None) -> Path:
+    upload_dir = Path(get_settings().ingest_upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    suffix = Path(filename or "").suffix.lower()
+    return upload_dir / f"{document_id}-{uuid.uuid4().hex[:8]}{suffix}"
+
+
+def _spool(upload: UploadFile, target: Path) -> None:
+    # Copy in fixed-size blocks: large uploads go disk to disk, never into RAM.
+    with target.open("wb") as out:
+        shutil.copyfileobj(upload.file, out, 1024 * 1024)
+
+
+def _create_document(
+    db: Session,
+    document_id: str,
+    library_id: str,
+    upload: UploadFile,
+    target: Path,
+) -> LibraryDocument:
+    _spool(upload, target)
+    document = LibraryDocument(
+        id=document_id,
+        library_id=library_id,
+        source="upload",
+        uri=str(target),
+        title=upload.filename,
+        meta={
+            "content_type": upload.content_type,
+            "size_bytes": target.stat().st_size,
+            "ingest": {"status": "queued"},
+        },
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+async def _ingest_in_background(document_id: str, path: Path) -> None:
+    try:
+        await ingest_document(document_id, path)
+    except IngestInProgress:
+        # The run that holds the document cleans up the spooled file.
+        logger.info("library_document %s is already being ingested", document_id)
+        return
+    except Exception:
+        # The spooled file is kept so the ingest endpoint can resume later.
+        logger.exception("ingestion failed for library_document %s", document_id)
+        return
+    path.unlink(missing_ok=True)
+
+
+@router.post(
+    "/{library_id}/documents",
+    response_model=DocumentOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def upload_document(
+    library_id: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> DocumentOut:
+    """Store an upload and ingest it (parse, chunk, embed, insert) in the background."""
+
+    await run_in_threadpool(_require_owned_library, db, library_id, user_id)
+
+    document_id = str(uuid.uuid4())
+    target = _spool_target(document_id, file.filename)
+    document = await run_in_threadpool(_create_document, db, document_id, library_id, file, target)
+
+    background_tasks.add_task(_ingest_in_background, document_id, target)
+    return DocumentOut(
+        id=document.id,
+        library_id=library_id,
+        title=document.title,
+        status="queued",
+    )
+
+
+def _replace_source(
+    db: Session,
+    library_id: str,
+    document_id: str,
+    upload: UploadFile,
+    target: Path,
+) -> LibraryDocument:
+    document = _get_document(db, library_id, document_id)
+    _spool(upload, target)
+    meta = dict(document.meta or {})
+    meta.update(content_type=upload.content_type, size_bytes=target.stat().st_size)
+    document.meta = meta
+    document.uri = str(target)
+    db.commit()
+    return document
+
+
+async def _reindex_in_background(document_id: str, path: Path) -> None:
+    try:
+        await reindex_document(document_id, path)
+    except Exception:
+        logger.exception("reindex failed for library_document %s", document_id)
+        return
+    path.unlink(missing_ok=True)
+
+
+@router.put(
+    "/{library_id}/documents/{document_id}",
+    response_model=DocumentOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def replace_document(
+    library_id: str,
+    document_id: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> DocumentOut:
+    """Replace a document's source; only chunks whose text changed are re-embedded."""
+
+    await run_in_threadpool(_require_owned_library, db, library_id, user_id)
+    target = _spool_target(document_id, file.filename)
+    document = await run_in_threadpool(
+        _replace_source, db, library_id, document_id, file, target
+    )
+
+    background_tasks.add_task(_reindex_in_background, document_id, target)
+    return DocumentOut(
+        id=document.id,
+        library_id=library_id,
+        title=document.title,
+        status="queued",
+    )
+
+
+@router.post(
+    "/{library_id}/documents/{document_id}/ingest",
+    response_model=DocumentOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def resume_ingestion(
+    library_id: str,
+    document_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> DocumentOut:
+    """Resume an interrupted ingestion after the last committed chunk."""
+
+    _require_owned_library(db, library_id, user_id)
+    document = _get_document(db, library_id, document_id)
+    source = Path(document.uri or "")
+    if not document.uri or not source.is_file():
+        raise HTTPException(status.HTTP_409_CONFLICT, "document_source_unavailable")
+    if ingest_running(dict((document.meta or {}).get("ingest") or {})):
+        raise HTTPException(status.HTTP_409_CONFLICT, "ingest_in_progress")
+
+    background_tasks.add_task(_ingest_in_background, document_id, source)
+    return DocumentOut(
+        id=document.id,
+        library_id=library_id,
+        title=document.title,
+        status="queued",
+    )
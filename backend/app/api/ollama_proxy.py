@@ -2,51 +2,294 @@
 
 from __future__ import annotations
 
+import json
+import time
+import uuid
+from typing import AsyncIterator
+
 from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 import httpx
 
-from ..core.settings import get_settings
+from ..core.admission import AdmissionRejected, AdmissionTicket, get_ollama_admission
+from ..core.embeddings import get_embedding_batcher
+from ..core.ollama_client import get_ollama_client
+from ..core.ollama_pool import UpstreamNode, get_ollama_pool, normalize_model_name
+from ..db.session import SessionLocal
+from .rooms import _room_access_statement
 
 
 router = APIRouter(prefix="/api/v1/ollama", tags=["ollama"])
 
+_FORWARDED_RESPONSE_HEADERS = {"content-type", "content-length", "content-encoding"}
+_ROOM_HEADER = "X-Class-Room-Id"
+_STRIPPED_REQUEST_HEADERS = {"host", "content-length", _ROOM_HEADER.lower()}
+# Endpoints that occupy model compute; metadata calls such as /api/tags bypass the queue.
+_ADMITTED_PATHS = {"generate", "chat", "embed", "embeddings"}
+# Request field holding the text(s) to embed, per embedding endpoint.
+_EMBEDDING_INPUT_FIELDS = {"embed": "input", "embeddings": "prompt"}
 
-@router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
-async def proxy_ollama(path: str, request: Request) -> Response:
-    """Forward arbitrary requests to the configured Ollama host."""
 
-    settings = get_settings()
-    upstream = settings.ollama_host.rstrip("/")
-    target_url = f"{upstream}/api/{path}" if path else f"{upstream}/api"
+def _can_use_room(room_id: str, user_id: str) -> bool:
+    with SessionLocal() as db:
+        row = db.execute(_room_access_statement(room_id, user_id)).first()
+    if row is None:
+        return False
+    room, is_member = row
+    return room.created_by_user_id == user_id or bool(is_member)
+
 
+def _parse_room_id(value: str | None) -> str | None:
+    """Return the header's room id in canonical form, or None if it is not a UUID."""
+
+    if not value:
+        return None
     try:
-        async with httpx.AsyncClient(timeout=None) as client:
-            upstream_response = await client.request(
-                request.method,
-                target_url,
-                headers={
-                    k: v
-                    for k, v in request.headers.items()
-                    if k.lower() not in {"host", "content-length"}
-                },
-                params=dict(request.query_params),
-                content=await request.body(),
-            )
-    except httpx.HTTPError as exc:  # pragma: no cover - network failure path
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
+
+
+async def _fairness_keys(request: Request) -> tuple[str, str]:
+    """Return the (user, room) keys used to share Ollama capacity fairly.
+
+    The room header is only honoured for signed-in members of that room;
+    otherwise a client could spread its requests across arbitrary room keys
+    (or crowd into someone else's) to game the round-robin.
+    """
+
+    user_id = request.session.get("user_id")
+    user_key = user_id or (f"ip:{request.client.host}" if request.client else "anonymous")
+    room_id = _parse_room_id(request.headers.get(_ROOM_HEADER))
+    if room_id and user_id and await run_in_threadpool(_can_use_room, room_id, user_id):
+        return user_key, room_id
+    return user_key, f"user:{user_key}"
+
+
+async def _relay(upstream_response: httpx.Response) -> AsyncIterator[bytes]:
+    """Yield upstream bytes as they arrive, closing the upstream on exit.
+
+    Each chunk is only pulled from Ollama after the previous one has been
+    handed to the ASGI server, so a slow client applies backpressure all the
+    way to the upstream socket and memory per request stays bounded by a
+    single read. If the client disconnects, Starlette cancels this generator
+    and the ``finally`` block aborts the upstream generation.
+    """
+
+    try:
+        async for chunk in upstream_response.aiter_raw():
+            yield chunk
+    finally:
+        await upstream_response.aclose()
+
+
+def _requested_model(body: bytes) -> str | None:
+    """Return the normalized ``model`` field of a JSON request body, if any."""
+
+    if not body:
+        return None
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    model = payload.get("model") if isinstance(payload, dict) else None
+    return normalize_model_name(model) if isinstance(model, str) and model else None
+
+
+async def _embed_batched(path: str, body: bytes) -> Response | None:
+    """Serve an embedding call through the shared batcher.
+
+    Returns None when the body is not a plain text embedding request, in which
+    case the caller falls back to forwarding it untouched. Legacy
+    ``/api/embeddings`` calls are answered from batched ``/api/embed``
+    results, which Ollama L2-normalizes; cosine scores are unaffected.
+    """
+
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("model"), str):
+        return None
+
+    field = _EMBEDDING_INPUT_FIELDS[path]
+    raw = payload.get(field)
+    texts = [raw] if isinstance(raw, str) else raw
+    if not texts or not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return None
+    extra = {k: v for k, v in payload.items() if k not in {"model", field}}
+
+    try:
+        vectors = await get_embedding_batcher().embed(payload["model"], texts, extra)
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=exc.status_code,
+            detail=exc.detail,
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+    except httpx.HTTPStatusError as exc:
+        return Response(
+            content=exc.response.content,
+            status_code=exc.response.status_code,
+            media_type=exc.response.headers.get("content-type"),
+        )
+    except httpx.TimeoutException as exc:  # pragma: no cover - network failure path
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="ollama_upstream_timeout",
+        ) from exc
+    except (httpx.HTTPError, ValueError) as exc:  # pragma: no cover - network failure path
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="ollama_upstream_error",
         ) from exc
 
-    # Propagate key headers while avoiding hop-by-hop ones.
-    headers = {}
-    for key, value in upstream_response.headers.items():
-        lower = key.lower()
-        if lower in {"content-type", "content-length", "content-encoding"}:
-            headers[key] = value
+    if path == "embeddings":
+        return JSONResponse({"embedding": vectors[0]})
+    return JSONResponse({"model": payload["model"], "embeddings": vectors})
+
+
+async def _send_upstream(
+    request: Request,
+    path: str,
+    body: bytes,
+    model: str | None,
+) -> tuple[httpx.Response, UpstreamNode]:
+    """Send the request to the best upstream, failing over on connect errors.
+
+    Only connection-phase failures are retried on another node, since the
+    request has provably not reached Ollama yet; anything later is surfaced.
+    """
+
+    client = get_ollama_client()
+    pool = get_ollama_pool()
+    headers = {
+        k: v
+        for k, v in request.headers.items()
+        if k.lower() not in _STRIPPED_REQUEST_HEADERS
+    }
+    tried: set[str] = set()
+    while True:
+        node = pool.choose(model, exclude=tried)
+        if node is None:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="ollama_upstream_error",
+            )
+        tried.add(node.url)
+        upstream_request = client.build_request(
+            request.method,
+            f"{node.url}/api/{path}" if path else f"{node.url}/api",
+            headers=headers,
+            params=dict(request.query_params),
+            content=body,
+        )
+
+        pool.begin(node)
+        started = time.monotonic()
+        try:
+            upstream_response = await client.send(upstream_request, stream=True)
+        except (httpx.ConnectError, httpx.ConnectTimeout):  # pragma: no cover - network failure path
+            pool.end(node)
+            pool.record_failure(node)
+            continue
+        except httpx.TimeoutException as exc:  # pragma: no cover - network failure path
+            pool.end(node)
+            pool.record_failure(node)
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="ollama_upstream_timeout",
+            ) from exc
+        except httpx.HTTPError as exc:  # pragma: no cover - network failure path
+            pool.end(node)
+            pool.record_failure(node)
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="ollama_upstream_error",
+            ) from exc
+        except BaseException:
+            # Cancelled (client gone) or unexpected: the node slot is still ours.
+            pool.end(node)
+            raise
+
+        if upstream_response.status_code >= 500:
+            pool.record_failure(node)
+        else:
+            loaded = model if upstream_response.status_code < 400 else None
+            pool.record_success(node, time.monotonic() - started, loaded)
+        return upstream_response, node
+
+
+@router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+async def proxy_ollama(path: str, request: Request) -> Response:
+    """Forward arbitrary requests to a pooled Ollama host, streaming the reply."""
+
+    body = await request.body()
+    if request.method == "POST" and path in _EMBEDDING_INPUT_FIELDS:
+        batched = await _embed_batched(path, body)
+        if batched is not None:
+            return batched
+
+    model = _requested_model(body) if path in _ADMITTED_PATHS else None
+
+    ticket: AdmissionTicket | None = None
+    if path in _ADMITTED_PATHS:
+        user_key, room_key = await _fairness_keys(request)
+        try:
+            ticket = await get_ollama_admission().acquire(user_key, room_key)
+        except AdmissionRejected as exc:
+            raise HTTPException(
+                status_code=exc.status_code,
+                detail=exc.detail,
+                headers={"Retry-After": str(exc.retry_after)},
+            ) from exc
+
+    node: UpstreamNode | None = None
+    upstream_response: httpx.Response | None = None
+    try:
+        upstream_response, node = await _send_upstream(request, path, body, model)
+        return _stream_response(upstream_response, node, ticket)
+    except BaseException:
+        # Errors and cancellation before the response takes ownership of the
+        # slots must hand them back, or each one leaks a concurrency slot.
+        if upstream_response is not None:
+            await upstream_response.aclose()
+        if node is not None:
+            get_ollama_pool().end(node)
+        if ticket is not None:
+            ticket.release()
+        raise
+
+
+def _stream_response(
+    upstream_response: httpx.Response,
+    node: UpstreamNode,
+    ticket: AdmissionTicket | None,
+) -> StreamingResponse:
+    # Propagate key headers while avoiding hop-by-hop ones. Bytes are relayed
+    # raw, so content-encoding and content-length stay valid as-is.
+    headers = {
+        key: value
+        for key, value in upstream_response.headers.items()
+        if key.lower() in _FORWARDED_RESPONSE_HEADERS
+    }
+    # Ask intermediaries (nginx, Vite dev proxy) not to buffer NDJSON streams.
+    headers["Cache-Control"] = "no-cache"
+    headers["X-Accel-Buffering"] = "no"
+
+    async def _finish() -> None:
+        await upstream_response.aclose()
+        get_ollama_pool().end(node)
+        if ticket is not None:
+            ticket.release()
 
-    return Response(
-        content=upstream_response.content,
+    # The background task also runs when the client disconnects mid-stream,
+    # guaranteeing the connection and admission slot are released either way.
+    return StreamingResponse(
+        _relay(upstream_response),
         status_code=upstream_response.status_code,
         headers=headers,
+        background=BackgroundTask(_finish),
     )
@@ -2,32 +2,61 @@
 
 from __future__ import annotations
 
+import asyncio
+import base64
+import json
 import uuid
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import func
+from sqlalchemy import Integer, Select, and_, delete, func, literal_column, select, true, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from ..core.room_events import get_room_event_hub
 from ..core.security import utc_now_ms
+from ..core.settings import get_settings
 from ..db.models import (
     ClassAssistant,
     ClassKnowledge,
     ClassMessage,
+    ClassMessageReaction,
+    ClassReadReceipt,
     ClassRoom,
     ClassRoomMember,
     Library,
     UserGroup,
     UserGroupMember,
 )
-from ..db.session import get_db
+from ..db.session import SessionLocal, get_db
+from ..services.read_receipts import get_read_receipt_buffer
+from ..services.unread import (
+    cached_unread_counts,
+    record_message,
+    reset_unread,
+    unread_counts,
+    visible_room_ids,
+)
 from .deps import get_current_user
 
 
 router = APIRouter(prefix="/api/v1", tags=["rooms"])
 
 
+# Room listings carry only the start of the latest message.
+_PREVIEW_CHARS = 200
+
+
+class MessagePreview(BaseModel):
+    id: str
+    user_id: str
+    content: str
+    created_at: int | None = None
+
+
 class RoomSummary(BaseModel):
     id: str
     name: str
@@ -38,9 +67,16 @@ class RoomSummary(BaseModel):
     channel_type: Optional[str] = None
     data: Dict[str, Any]
     meta: Dict[str, Any]
+    unread_count: int = 0
+    last_message: Optional[MessagePreview] = None
 
 
-def _summarize_room(room: ClassRoom, member_count: int) -> RoomSummary:
+def _summarize_room(
+    room: ClassRoom,
+    member_count: int,
+    unread_count: int = 0,
+    last_message: MessagePreview | None = None,
+) -> RoomSummary:
     return RoomSummary(
         id=room.id,
         name=room.name,
@@ -51,6 +87,8 @@ def _summarize_room(room: ClassRoom, member_count: int) -> RoomSummary:
         channel_type=room.channel_type,
         data=room.data or {},
         meta=room.meta or {},
+        unread_count=unread_count,
+        last_message=last_message,
     )
 
 
@@ -82,43 +120,130 @@ class RoomUpdate(BaseModel):
     access_control: Dict[str, Any] | None = None
 
 
-def _room_summary(db: Session, room: ClassRoom) -> RoomSummary:
+def _room_page_statement(user_id: str, limit: int, before: str | None, with_unread: bool) -> Select:
+    """One page of the user's rooms with member count, unread count and latest message."""
+
+    visible = visible_room_ids(user_id).subquery("visible")
+    page_query = select(ClassRoom.id, ClassRoom.created_at).join(
+        visible, visible.c.id == ClassRoom.id
+    )
+    if before:
+        page_query = page_query.where(
+            tuple_(ClassRoom.created_at, ClassRoom.id) < _decode_cursor(before)
+        )
+    # The page is cut before the per-room subqueries run, so their cost is O(limit).
+    page = (
+        page_query.order_by(ClassRoom.created_at.desc(), ClassRoom.id.desc())
+        .limit(limit + 1)
+        .subquery("page")
+    )
+
     member_count = (
-        db.query(func.count(ClassRoomMember.user_id))
-        .filter(ClassRoomMember.class_room_id == room.id)
-        .scalar()
+        select(func.count())
+        .where(ClassRoomMember.class_room_id == page.c.id)
+        .scalar_subquery()
     )
-    return RoomSummary(
-        id=room.id,
-        name=room.name,
-        description=room.description,
-        member_count=int(member_count or 0),
-        is_archived=room.is_archived,
-        created_at=room.created_at,
+    unread_count = (
+        select(func.count())
+        .where(
+            ClassMessage.class_room_id == page.c.id,
+            ClassMessage.created_at > func.coalesce(ClassReadReceipt.last_read_at, 0),
+            ClassMessage.user_id != user_id,
+        )
+        .correlate(page, ClassReadReceipt)
+        .scalar_subquery()
+    )
+    last_message = (
+        select(
+            ClassMessage.id,
+            ClassMessage.user_id,
+            func.left(ClassMessage.content, _PREVIEW_CHARS).label("content"),
+            ClassMessage.created_at,
+        )
+        .where(ClassMessage.class_room_id == page.c.id)
+        .order_by(ClassMessage.created_at.desc(), ClassMessage.id.desc())
+        .limit(1)
+        .lateral("last_message")
     )
+    columns = [
+        ClassRoom,
+        member_count.label("member_count"),
+        last_message.c.id.label("last_id"),
+        last_message.c.user_id.label("last_user_id"),
+        last_message.c.content.label("last_content"),
+        last_message.c.created_at.label("last_created_at"),
+    ]
+    if with_unread:
+        columns.append(unread_count.label("unread_count"))
+    return (
+        select(*columns)
+        .select_from(page)
+        .join(ClassRoom, ClassRoom.id == page.c.id)
+        .outerjoin(
+            ClassReadReceipt,
+            and_(
+                ClassReadReceipt.class_room_id == page.c.id,
+                ClassReadReceipt.user_id == user_id,
+            ),
+        )
+        .outerjoin(last_message, true())
+        .order_by(page.c.created_at.desc(), page.c.id.desc())
+    )
+
+
+def _room_page(
+    rows: list[Any],
+    limit: int,
+    cached_unread: dict[str, int] | None,
+    response: Response,
+) -> list[RoomSummary]:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Cursor-Before"] = _encode_cursor(rows[-1].ClassRoom)
+
+    return [
+        _summarize_room(
+            row.ClassRoom,
+            member_count=int(row.member_count or 0),
+            unread_count=(
+                cached_unread.get(row.ClassRoom.id, 0)
+                if cached_unread is not None
+                else int(row.unread_count or 0)
+            ),
+            last_message=(
+                MessagePreview(
+                    id=row.last_id,
+                    user_id=row.last_user_id,
+                    content=row.last_content,
+                    created_at=row.last_created_at,
+                )
+                if row.last_id
+                else None
+            ),
+        )
+        for row in rows
+    ]
 
 
 @router.get("/rooms", response_model=list[RoomSummary])
 def list_rooms(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     user_id: str = Depends(get_current_user),
 ) -> list[RoomSummary]:
-    rooms = (
-        db.query(ClassRoom)
-        .filter(ClassRoom.created_by_user_id == user_id)
-        .order_by(ClassRoom.created_at.desc())
-        .all()
-    )
-    if not rooms:
-        return []
-
-    room_ids = [room.id for room in rooms]
-    counts = dict(
-        db.query(ClassRoomMember.class_room_id, func.count(ClassRoomMember.user_id))
-        .filter(ClassRoomMember.class_room_id.in_(room_ids))
-        .group_by(ClassRoomMember.class_room_id)
-        .all()
-    )
+    """Rooms the user created or belongs to, newest first, in one query per page.
+
+    Member counts, unread counts and the latest message are computed only for
+    the rooms on the page. Pass the ``X-Cursor-Before`` response header back
+    as ``before`` to fetch the next page.
+    """
+
+    # Maintained counters make the per-room unread COUNT unnecessary.
+    cached_unread = cached_unread_counts(db, user_id)
+    statement = _room_page_statement(user_id, limit, before, cached_unread is None)
+    return _room_page(db.execute(statement).all(), limit, cached_unread, response)
 
 
 @router.post("/rooms", response_model=RoomSummary, status_code=status.HTTP_201_CREATED)
@@ -160,28 +285,31 @@ def create_room(
     return _summarize_room(room, member_count=1)
 
 
-def _require_room_access(db: Session, room_id: str, user_id: str) -> ClassRoom:
-    room = db.query(ClassRoom).filter(ClassRoom.id == room_id).first()
-    if not room:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, "room_not_found")
-
-    if room.created_by_user_id == user_id:
-        return room
-
-    membership = (
-        db.query(ClassRoomMember)
-        .filter(
+def _room_access_statement(room_id: str, user_id: str) -> Select:
+    is_member = (
+        select(ClassRoomMember.user_id)
+        .where(
             ClassRoomMember.class_room_id == room_id,
             ClassRoomMember.user_id == user_id,
         )
-        .first()
+        .exists()
     )
-    if not membership:
-        raise HTTPException(status.HTTP_403_FORBIDDEN, "room_access_denied")
+    return select(ClassRoom, is_member.label("is_member")).where(ClassRoom.id == room_id)
 
+
+def _check_room_access(row: Any, user_id: str) -> ClassRoom:
+    if row is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "room_not_found")
+    room, is_member = row
+    if room.created_by_user_id != user_id and not is_member:
+        raise HTTPException(status.HTTP_403_FORBIDDEN, "room_access_denied")
     return room
 
 
+def _require_room_access(db: Session, room_id: str, user_id: str) -> ClassRoom:
+    return _check_room_access(db.execute(_room_access_statement(room_id, user_id)).first(), user_id)
+
+
 class MessageIn(BaseModel):
     content: str
     parent_id: Optional[str] = None
@@ -190,6 +318,12 @@ class MessageIn(BaseModel):
     meta: Dict[str, Any] | None = None
 
 
+class ReactionOut(BaseModel):
+    name: str
+    count: int
+    reacted: bool
+
+
 class MessageOut(BaseModel):
     id: str
     user_id: str
@@ -197,66 +331,542 @@ class MessageOut(BaseModel):
     content: str
     created_at: int | None = None
     parent_id: Optional[str] = None
+    reply_count: int = 0
+    reactions: Optional[list[ReactionOut]] = None
+
+
+def _message_out(
+    message: ClassMessage,
+    reply_count: int = 0,
+    reactions: list[ReactionOut] | None = None,
+) -> MessageOut:
+    return MessageOut(
+        id=message.id,
+        user_id=message.user_id,
+        class_room_id=message.class_room_id,
+        content=message.content,
+        created_at=message.created_at,
+        parent_id=message.parent_id,
+        reply_count=reply_count,
+        reactions=reactions,
+    )
+
+
+def _reply_count_statement(message_ids: list[str]) -> Select:
+    """Reply counts per message as grouped index scans, without walking the tree.
+
+    A top-level message counts every reply in its thread via the materialized
+    ``thread_root_id``; a reply counts its direct replies.
+    """
+
+    count = func.count()
+    thread_replies = (
+        select(ClassMessage.thread_root_id, count)
+        .where(ClassMessage.thread_root_id.in_(message_ids))
+        .group_by(ClassMessage.thread_root_id)
+    )
+    # Depth-1 children of a top-level message are already in its thread count.
+    direct_replies = (
+        select(ClassMessage.parent_id, count)
+        .where(ClassMessage.parent_id.in_(message_ids), ClassMessage.thread_depth > 1)
+        .group_by(ClassMessage.parent_id)
+    )
+    return thread_replies.union_all(direct_replies)
+
+
+def _reply_counts(db: Session, message_ids: list[str]) -> dict[str, int]:
+    if not message_ids:
+        return {}
+    rows = db.execute(_reply_count_statement(message_ids))
+    return {root_id: int(count) for root_id, count in rows}
+
+
+def _reaction_statement(message_ids: list[str], user_id: str) -> Select:
+    """Reaction counts per message and name, as one grouped query."""
+
+    count = func.count()
+    return (
+        select(
+            ClassMessageReaction.message_id,
+            ClassMessageReaction.name,
+            count,
+            func.bool_or(ClassMessageReaction.user_id == user_id),
+        )
+        .where(ClassMessageReaction.message_id.in_(message_ids))
+        .group_by(ClassMessageReaction.message_id, ClassMessageReaction.name)
+        .order_by(ClassMessageReaction.message_id, count.desc(), ClassMessageReaction.name)
+    )
+
+
+def _collect_reactions(message_ids: list[str], rows: Any) -> dict[str, list[ReactionOut]]:
+    summaries: dict[str, list[ReactionOut]] = {message_id: [] for message_id in message_ids}
+    for message_id, name, total, reacted in rows:
+        summaries[message_id].append(ReactionOut(name=name, count=int(total), reacted=bool(reacted)))
+    return summaries
+
+
+def _reaction_summaries(
+    db: Session, message_ids: list[str], user_id: str
+) -> dict[str, list[ReactionOut]]:
+    if not message_ids:
+        return {}
+    return _collect_reactions(message_ids, db.execute(_reaction_statement(message_ids, user_id)))
+
+
+def _get_room_message(db: Session, room_id: str, message_id: str) -> ClassMessage:
+    message = (
+        db.query(ClassMessage)
+        .filter(ClassMessage.id == message_id, ClassMessage.class_room_id == room_id)
+        .first()
+    )
+    if message is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "message_not_found")
+    return message
+
+
+def _encode_cursor(row: ClassMessage | ClassRoom) -> str:
+    raw = f"{row.created_at}:{row.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[int, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.split(":", 1)
+        return int(created_at), str(uuid.UUID(message_id))
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "invalid_cursor") from None
+
+
+def _message_page_statement(
+    room_id: str, limit: int, before: str | None, after: str | None
+) -> Select:
+    # Both directions walk idx_class_message_room_created_id, forwards or backwards.
+    keyset = tuple_(ClassMessage.created_at, ClassMessage.id)
+    statement = select(ClassMessage).where(ClassMessage.class_room_id == room_id)
+    if after:
+        statement = statement.where(keyset > _decode_cursor(after)).order_by(
+            ClassMessage.created_at.asc(), ClassMessage.id.asc()
+        )
+    else:
+        if before:
+            statement = statement.where(keyset < _decode_cursor(before))
+        statement = statement.order_by(ClassMessage.created_at.desc(), ClassMessage.id.desc())
+    return statement.limit(limit + 1)
+
+
+def _message_page(
+    rows: list[ClassMessage],
+    limit: int,
+    before: str | None,
+    after: str | None,
+    response: Response,
+) -> list[ClassMessage]:
+    """Trim the extra row, order newest first and set the cursor headers."""
+
+    msgs = list(rows[:limit])
+    if after:
+        msgs.reverse()
+
+    if msgs:
+        if after or len(rows) > limit:
+            response.headers["X-Cursor-Before"] = _encode_cursor(msgs[-1])
+        response.headers["X-Cursor-After"] = _encode_cursor(msgs[0])
+    elif after or before:
+        response.headers["X-Cursor-After"] = after or before
+    return msgs
 
 
 @router.get("/rooms/{room_id}/messages", response_model=list[MessageOut])
 def list_messages(
     room_id: str,
+    response: Response,
     limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    reactions: bool = Query(False),
     db: Session = Depends(get_db),
     user_id: str = Depends(get_current_user),
 ) -> list[MessageOut]:
+    """Page through a room's messages on the ``(created_at, id)`` keyset.
+
+    Pages are always ordered newest first. Without a cursor the newest page is
+    returned; ``before`` pages back to older messages and ``after`` forward to
+    newer ones. The ``X-Cursor-Before`` / ``X-Cursor-After`` response headers
+    carry the cursors for the adjacent pages (``X-Cursor-Before`` is omitted
+    once the oldest message has been reached). With ``reactions=true`` each
+    message also carries its reaction counts.
+    """
+
+    if before and after:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "cursor_conflict")
     _require_room_access(db, room_id, user_id)
 
-    msgs = (
-        db.query(ClassMessage)
-        .filter(ClassMessage.class_room_id == room_id)
-        .order_by(ClassMessage.created_at.desc())
-        .limit(limit)
-        .all()
+    rows = db.execute(_message_page_statement(room_id, limit, before, after)).scalars().all()
+    msgs = _message_page(rows, limit, before, after, response)
+    ids = [m.id for m in msgs]
+    counts = _reply_counts(db, ids)
+    summaries = _reaction_summaries(db, ids, user_id) if reactions else {}
+    return [_message_out(m, counts.get(m.id, 0), summaries.get(m.id)) for m in msgs]
+
+
+class ThreadMessageOut(MessageOut):
+    depth: int
+
+
+class ThreadOut(BaseModel):
+    root: MessageOut
+    replies: list[ThreadMessageOut]
+
+
+def _thread_page_statement(
+    root: ClassMessage, depth: int, cursor: tuple[int, str] | None, limit: int
+) -> Select:
+    """One page of a top-level message's thread, read from the materialized root."""
+
+    stmt = select(ClassMessage, ClassMessage.thread_depth).where(
+        ClassMessage.thread_root_id == root.id,
+        ClassMessage.thread_depth <= depth,
     )
-    return [
-        MessageOut(
-            id=m.id,
-            user_id=m.user_id,
-            class_room_id=m.class_room_id,
-            content=m.content,
-            created_at=m.created_at,
-            parent_id=m.parent_id,
+    if cursor is not None:
+        stmt = stmt.where(tuple_(ClassMessage.created_at, ClassMessage.id) > cursor)
+    return stmt.order_by(ClassMessage.created_at, ClassMessage.id).limit(limit + 1)
+
+
+def _subtree_page_statement(
+    root: ClassMessage, depth: int, cursor: tuple[int, str] | None, limit: int
+) -> Select:
+    """One page of the replies under a reply, walked with a recursive CTE."""
+
+    tree = (
+        select(ClassMessage.id, literal_column("0", Integer).label("depth"))
+        .where(ClassMessage.id == root.id)
+        .cte("thread", recursive=True)
+    )
+    tree = tree.union_all(
+        select(ClassMessage.id, tree.c.depth + 1)
+        .join(tree, ClassMessage.parent_id == tree.c.id)
+        .where(
+            ClassMessage.parent_id.isnot(None),
+            ClassMessage.class_room_id == root.class_room_id,
+            tree.c.depth < depth,
         )
-        for m in msgs
-    ]
+    )
+    stmt = (
+        select(ClassMessage, tree.c.depth)
+        .join(tree, tree.c.id == ClassMessage.id)
+        .where(tree.c.depth > 0)
+    )
+    if cursor is not None:
+        stmt = stmt.where(tuple_(ClassMessage.created_at, ClassMessage.id) > cursor)
+    return stmt.order_by(ClassMessage.created_at, ClassMessage.id).limit(limit + 1)
 
 
-@router.post("/rooms/{room_id}/messages", response_model=MessageOut, status_code=status.HTTP_201_CREATED)
-def post_message(
+@router.get("/rooms/{room_id}/messages/{message_id}/thread", response_model=ThreadOut)
+def get_thread(
     room_id: str,
-    payload: MessageIn,
+    message_id: str,
+    response: Response,
+    depth: int = Query(32, ge=1, le=256),
+    limit: int = Query(100, ge=1, le=500),
+    after: Optional[str] = Query(None),
+    reactions: bool = Query(False),
     db: Session = Depends(get_db),
     user_id: str = Depends(get_current_user),
-) -> MessageOut:
+) -> ThreadOut:
+    """Return a message and the replies beneath it, down to ``depth`` levels.
+
+    Replies come oldest first with their ``depth`` and ``parent_id`` so
+    clients can rebuild the tree; when more remain, ``X-Cursor-After`` holds
+    the cursor for the next page. For a top-level message each page is one
+    range scan of ``idx_class_message_thread_root_created_id`` from the
+    cursor, so late pages of a large thread cost the same as the first. The
+    subtree under a reply is walked with a recursive CTE instead.
+    """
+
     _require_room_access(db, room_id, user_id)
+    root = _get_room_message(db, room_id, message_id)
 
-    msg = ClassMessage(
+    cursor = _decode_cursor(after) if after else None
+    if root.parent_id is None:
+        statement = _thread_page_statement(root, depth, cursor, limit)
+    else:
+        statement = _subtree_page_statement(root, depth, cursor, limit)
+    rows = db.execute(statement).all()
+    page = rows[:limit]
+    if len(rows) > limit:
+        response.headers["X-Cursor-After"] = _encode_cursor(page[-1][0])
+
+    ids = [root.id, *(m.id for m, _ in page)]
+    counts = _reply_counts(db, ids)
+    summaries = _reaction_summaries(db, ids, user_id) if reactions else {}
+    return ThreadOut(
+        root=_message_out(root, counts.get(root.id, 0), summaries.get(root.id)),
+        replies=[
+            ThreadMessageOut(
+                **_message_out(m, counts.get(m.id, 0), summaries.get(m.id)).model_dump(),
+                depth=level,
+            )
+            for m, level in page
+        ],
+    )
+
+
+@router.put(
+    "/rooms/{room_id}/messages/{message_id}/reactions/{name}",
+    response_model=list[ReactionOut],
+)
+def add_reaction(
+    room_id: str,
+    message_id: str,
+    name: str = Path(..., min_length=1, max_length=64),
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> list[ReactionOut]:
+    """React to a message; repeating the call is a no-op. Returns the message's reactions."""
+
+    _require_room_access(db, room_id, user_id)
+    _get_room_message(db, room_id, message_id)
+    db.execute(
+        insert(ClassMessageReaction)
+        .values(id=str(uuid.uuid4()), message_id=message_id, user_id=user_id, name=name)
+        .on_conflict_do_nothing(
+            index_elements=[
+                ClassMessageReaction.message_id,
+                ClassMessageReaction.user_id,
+                ClassMessageReaction.name,
+            ]
+        )
+    )
+    db.commit()
+    return _reaction_summaries(db, [message_id], user_id)[message_id]
+
+
+@router.delete(
+    "/rooms/{room_id}/messages/{message_id}/reactions/{name}",
+    response_model=list[ReactionOut],
+)
+def remove_reaction(
+    room_id: str,
+    message_id: str,
+    name: str = Path(..., min_length=1, max_length=64),
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> list[ReactionOut]:
+    """Remove the user's reaction; removing a missing one is a no-op."""
+
+    _require_room_access(db, room_id, user_id)
+    _get_room_message(db, room_id, message_id)
+    db.execute(
+        delete(ClassMessageReaction).where(
+            ClassMessageReaction.message_id == message_id,
+            ClassMessageReaction.user_id == user_id,
+            ClassMessageReaction.name == name,
+        )
+    )
+    db.commit()
+    return _reaction_summaries(db, [message_id], user_id)[message_id]
+
+
+def _parent_statement(parent_id: str) -> Select:
+    return select(
+        ClassMessage.id,
+        ClassMessage.class_room_id,
+        ClassMessage.thread_root_id,
+        ClassMessage.thread_depth,
+    ).where(ClassMessage.id == parent_id)
+
+
+def _check_parent(room_id: str, parent: Any) -> Any:
+    # Replies must stay in their parent's room or threads would span rooms.
+    if parent is None or parent.class_room_id != room_id:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "invalid_parent")
+    return parent
+
+
+def _new_message(room_id: str, user_id: str, payload: MessageIn, parent: Any = None) -> ClassMessage:
+    return ClassMessage(
         id=str(uuid.uuid4()),
         user_id=user_id,
         class_room_id=room_id,
         parent_id=payload.parent_id,
+        thread_root_id=(parent.thread_root_id or parent.id) if parent is not None else None,
+        thread_depth=parent.thread_depth + 1 if parent is not None else 0,
         target_user_id=payload.target_user_id,
         content=payload.content,
         data=payload.data or {},
         meta=payload.meta or {},
     )
+
+
+@router.post("/rooms/{room_id}/messages", response_model=MessageOut, status_code=status.HTTP_201_CREATED)
+def post_message(
+    room_id: str,
+    payload: MessageIn,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> MessageOut:
+    _require_room_access(db, room_id, user_id)
+    parent = None
+    if payload.parent_id is not None:
+        parent = _check_parent(room_id, db.execute(_parent_statement(payload.parent_id)).first())
+
+    msg = _new_message(room_id, user_id, payload, parent)
     db.add(msg)
     db.commit()
 
-    return MessageOut(
-        id=msg.id,
-        user_id=msg.user_id,
-        class_room_id=msg.class_room_id,
-        content=msg.content,
-        created_at=msg.created_at,
-        parent_id=msg.parent_id,
+    out = _message_out(msg)
+    record_message(db, room_id, user_id)
+    get_room_event_hub().publish(room_id, _message_event(msg, out))
+    return out
+
+
+class UnreadOut(BaseModel):
+    rooms: Dict[str, int]
+    total: int
+
+
+@router.get("/rooms/unread", response_model=UnreadOut)
+def list_unread(
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> UnreadOut:
+    """Unread message counts for every room the user can see."""
+
+    counts = unread_counts(db, user_id)
+    return UnreadOut(rooms=counts, total=sum(counts.values()))
+
+
+class ReadIn(BaseModel):
+    last_read_at: Optional[int] = None
+
+
+class ReadOut(BaseModel):
+    class_room_id: str
+    last_read_at: int
+
+
+def _read_position(payload: ReadIn | None) -> int:
+    """The requested read position, clamped to now so it cannot hide future messages."""
+
+    now = utc_now_ms()
+    requested = payload.last_read_at if payload else None
+    return min(requested, now) if requested else now
+
+
+@router.post("/rooms/{room_id}/read", response_model=ReadOut)
+def mark_room_read(
+    room_id: str,
+    payload: ReadIn | None = None,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> ReadOut:
+    """Mark the room read up to ``last_read_at`` (default: now).
+
+    Cheap enough to call on every scroll: the receipt is merged in Redis and
+    written to Postgres by the periodic flusher, never moving backwards. The
+    room's unread counter keeps any messages newer than the read position.
+    """
+
+    _require_room_access(db, room_id, user_id)
+    read_at = _read_position(payload)
+    get_read_receipt_buffer().record(room_id, user_id, read_at)
+    reset_unread(db, room_id, user_id, read_at)
+    return ReadOut(class_room_id=room_id, last_read_at=read_at)
+
+
+def _message_event(message: ClassMessage, out: MessageOut | None = None) -> dict[str, Any]:
+    return {**(out or _message_out(message)).model_dump(), "cursor": _encode_cursor(message)}
+
+
+def _message_events_after(room_id: str, cursor: tuple[int, str], limit: int) -> list[dict[str, Any]]:
+    with SessionLocal() as db:
+        msgs = (
+            db.query(ClassMessage)
+            .filter(
+                ClassMessage.class_room_id == room_id,
+                tuple_(ClassMessage.created_at, ClassMessage.id) > cursor,
+            )
+            .order_by(ClassMessage.created_at.asc(), ClassMessage.id.asc())
+            .limit(limit)
+            .all()
+        )
+        return [_message_event(m) for m in msgs]
+
+
+def _sse(event: dict[str, Any]) -> str:
+    return f"id: {event['cursor']}\nevent: message\ndata: {json.dumps(event)}\n\n"
+
+
+async def _room_event_stream(
+    request: Request,
+    room_id: str,
+    resume_from: tuple[int, str] | None,
+) -> AsyncIterator[str]:
+    settings = get_settings()
+    hub = get_room_event_hub()
+    # Subscribe before replaying so nothing posted meanwhile falls in between.
+    subscription = await hub.subscribe(room_id)
+    try:
+        yield "retry: 3000\n\n"
+        replayed_to = resume_from
+        if resume_from is not None:
+            limit = settings.room_events_backfill_limit
+            backlog = await run_in_threadpool(_message_events_after, room_id, resume_from, limit + 1)
+            if len(backlog) > limit:
+                # Too far behind to replay; the client refetches the page over REST.
+                yield "event: reset\ndata: {}\n\n"
+                return
+            for event in backlog:
+                yield _sse(event)
+            if backlog:
+                replayed_to = (backlog[-1]["created_at"], backlog[-1]["id"])
+
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(), settings.room_events_heartbeat_seconds
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                # Dropped as a slow consumer or shutting down; the client resumes.
+                return
+            if replayed_to is not None and (event["created_at"], event["id"]) <= replayed_to:
+                continue
+            yield _sse(event)
+    finally:
+        await hub.unsubscribe(subscription)
+
+
+@router.get("/rooms/{room_id}/events")
+async def room_events(
+    room_id: str,
+    request: Request,
+    after: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> StreamingResponse:
+    """Server-sent events for messages posted to a room.
+
+    Each event's id is the message's pagination cursor, so a reconnecting
+    ``EventSource`` (``Last-Event-ID``) or a client passing ``after`` first
+    receives the messages it missed, then live ones. A client that is too far
+    behind receives a ``reset`` event and should reload the newest page.
+    """
+
+    await run_in_threadpool(_require_room_access, db, room_id, user_id)
+    # The stream can stay open for hours; don't pin a pooled connection to it.
+    await run_in_threadpool(db.close)
+
+    cursor = last_event_id or after
+    resume_from = _decode_cursor(cursor) if cursor else None
+    return StreamingResponse(
+        _room_event_stream(request, room_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -0,0 +1,164 @@
+"""Room and message hot paths served from the async engine.
+
+Enabled with ``DATABASE_ASYNC=true``: this router is mounted ahead of
+:mod:`app.api.rooms`, so these routes take precedence over their sync
+equivalents while every other room endpoint keeps running on the threadpool.
+Request and response shapes are identical and the SQL is shared with the sync
+module, so the two paths can be compared under load by flipping the setting.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.room_events import get_room_event_hub
+from ..db.models import ClassRoom
+from ..db.session import get_async_db
+from ..services.read_receipts import get_read_receipt_buffer
+from ..services.unread import (
+    cached_unread_counts_async,
+    record_message_async,
+    reset_unread_async,
+    unread_counts_async,
+)
+from .deps import get_current_user_async
+from .rooms import (
+    MessageIn,
+    MessageOut,
+    ReactionOut,
+    ReadIn,
+    ReadOut,
+    RoomSummary,
+    UnreadOut,
+    _check_parent,
+    _check_room_access,
+    _collect_reactions,
+    _message_event,
+    _message_out,
+    _message_page,
+    _message_page_statement,
+    _new_message,
+    _parent_statement,
+    _reaction_statement,
+    _read_position,
+    _reply_count_statement,
+    _room_access_statement,
+    _room_page,
+    _room_page_statement,
+)
+
+router = APIRouter(prefix="/api/v1", tags=["rooms"])
+
+
+async def _require_room_access(db: AsyncSession, room_id: str, user_id: str) -> ClassRoom:
+    row = (await db.execute(_room_access_statement(room_id, user_id))).first()
+    return _check_room_access(row, user_id)
+
+
+async def _reply_counts(db: AsyncSession, message_ids: list[str]) -> dict[str, int]:
+    if not message_ids:
+        return {}
+    rows = await db.execute(_reply_count_statement(message_ids))
+    return {root_id: int(count) for root_id, count in rows}
+
+
+async def _reaction_summaries(
+    db: AsyncSession, message_ids: list[str], user_id: str
+) -> dict[str, list[ReactionOut]]:
+    if not message_ids:
+        return {}
+    rows = await db.execute(_reaction_statement(message_ids, user_id))
+    return _collect_reactions(message_ids, rows)
+
+
+@router.get("/rooms", response_model=list[RoomSummary])
+async def list_rooms(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_current_user_async),
+) -> list[RoomSummary]:
+    cached_unread = await cached_unread_counts_async(db, user_id)
+    statement = _room_page_statement(user_id, limit, before, cached_unread is None)
+    rows = (await db.execute(statement)).all()
+    return _room_page(rows, limit, cached_unread, response)
+
+
+@router.get("/rooms/unread", response_model=UnreadOut)
+async def list_unread(
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_current_user_async),
+) -> UnreadOut:
+    counts = await unread_counts_async(db, user_id)
+    return UnreadOut(rooms=counts, total=sum(counts.values()))
+
+
+@router.get("/rooms/{room_id}/messages", response_model=list[MessageOut])
+async def list_messages(
+    room_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    reactions: bool = Query(False),
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_current_user_async),
+) -> list[MessageOut]:
+    if before and after:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "cursor_conflict")
+    await _require_room_access(db, room_id, user_id)
+
+    statement = _message_page_statement(room_id, limit, before, after)
+    rows = (await db.execute(statement)).scalars().all()
+    msgs = _message_page(rows, limit, before, after, response)
+    ids = [m.id for m in msgs]
+    counts = await _reply_counts(db, ids)
+    summaries = await _reaction_summaries(db, ids, user_id) if reactions else {}
+    return [_message_out(m, counts.get(m.id, 0), summaries.get(m.id)) for m in msgs]
+
+
+@router.post(
+    "/rooms/{room_id}/messages",
+    response_model=MessageOut,
+    status_code=status.HTTP_201_CREATED,
+)
+async def post_message(
+    room_id: str,
+    payload: MessageIn,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_current_user_async),
+) -> MessageOut:
+    await _require_room_access(db, room_id, user_id)
+    parent = None
+    if payload.parent_id is not None:
+        row = (await db.execute(_parent_statement(payload.parent_id))).first()
+        parent = _check_parent(room_id, row)
+
+    msg = _new_message(room_id, user_id, payload, parent)
+    db.add(msg)
+    await db.commit()
+    # Load server defaults (created_at) explicitly; nothing may lazy-load here.
+    await db.refresh(msg)
+
+    out = _message_out(msg)
+    await record_message_async(db, room_id, user_id)
+    await get_room_event_hub().publish_async(room_id, _message_event(msg, out))
+    return out
+
+
+@router.post("/rooms/{room_id}/read", response_model=ReadOut)
+async def mark_room_read(
+    room_id: str,
+    payload: ReadIn | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_current_user_async),
+) -> ReadOut:
+    await _require_room_access(db, room_id, user_id)
+    read_at = _read_position(payload)
+    await get_read_receipt_buffer().record_async(room_id, user_id, read_at)
+    await reset_unread_async(db, room_id, user_id, read_at)
+    return ReadOut(class_room_id=room_id, last_read_at=read_at)
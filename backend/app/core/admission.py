@@ -0,0 +1,240 @@
+"""Concurrency limiting with fair queuing for expensive upstream calls."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+from .metrics import WAIT_SAMPLE_SIZE, ewma, percentile_ms
+from .settings import get_settings
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be queued or waited too long."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+@dataclass
+class _RoomQueue:
+    weight: int
+    served: int = 0
+    users: "OrderedDict[str, deque[asyncio.Future[None]]]" = field(default_factory=OrderedDict)
+
+    def __len__(self) -> int:
+        return sum(len(waiters) for waiters in self.users.values())
+
+
+class AdmissionTicket:
+    """Handle for an admitted request; ``release`` is idempotent."""
+
+    def __init__(self, controller: "FairAdmissionController", waited: float) -> None:
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+        self.waited = waited
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(time.monotonic() - self._started)
+
+
+class FairAdmissionController:
+    """Bounded concurrency with weighted round-robin across rooms and users.
+
+    Waiting requests are grouped by room and then by user. When a slot frees
+    up, the room at the head of the ring is served (up to ``weight`` grants in
+    a row) and, inside that room, users take turns. One busy classroom or one
+    student firing many requests cannot starve everyone else.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        max_queue_per_user: int,
+        queue_timeout_seconds: float,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout_seconds = queue_timeout_seconds
+
+        self._active = 0
+        self._queued = 0
+        self._rooms: OrderedDict[str, _RoomQueue] = OrderedDict()
+        self._queued_by_user: dict[str, int] = {}
+
+        self._admitted = 0
+        self._rejected_queue_full = 0
+        self._rejected_user_limit = 0
+        self._timed_out = 0
+        self._max_queue_depth = 0
+        self._wait_samples: deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._wait_total = 0.0
+        self._service_ewma: float | None = None
+
+    async def acquire(
+        self,
+        user_key: str,
+        room_key: str,
+        weight: int = 1,
+        system: bool = False,
+    ) -> AdmissionTicket:
+        """Wait for a slot, or raise :class:`AdmissionRejected`.
+
+        ``system`` callers (shared internal work such as embedding batches)
+        are exempt from the per-user queue cap, which exists to stop one
+        person hogging the queue; they still take turns as their own room.
+        """
+
+        enqueued_at = time.monotonic()
+        if self._active < self.max_concurrency and self._queued == 0:
+            self._active += 1
+            return self._admit(enqueued_at)
+
+        if self._queued >= self.max_queue:
+            self._rejected_queue_full += 1
+            raise AdmissionRejected(503, "ollama_queue_full", self._retry_after())
+        if not system and self._queued_by_user.get(user_key, 0) >= self.max_queue_per_user:
+            self._rejected_user_limit += 1
+            raise AdmissionRejected(429, "ollama_user_queue_full", self._retry_after())
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        room = self._rooms.get(room_key)
+        if room is None:
+            room = self._rooms[room_key] = _RoomQueue(weight=max(1, weight))
+        room.users.setdefault(user_key, deque()).append(waiter)
+        self._queued += 1
+        self._queued_by_user[user_key] = self._queued_by_user.get(user_key, 0) + 1
+        self._max_queue_depth = max(self._max_queue_depth, self._queued)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter, room_key, user_key):
+                # Granted in the same tick the timeout fired: hand the slot back.
+                self._release(0.0)
+            self._timed_out += 1
+            raise AdmissionRejected(503, "ollama_queue_timeout", self._retry_after()) from None
+        except asyncio.CancelledError:
+            if not self._abandon(waiter, room_key, user_key):
+                self._release(0.0)
+            raise
+
+        return self._admit(enqueued_at)
+
+    def snapshot(self) -> dict[str, float | int | None]:
+        """Return queue depth, throughput and wait-time statistics."""
+
+        samples = sorted(self._wait_samples)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": self._queued,
+            "queued_rooms": len(self._rooms),
+            "max_queue_depth": self._max_queue_depth,
+            "admitted": self._admitted,
+            "rejected_queue_full": self._rejected_queue_full,
+            "rejected_user_limit": self._rejected_user_limit,
+            "timed_out": self._timed_out,
+            "wait_seconds_total": round(self._wait_total, 6),
+            "wait_p50_ms": percentile_ms(samples, 0.50),
+            "wait_p95_ms": percentile_ms(samples, 0.95),
+            "wait_p99_ms": percentile_ms(samples, 0.99),
+            "service_ewma_ms": (
+                round(self._service_ewma * 1000, 3) if self._service_ewma is not None else None
+            ),
+        }
+
+    def _admit(self, enqueued_at: float) -> AdmissionTicket:
+        waited = time.monotonic() - enqueued_at
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_samples.append(waited)
+        return AdmissionTicket(self, waited)
+
+    def _release(self, service_seconds: float) -> None:
+        self._active -= 1
+        if service_seconds > 0:
+            self._service_ewma = ewma(self._service_ewma, service_seconds)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._active < self.max_concurrency and self._rooms:
+            room_key, room = next(iter(self._rooms.items()))
+            user_key, waiters = next(iter(room.users.items()))
+            waiter = waiters.popleft()
+            self._dequeued(user_key)
+            if waiters:
+                room.users.move_to_end(user_key)
+            else:
+                del room.users[user_key]
+
+            room.served += 1
+            if not room.users:
+                del self._rooms[room_key]
+            elif room.served >= room.weight:
+                room.served = 0
+                self._rooms.move_to_end(room_key)
+
+            if waiter.done():
+                continue
+            self._active += 1
+            waiter.set_result(None)
+
+    def _abandon(self, waiter: asyncio.Future[None], room_key: str, user_key: str) -> bool:
+        """Drop a waiter that gave up; return False if it had already been granted."""
+
+        if waiter.done():
+            return False
+        waiter.cancel()
+        room = self._rooms.get(room_key)
+        waiters = room.users.get(user_key) if room else None
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self._dequeued(user_key)
+            if not waiters:
+                del room.users[user_key]
+            if not room.users:
+                del self._rooms[room_key]
+        return True
+
+    def _dequeued(self, user_key: str) -> None:
+        self._queued -= 1
+        remaining = self._queued_by_user.get(user_key, 1) - 1
+        if remaining:
+            self._queued_by_user[user_key] = remaining
+        else:
+            self._queued_by_user.pop(user_key, None)
+
+    def _retry_after(self) -> int:
+        service = self._service_ewma or 1.0
+        return max(1, math.ceil(service * (self._queued + 1) / self.max_concurrency))
+
+
+_controller: FairAdmissionController | None = None
+
+
+def get_ollama_admission() -> FairAdmissionController:
+    """Return the per-process admission controller for Ollama calls."""
+
+    global _controller
+    if _controller is None:
+        settings = get_settings()
+        _controller = FairAdmissionController(
+            max_concurrency=settings.ollama_max_concurrency,
+            max_queue=settings.ollama_max_queue,
+            max_queue_per_user=settings.ollama_max_queue_per_user,
+            queue_timeout_seconds=settings.ollama_queue_timeout_seconds,
+        )
+    return _controller
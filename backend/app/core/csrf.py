@@ -11,7 +11,7 @@ from .settings import get_settings
 _SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
 
 
-def require_csrf(request: Request) -> None:
+async def require_csrf(request: Request) -> None:
     """Validate CSRF token for state-changing requests using double-submit cookie."""
 
     if request.method.upper() in _SAFE_METHODS:
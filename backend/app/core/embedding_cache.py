@@ -0,0 +1,156 @@
+"""Content-addressed embedding cache with in-process LRU and Redis tiers."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+from .redis import get_redis
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_REDIS_PREFIX = "emb:"
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of embedding input: NFC, collapsed whitespace, trimmed."""
+
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model_key: str, normalized_text: str) -> str:
+    """Return the cache key for already-normalized text under ``model_key``."""
+
+    digest = hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
+    return f"{hashlib.sha256(model_key.encode('utf-8')).hexdigest()[:16]}:{digest}"
+
+
+def _pack(vector: list[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> list[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """Two-tier cache of float32 vectors keyed by model and text hash.
+
+    The local tier is an LRU bounded by the bytes of packed vectors it holds;
+    the Redis tier is shared across workers and expires entries after a TTL
+    (server-side ``maxmemory`` policy bounds it further). Redis errors are
+    logged and treated as misses so an outage never fails an embedding call.
+    """
+
+    def __init__(self, max_bytes: int, redis_ttl_seconds: int) -> None:
+        self.max_bytes = max_bytes
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+
+        self._memory_hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._redis_errors = 0
+
+    async def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Return cached vectors for whichever ``keys`` are present."""
+
+        found: dict[str, list[float]] = {}
+        remote: list[str] = []
+        for key in keys:
+            blob = self._entries.get(key)
+            if blob is None:
+                remote.append(key)
+                continue
+            self._entries.move_to_end(key)
+            self._memory_hits += 1
+            found[key] = _unpack(blob)
+
+        redis = get_redis()
+        if remote and redis is not None and self.redis_ttl_seconds > 0:
+            try:
+                blobs = await redis.mget([_REDIS_PREFIX + key for key in remote])
+            except Exception:  # pragma: no cover - depends on redis availability
+                self._redis_errors += 1
+                logger.warning("embedding cache redis lookup failed", exc_info=True)
+                blobs = [None] * len(remote)
+            for key, blob in zip(remote, blobs):
+                if blob is None:
+                    continue
+                self._redis_hits += 1
+                self._remember(key, blob)
+                found[key] = _unpack(blob)
+
+        self._misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, items: dict[str, list[float]]) -> None:
+        """Store freshly computed vectors in both tiers."""
+
+        packed = {key: _pack(vector) for key, vector in items.items()}
+        for key, blob in packed.items():
+            self._remember(key, blob)
+
+        redis = get_redis()
+        if packed and redis is not None and self.redis_ttl_seconds > 0:
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for key, blob in packed.items():
+                        pipe.set(_REDIS_PREFIX + key, blob, ex=self.redis_ttl_seconds)
+                    await pipe.execute()
+            except Exception:  # pragma: no cover - depends on redis availability
+                self._redis_errors += 1
+                logger.warning("embedding cache redis store failed", exc_info=True)
+
+    def snapshot(self) -> dict[str, int | float]:
+        lookups = self._memory_hits + self._redis_hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "memory_hits": self._memory_hits,
+            "redis_hits": self._redis_hits,
+            "misses": self._misses,
+            "hit_ratio": (
+                round((self._memory_hits + self._redis_hits) / lookups, 4) if lookups else 0
+            ),
+            "evictions": self._evictions,
+            "redis_errors": self._redis_errors,
+        }
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = blob
+        self._bytes += len(blob)
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._evictions += 1
+
+
+_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the per-process embedding cache."""
+
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = EmbeddingCache(
+            max_bytes=settings.embedding_cache_memory_mb * 1024 * 1024,
+            redis_ttl_seconds=settings.embedding_cache_redis_ttl_seconds,
+        )
+    return _cache
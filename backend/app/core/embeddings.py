@@ -0,0 +1,198 @@
+"""Micro-batched embedding calls against Ollama."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any
+
+from .admission import get_ollama_admission
+from .embedding_cache import cache_key, get_embedding_cache, normalize_text
+from .ollama_pool import normalize_model_name, post_json
+from .settings import get_settings
+
+# Batches share Ollama capacity with chat traffic as one extra "room". Each
+# batch carries many callers, so the room gets a few grants per round-robin turn.
+_BATCH_ADMISSION_KEY = "system:embeddings"
+_BATCH_ADMISSION_WEIGHT = 2
+
+
+@dataclass
+class _PendingBatch:
+    model: str
+    extra: dict[str, Any]
+    inputs: dict[str, asyncio.Future[list[float]]] = field(default_factory=dict)
+    timer: asyncio.TimerHandle | None = None
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent embedding requests into batched ``/api/embed`` calls.
+
+    Inputs for the same model and options are collected for up to
+    ``window_seconds`` or until ``max_batch_inputs`` are pending, then sent as
+    a single upstream request whose results are split back to each caller.
+    An input that is already pending or in flight is not sent again; callers
+    share the same future instead. Inputs found in the embedding cache never
+    reach the batch at all.
+    """
+
+    def __init__(self, window_seconds: float, max_batch_inputs: int) -> None:
+        self.window_seconds = window_seconds
+        self.max_batch_inputs = max_batch_inputs
+        self._pending: dict[str, _PendingBatch] = {}
+        self._inflight: dict[tuple[str, str], asyncio.Future[list[float]]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+        self._requested_inputs = 0
+        self._coalesced_inputs = 0
+        self._batches = 0
+        self._upstream_inputs = 0
+        self._failed_batches = 0
+
+    async def embed(
+        self,
+        model: str,
+        texts: list[str],
+        extra: dict[str, Any] | None = None,
+    ) -> list[list[float]]:
+        """Return one embedding per text, in order.
+
+        Texts are normalized (see :func:`normalize_text`) before lookup and
+        embedding, so the cache key always describes exactly what was embedded.
+        """
+
+        model = normalize_model_name(model)
+        extra = extra or {}
+        group_key = f"{model}\x00{json.dumps(extra, sort_keys=True)}"
+        normalized = [normalize_text(text) for text in texts]
+        self._requested_inputs += len(normalized)
+
+        cache = get_embedding_cache()
+        keys = [cache_key(group_key, text) for text in normalized]
+        cached = await cache.get_many(list(dict.fromkeys(keys)))
+
+        loop = asyncio.get_running_loop()
+        futures: list[asyncio.Future[list[float]]] = []
+        for text, key in zip(normalized, keys):
+            vector = cached.get(key)
+            if vector is not None:
+                future = loop.create_future()
+                future.set_result(vector)
+            else:
+                future = self._enqueue(loop, group_key, model, extra, text)
+            futures.append(future)
+
+        # Futures are shared between callers, so one caller going away must not
+        # cancel results that others are still waiting for.
+        return list(await asyncio.gather(*(asyncio.shield(f) for f in futures)))
+
+    def _enqueue(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        group_key: str,
+        model: str,
+        extra: dict[str, Any],
+        text: str,
+    ) -> asyncio.Future[list[float]]:
+        future = self._inflight.get((group_key, text))
+        if future is not None:
+            self._coalesced_inputs += 1
+            return future
+
+        future = loop.create_future()
+        self._inflight[(group_key, text)] = future
+        batch = self._pending.get(group_key)
+        if batch is None:
+            batch = self._pending[group_key] = _PendingBatch(model=model, extra=extra)
+        batch.inputs[text] = future
+        if len(batch.inputs) >= self.max_batch_inputs:
+            self._flush(group_key)
+        elif batch.timer is None:
+            batch.timer = loop.call_later(self.window_seconds, self._flush, group_key)
+        return future
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {
+            "requested_inputs": self._requested_inputs,
+            "coalesced_inputs": self._coalesced_inputs,
+            "batches": self._batches,
+            "failed_batches": self._failed_batches,
+            "upstream_inputs": self._upstream_inputs,
+            "avg_batch_size": (
+                round(self._upstream_inputs / self._batches, 2) if self._batches else 0
+            ),
+            "pending_inputs": sum(len(b.inputs) for b in self._pending.values()),
+            "inflight_inputs": len(self._inflight),
+        }
+
+    def _flush(self, group_key: str) -> None:
+        batch = self._pending.pop(group_key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._send(group_key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, group_key: str, batch: _PendingBatch) -> None:
+        texts = list(batch.inputs)
+        self._batches += 1
+        self._upstream_inputs += len(texts)
+        ticket = None
+        try:
+            ticket = await get_ollama_admission().acquire(
+                _BATCH_ADMISSION_KEY,
+                _BATCH_ADMISSION_KEY,
+                weight=_BATCH_ADMISSION_WEIGHT,
+                system=True,
+            )
+            data = await post_json(
+                "embed",
+                {**batch.extra, "model": batch.model, "input": texts},
+                model=batch.model,
+            )
+            embeddings = data.get("embeddings")
+            if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+                raise ValueError("ollama returned a mismatched embedding batch")
+            for future, embedding in zip(batch.inputs.values(), embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+            await get_embedding_cache().put_many(
+                {cache_key(group_key, text): vector for text, vector in zip(texts, embeddings)}
+            )
+        except Exception as exc:
+            self._failed_batches += 1
+            for future in batch.inputs.values():
+                if not future.done():
+                    future.set_exception(exc)
+                    # Callers may all have gone away; don't warn about unread errors.
+                    future.exception()
+        finally:
+            if ticket is not None:
+                ticket.release()
+            for text in texts:
+                self._inflight.pop((group_key, text), None)
+
+
+_batcher: EmbeddingBatcher | None = None
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Return the per-process embedding batcher."""
+
+    global _batcher
+    if _batcher is None:
+        settings = get_settings()
+        _batcher = EmbeddingBatcher(
+            window_seconds=settings.embedding_batch_window_ms / 1000,
+            max_batch_inputs=settings.embedding_batch_max_inputs,
+        )
+    return _batcher
+
+
+async def embed_texts(texts: list[str], model: str | None = None) -> list[list[float]]:
+    """Embed ``texts`` with the configured embedding model via the batcher."""
+
+    return await get_embedding_batcher().embed(model or get_settings().embedding_model, texts)
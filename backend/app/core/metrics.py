@@ -0,0 +1,24 @@
+"""Helpers shared by the in-process queue and pool telemetry served on /health."""
+
+from __future__ import annotations
+
+# Recent waits kept per queue for percentiles; old samples fall off the end.
+WAIT_SAMPLE_SIZE = 1024
+SERVICE_EWMA_ALPHA = 0.2
+
+
+def percentile_ms(samples: list[float], quantile: float) -> float | None:
+    """Nearest-rank ``quantile`` of sorted samples in seconds, in milliseconds."""
+
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(quantile * len(samples)))
+    return round(samples[index] * 1000, 3)
+
+
+def ewma(current: float | None, sample: float, alpha: float = SERVICE_EWMA_ALPHA) -> float:
+    """Fold ``sample`` into a moving average; the first sample seeds it."""
+
+    if current is None:
+        return sample
+    return current + alpha * (sample - current)
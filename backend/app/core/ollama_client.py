@@ -0,0 +1,66 @@
+"""Process-wide pooled HTTP client used to talk to Ollama."""
+
+from __future__ import annotations
+
+import importlib.util
+
+import httpx
+
+from .settings import Settings, get_settings
+
+_client: httpx.AsyncClient | None = None
+
+
+def _http2_available() -> bool:
+    """Return True when the optional ``h2`` package is installed."""
+
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_ollama_client(settings: Settings) -> httpx.AsyncClient:
+    """Create an AsyncClient with connection limits and per-phase timeouts."""
+
+    limits = httpx.Limits(
+        max_connections=settings.ollama_max_connections,
+        max_keepalive_connections=settings.ollama_max_keepalive_connections,
+        keepalive_expiry=settings.ollama_keepalive_expiry_seconds,
+    )
+    # The read timeout bounds the gap between streamed chunks, not the whole
+    # generation, so long completions keep working while hung sockets fail.
+    timeout = httpx.Timeout(
+        connect=settings.ollama_connect_timeout_seconds,
+        read=settings.ollama_read_timeout_seconds,
+        write=settings.ollama_write_timeout_seconds,
+        pool=settings.ollama_pool_timeout_seconds,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=timeout,
+        http2=settings.ollama_http2 and _http2_available(),
+    )
+
+
+async def startup_ollama_client() -> None:
+    """Create the shared client; called from the application startup hook."""
+
+    global _client
+    if _client is None:
+        _client = build_ollama_client(get_settings())
+
+
+async def shutdown_ollama_client() -> None:
+    """Close pooled connections; called from the application shutdown hook."""
+
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the app lifecycle."""
+
+    global _client
+    if _client is None:
+        _client = build_ollama_client(get_settings())
+    return _client
@@ -0,0 +1,271 @@
+"""Upstream pool for Ollama with least-loaded and model-affinity routing."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from dataclasses import dataclass, field
+
+import httpx
+
+from .ollama_client import get_ollama_client
+from .settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+_LATENCY_EWMA_ALPHA = 0.3
+
+
+def normalize_model_name(model: str) -> str:
+    """Match Ollama's naming, where ``llama3`` and ``llama3:latest`` are the same model."""
+
+    model = model.strip()
+    return model if ":" in model else f"{model}:latest"
+
+
+def ollama_upstreams(settings: Settings) -> list[str]:
+    """Return configured Ollama base URLs, falling back to ``ollama_host``."""
+
+    hosts = [h.strip().rstrip("/") for h in (settings.ollama_hosts or "").split(",") if h.strip()]
+    return hosts or [settings.ollama_host.rstrip("/")]
+
+
+@dataclass
+class UpstreamNode:
+    url: str
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    ejections: int = 0
+    # model name -> monotonic time it was last seen loaded on this node
+    loaded_models: dict[str, float] = field(default_factory=dict)
+    # model name -> time-to-first-byte EWMA for warm inference calls
+    model_latency: dict[str, float] = field(default_factory=dict)
+
+    def has_model(self, model: str, now: float, ttl: float) -> bool:
+        seen = self.loaded_models.get(model)
+        return seen is not None and now - seen <= ttl
+
+    def snapshot(self, now: float, ttl: float) -> dict[str, object]:
+        return {
+            "url": self.url,
+            "healthy": self.ejected_until <= now,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ejections": self.ejections,
+            "latency_ewma_ms": {
+                model: round(latency * 1000, 3) for model, latency in sorted(self.model_latency.items())
+            },
+            "loaded_models": sorted(m for m in self.loaded_models if self.has_model(m, now, ttl)),
+        }
+
+
+class OllamaPool:
+    """Pick an upstream per request from passive health and live load.
+
+    Routing order: healthy nodes that already have the model loaded, then any
+    healthy node; ties go to the fewest outstanding requests and then the
+    lowest time-to-first-byte EWMA for that model. Nodes are ejected for a
+    cool-down after repeated failures or when their EWMA for a model falls far
+    behind the fastest healthy peer serving the same model. If every node is
+    ejected the pool fails open rather than refusing traffic.
+
+    Latency is only learned from inference calls on a model the node already
+    had loaded: metadata calls are not comparable, and a cold load can take
+    many times a warm call on a perfectly healthy node.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        eject_after_failures: int,
+        eject_seconds: float,
+        latency_eject_factor: float,
+        model_affinity_ttl_seconds: float,
+    ) -> None:
+        self.nodes = [UpstreamNode(url=url) for url in urls]
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+        self.latency_eject_factor = latency_eject_factor
+        self.model_affinity_ttl_seconds = model_affinity_ttl_seconds
+
+    def choose(self, model: str | None, exclude: set[str] | None = None) -> UpstreamNode | None:
+        """Return the best node for ``model``, skipping URLs in ``exclude``."""
+
+        now = time.monotonic()
+        eligible = [n for n in self.nodes if not exclude or n.url not in exclude]
+        if not eligible:
+            return None
+        candidates = [n for n in eligible if n.ejected_until <= now] or eligible
+
+        if model:
+            warm = [
+                n for n in candidates
+                if n.has_model(model, now, self.model_affinity_ttl_seconds)
+            ]
+            candidates = warm or candidates
+
+        return min(
+            candidates,
+            key=lambda n: (n.outstanding, n.model_latency.get(model, 0.0) if model else 0.0),
+        )
+
+    def begin(self, node: UpstreamNode) -> None:
+        node.outstanding += 1
+        node.requests += 1
+
+    def end(self, node: UpstreamNode) -> None:
+        node.outstanding -= 1
+
+    def record_success(self, node: UpstreamNode, latency: float, model: str | None) -> None:
+        """Record a successful call; ``model`` is set only for inference that the node served."""
+
+        now = time.monotonic()
+        node.consecutive_failures = 0
+        if not model:
+            return
+        warm = node.has_model(model, now, self.model_affinity_ttl_seconds)
+        node.loaded_models[model] = now
+        if not warm:
+            return  # a first load says nothing about the node's health
+
+        current = node.model_latency.get(model)
+        if current is None:
+            current = latency
+        else:
+            current += _LATENCY_EWMA_ALPHA * (latency - current)
+        node.model_latency[model] = current
+
+        peers = [
+            n.model_latency[model]
+            for n in self.nodes
+            if n is not node and n.ejected_until <= now and model in n.model_latency
+        ]
+        if peers and current > self.latency_eject_factor * min(peers):
+            self._eject(node, now, reason="latency")
+
+    def record_failure(self, node: UpstreamNode) -> None:
+        node.failures += 1
+        node.consecutive_failures += 1
+        if node.consecutive_failures >= self.eject_after_failures:
+            self._eject(node, time.monotonic(), reason="failures")
+
+    def update_loaded_models(self, node: UpstreamNode, models: list[str]) -> None:
+        now = time.monotonic()
+        node.loaded_models = {normalize_model_name(m): now for m in models}
+
+    def snapshot(self) -> list[dict[str, object]]:
+        now = time.monotonic()
+        return [n.snapshot(now, self.model_affinity_ttl_seconds) for n in self.nodes]
+
+    def _eject(self, node: UpstreamNode, now: float, reason: str) -> None:
+        if len(self.nodes) == 1:
+            return
+        logger.warning("ejecting ollama upstream %s (%s)", node.url, reason)
+        node.ejected_until = now + self.eject_seconds
+        node.ejections += 1
+        node.consecutive_failures = 0
+        # Re-learn latency from scratch once the node is back in rotation.
+        node.model_latency = {}
+
+
+async def post_json(
+    path: str,
+    payload: dict[str, object],
+    model: str | None = None,
+) -> dict[str, object]:
+    """POST ``payload`` to ``/api/{path}`` on the best node and return the JSON body.
+
+    Connect failures fail over to the next node like the streaming proxy does;
+    other transport errors and non-2xx responses raise ``httpx.HTTPError``.
+    """
+
+    client = get_ollama_client()
+    pool = get_ollama_pool()
+    tried: set[str] = set()
+    while True:
+        node = pool.choose(model, exclude=tried)
+        if node is None:
+            raise httpx.ConnectError("no reachable ollama upstream")
+        tried.add(node.url)
+
+        pool.begin(node)
+        started = time.monotonic()
+        try:
+            response = await client.post(f"{node.url}/api/{path}", json=payload)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            pool.record_failure(node)
+            continue
+        except httpx.HTTPError:
+            pool.record_failure(node)
+            raise
+        finally:
+            pool.end(node)
+
+        if response.status_code >= 500:
+            pool.record_failure(node)
+        else:
+            loaded = model if response.status_code < 400 else None
+            pool.record_success(node, time.monotonic() - started, loaded)
+        response.raise_for_status()
+        return response.json()
+
+
+async def refresh_loaded_models(pool: OllamaPool, client: httpx.AsyncClient, interval: float) -> None:
+    """Poll ``/api/ps`` on every node so affinity survives idle periods."""
+
+    while True:
+        for node in pool.nodes:
+            try:
+                response = await client.get(f"{node.url}/api/ps")
+                response.raise_for_status()
+                models = [m.get("name") or m.get("model") for m in response.json().get("models", [])]
+                pool.update_loaded_models(node, [m for m in models if m])
+            except (httpx.HTTPError, ValueError):
+                # Health is judged from real traffic; a failed probe only skips the refresh.
+                continue
+        await asyncio.sleep(interval)
+
+
+_pool: OllamaPool | None = None
+_refresh_task: asyncio.Task[None] | None = None
+
+
+def get_ollama_pool() -> OllamaPool:
+    """Return the per-process upstream pool."""
+
+    global _pool
+    if _pool is None:
+        settings = get_settings()
+        _pool = OllamaPool(
+            urls=ollama_upstreams(settings),
+            eject_after_failures=settings.ollama_eject_after_failures,
+            eject_seconds=settings.ollama_eject_seconds,
+            latency_eject_factor=settings.ollama_latency_eject_factor,
+            model_affinity_ttl_seconds=settings.ollama_model_affinity_ttl_seconds,
+        )
+    return _pool
+
+
+async def startup_ollama_pool(client: httpx.AsyncClient) -> None:
+    """Start the background loaded-model refresher when enabled."""
+
+    global _refresh_task
+    interval = get_settings().ollama_models_refresh_seconds
+    if interval > 0 and _refresh_task is None:
+        _refresh_task = asyncio.create_task(refresh_loaded_models(get_ollama_pool(), client, interval))
+
+
+async def shutdown_ollama_pool() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _refresh_task
+        _refresh_task = None
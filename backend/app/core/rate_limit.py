@@ -0,0 +1,209 @@
+"""Sliding-window rate limits shared across workers through Redis."""
+
+from __future__ import annotations
+
+import hashlib
+import ipaddress
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+
+from starlette.requests import Request
+
+from .redis import get_redis
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Each hit is a ZSET member scored by its time; members older than the window
+# are trimmed before counting, so the limit applies to any window-long span.
+# Checking and recording happen in one call, so concurrent hits cannot all
+# slip under the limit.
+_HIT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1] - ARGV[2])
+local count = redis.call('ZCARD', KEYS[1])
+if count >= tonumber(ARGV[3]) then
+  local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+  return {count, tonumber(oldest[2]) + ARGV[2] - ARGV[1]}
+end
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return {count + 1, 0}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    count: int
+    retry_after_ms: int
+    # The recorded hit, for :meth:`SlidingWindowLimiter.undo`; empty when limited.
+    member: str = ""
+
+    @property
+    def limited(self) -> bool:
+        return self.retry_after_ms > 0
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until the oldest hit leaves the window, for ``Retry-After``."""
+
+        return max(1, -(-self.retry_after_ms // 1000))
+
+
+class SlidingWindowLimiter:
+    """At most ``limit`` hits per key in any ``window_seconds`` span.
+
+    Methods return None when Redis is unavailable so callers can fall back
+    to their own bookkeeping instead of failing open silently.
+    """
+
+    def __init__(self, prefix: str, limit: int, window_seconds: float) -> None:
+        self.prefix = prefix
+        self.limit = limit
+        self.window_ms = int(window_seconds * 1000)
+
+        self._allowed = 0
+        self._limited = 0
+        self._errors = 0
+
+    async def hit(self, key: str) -> RateLimitResult | None:
+        """Record one hit unless the key is already at its limit."""
+
+        now_ms = int(time.time() * 1000)
+        member = f"{now_ms}:{uuid.uuid4().hex[:8]}"
+        result = await self._eval(_HIT, key, now_ms, member)
+        if result is None or result.limited:
+            return result
+        return RateLimitResult(result.count, result.retry_after_ms, member)
+
+    async def undo(self, key: str, result: RateLimitResult | None) -> None:
+        """Forget one recorded hit, e.g. for an attempt that was never evaluated."""
+
+        redis = get_redis()
+        if redis is None or result is None or not result.member:
+            return
+        try:
+            await redis.zrem(self._key(key), result.member)
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._errors += 1
+            logger.warning("rate limit undo failed", exc_info=True)
+
+    async def reset(self, key: str) -> None:
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.delete(self._key(key))
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._errors += 1
+            logger.warning("rate limit reset failed", exc_info=True)
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window_ms / 1000,
+            "allowed": self._allowed,
+            "limited": self._limited,
+            "errors": self._errors,
+        }
+
+    def _key(self, key: str) -> str:
+        # Hash so raw emails and addresses never appear in Redis keys.
+        return self.prefix + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+    async def _eval(self, script: str, key: str, now_ms: int, *extra: str) -> RateLimitResult | None:
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            count, retry_after_ms = await redis.eval(
+                script, 1, self._key(key), now_ms, self.window_ms, self.limit, *extra
+            )
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._errors += 1
+            logger.warning("rate limit check failed", exc_info=True)
+            return None
+        result = RateLimitResult(int(count), int(retry_after_ms))
+        if result.limited:
+            self._limited += 1
+        else:
+            self._allowed += 1
+        return result
+
+
+_Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+def parse_networks(spec: str | None) -> tuple[_Network, ...]:
+    """Parse a comma-separated list of addresses or CIDR ranges."""
+
+    return tuple(
+        ipaddress.ip_network(item.strip(), strict=False)
+        for item in (spec or "").split(",")
+        if item.strip()
+    )
+
+
+def _in_networks(address: str, networks: tuple[_Network, ...]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+@dataclass
+class LoginLimiters:
+    by_ip: SlidingWindowLimiter
+    by_email: SlidingWindowLimiter
+    trusted_proxies: tuple[_Network, ...] = ()
+
+    def client_address(self, request: Request) -> str:
+        """The address to throttle: the socket peer, or for a trusted proxy
+        the nearest untrusted hop in ``X-Forwarded-For``.
+
+        The header is read right to left because only the entries appended by
+        our own proxies can be trusted; anything further left is client input.
+        """
+
+        peer = request.client.host if request.client else "unknown"
+        if not _in_networks(peer, self.trusted_proxies):
+            return peer
+        hops = [
+            hop.strip()
+            for hop in request.headers.get("x-forwarded-for", "").split(",")
+            if hop.strip()
+        ]
+        for hop in reversed(hops):
+            if not _in_networks(hop, self.trusted_proxies):
+                return hop
+        return hops[0] if hops else peer
+
+    def snapshot(self) -> dict[str, dict[str, int | float]]:
+        return {"ip": self.by_ip.snapshot(), "email": self.by_email.snapshot()}
+
+
+_login_limiters: LoginLimiters | None = None
+
+
+def get_login_limiters() -> LoginLimiters:
+    """Return the per-process login limiters (attempts per client IP and per email)."""
+
+    global _login_limiters
+    if _login_limiters is None:
+        settings = get_settings()
+        _login_limiters = LoginLimiters(
+            by_ip=SlidingWindowLimiter(
+                "ratelimit:login:ip:",
+                settings.login_ip_max_attempts,
+                settings.login_ip_window_seconds,
+            ),
+            by_email=SlidingWindowLimiter(
+                "ratelimit:login:email:",
+                settings.login_max_failed_attempts,
+                settings.login_lockout_seconds,
+            ),
+            trusted_proxies=parse_networks(settings.login_trusted_proxies),
+        )
+    return _login_limiters
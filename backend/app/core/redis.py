@@ -0,0 +1,67 @@
+"""Shared Redis clients (optional dependency)."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .settings import get_settings
+
+try:
+    import redis as redis_sync
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - redis is optional
+    redis_sync = None
+    redis_asyncio = None
+
+if TYPE_CHECKING:  # pragma: no cover
+    from redis import Redis
+    from redis.asyncio import Redis as AsyncRedis
+
+_async_client: "AsyncRedis | None" = None
+_sync_client: "Redis | None" = None
+
+
+def redis_available() -> bool:
+    """Return True when the redis package is installed and a URL is configured."""
+
+    return redis_asyncio is not None and bool(get_settings().redis_url)
+
+
+def get_redis() -> "AsyncRedis | None":
+    """Return the shared asyncio client, or None when Redis is not configured."""
+
+    global _async_client
+    if _async_client is None and redis_available():
+        settings = get_settings()
+        _async_client = redis_asyncio.from_url(
+            settings.redis_url,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_socket_timeout_seconds,
+        )
+    return _async_client
+
+
+def get_sync_redis() -> "Redis | None":
+    """Return the shared blocking client for use from sync endpoints."""
+
+    global _sync_client
+    if _sync_client is None and redis_available():
+        settings = get_settings()
+        _sync_client = redis_sync.from_url(
+            settings.redis_url,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_socket_timeout_seconds,
+        )
+    return _sync_client
+
+
+async def shutdown_redis() -> None:
+    """Close pooled Redis connections; called from the application shutdown hook."""
+
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
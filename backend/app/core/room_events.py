@@ -0,0 +1,241 @@
+"""Per-room event fan-out across API workers via Redis pub/sub."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+from .redis import get_redis, get_sync_redis
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_CHANNEL_PREFIX = "room:"
+
+
+@dataclass(eq=False)
+class RoomSubscription:
+    """One connected client's bounded buffer of room events."""
+
+    room_id: str
+    queue: asyncio.Queue[dict[str, Any] | None]
+    closed: bool = False
+
+    async def get(self) -> dict[str, Any] | None:
+        """Next event, or None once the subscription has been closed."""
+
+        return await self.queue.get()
+
+
+@dataclass
+class _Room:
+    subscribers: set[RoomSubscription] = field(default_factory=set)
+    # Whether this worker currently holds a Redis subscription for the room.
+    listening: bool = False
+
+
+class RoomEventHub:
+    """Deliver events published for a room to this worker's local subscribers.
+
+    Each worker holds one Redis pub/sub connection and subscribes to a room's
+    channel while it has at least one local subscriber, so a message is sent
+    over the network once per interested worker, not once per client. Without
+    Redis, events published in this process are dispatched locally.
+
+    Every subscriber has a bounded queue. A subscriber whose queue is full is
+    dropped rather than allowed to buffer without limit; clients reconnect
+    with their last event id and catch up from the database.
+
+    A room whose subscribe failed, or whose subscription may have been lost
+    with the connection, is resubscribed by the reader loop about once a
+    second until it succeeds.
+    """
+
+    def __init__(self, buffer_size: int) -> None:
+        self.buffer_size = buffer_size
+        self._rooms: dict[str, _Room] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pubsub = None
+        self._reader: asyncio.Task[None] | None = None
+
+        self._published = 0
+        self._publish_errors = 0
+        self._delivered = 0
+        self._dropped_subscribers = 0
+
+    async def subscribe(self, room_id: str) -> RoomSubscription:
+        self._loop = asyncio.get_running_loop()
+        subscription = RoomSubscription(room_id, asyncio.Queue(maxsize=self.buffer_size))
+        room = self._rooms.get(room_id)
+        if room is None:
+            room = self._rooms[room_id] = _Room()
+            await self._listen(room_id, room)
+        room.subscribers.add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: RoomSubscription) -> None:
+        room = self._rooms.get(subscription.room_id)
+        if room is None:
+            return
+        room.subscribers.discard(subscription)
+        if not room.subscribers:
+            del self._rooms[subscription.room_id]
+            if self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(_CHANNEL_PREFIX + subscription.room_id)
+                except Exception:  # pragma: no cover - depends on redis availability
+                    logger.warning("room events unsubscribe failed", exc_info=True)
+
+    def publish(self, room_id: str, event: dict[str, Any]) -> None:
+        """Publish ``event`` to every worker; safe to call from sync endpoints.
+
+        Failures are logged, not raised: clients recover missed events on
+        reconnect, so a message must never fail to post because of fan-out.
+        """
+
+        self._published += 1
+        redis = get_sync_redis()
+        if redis is None:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._dispatch, room_id, event)
+            return
+        try:
+            redis.publish(_CHANNEL_PREFIX + room_id, json.dumps(event))
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._publish_errors += 1
+            logger.warning("room event publish failed", exc_info=True)
+
+    async def publish_async(self, room_id: str, event: dict[str, Any]) -> None:
+        """:meth:`publish` for code already running on the event loop."""
+
+        self._published += 1
+        redis = get_redis()
+        if redis is None:
+            self._dispatch(room_id, event)
+            return
+        try:
+            await redis.publish(_CHANNEL_PREFIX + room_id, json.dumps(event))
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._publish_errors += 1
+            logger.warning("room event publish failed", exc_info=True)
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "rooms": len(self._rooms),
+            "subscribers": sum(len(room.subscribers) for room in self._rooms.values()),
+            "published": self._published,
+            "publish_errors": self._publish_errors,
+            "delivered": self._delivered,
+            "dropped_subscribers": self._dropped_subscribers,
+        }
+
+    async def close(self) -> None:
+        for room in self._rooms.values():
+            for subscription in room.subscribers:
+                self._close(subscription)
+        self._rooms.clear()
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    async def _listen(self, room_id: str, room: _Room) -> None:
+        redis = get_redis()
+        if redis is None:
+            return
+        if self._pubsub is None:
+            self._pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        await self._subscribe(room_id, room)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def _subscribe(self, room_id: str, room: _Room) -> None:
+        try:
+            await self._pubsub.subscribe(_CHANNEL_PREFIX + room_id)
+        except Exception:  # pragma: no cover - depends on redis availability
+            logger.warning("room events subscribe failed", exc_info=True)
+            return
+        room.listening = True
+
+    async def _resubscribe(self) -> None:
+        for room_id, room in list(self._rooms.items()):
+            if not room.listening and self._pubsub is not None:
+                await self._subscribe(room_id, room)
+
+    async def _read(self) -> None:
+        while self._pubsub is not None and self._rooms:
+            await self._resubscribe()
+            if not any(room.listening for room in self._rooms.values()):
+                await asyncio.sleep(1.0)  # nothing to read until a subscribe succeeds
+                continue
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - depends on redis availability
+                logger.warning("room events read failed", exc_info=True)
+                # The connection may have dropped; subscribe every room again.
+                for room in self._rooms.values():
+                    room.listening = False
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                event = json.loads(message["data"])
+            except ValueError:
+                continue
+            self._dispatch(channel.removeprefix(_CHANNEL_PREFIX), event)
+
+    def _dispatch(self, room_id: str, event: dict[str, Any]) -> None:
+        room = self._rooms.get(room_id)
+        if room is None:
+            return
+        for subscription in list(room.subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+                self._delivered += 1
+            except asyncio.QueueFull:
+                room.subscribers.discard(subscription)
+                self._dropped_subscribers += 1
+                self._close(subscription)
+
+    @staticmethod
+    def _close(subscription: RoomSubscription) -> None:
+        subscription.closed = True
+        # Make room for the end-of-stream marker; the client resyncs anyway.
+        while True:
+            try:
+                subscription.queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                subscription.queue.get_nowait()
+
+
+_hub: RoomEventHub | None = None
+
+
+def get_room_event_hub() -> RoomEventHub:
+    """Return the per-process room event hub."""
+
+    global _hub
+    if _hub is None:
+        _hub = RoomEventHub(buffer_size=get_settings().room_events_buffer_size)
+    return _hub
+
+
+async def shutdown_room_events() -> None:
+    """End open event streams; called from the application shutdown hook."""
+
+    global _hub
+    if _hub is not None:
+        await _hub.close()
+        _hub = None
@@ -2,17 +2,41 @@
 
 from __future__ import annotations
 
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, TypeVar
 
 from passlib.context import CryptContext
 
-_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .metrics import WAIT_SAMPLE_SIZE, ewma, percentile_ms
+from .settings import get_settings
+
+_T = TypeVar("_T")
+
+
+@lru_cache
+def _pwd_context() -> CryptContext:
+    # Hashes outside the configured cost are flagged for rehash on next login.
+    rounds = get_settings().password_bcrypt_rounds
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
 
 
 def hash_password(password: str) -> str:
     """Return a bcrypt hash for the provided password."""
 
-    return _pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str | None) -> bool:
@@ -20,7 +44,135 @@ def verify_password(plain_password: str, hashed_password: str | None) -> bool:
 
     if not hashed_password:
         return False
-    return _pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str | None) -> tuple[bool, str | None]:
+    if not hashed_password:
+        return False, None
+    return _pwd_context().verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Run bcrypt on its own small thread pool with a bounded queue.
+
+    bcrypt holds a thread for the full cost of a hash, so running it on the
+    default threadpool lets a login wave starve every other sync endpoint.
+    Here at most ``workers`` hashes run at once and at most ``max_queue`` wait;
+    beyond that callers get :class:`PasswordHasherBusy` immediately.
+    """
+
+    def __init__(self, workers: int, max_queue: int) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+
+        self._queued = 0
+        self._running = 0
+        self._max_queue_depth = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+        self._wait_samples: deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._service_ewma: float | None = None
+
+    async def run(self, fn: Callable[..., _T], *args: object) -> _T:
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise PasswordHasherBusy(self._retry_after())
+            self._queued += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queued)
+        future = self._executor.submit(self._timed, fn, args, time.monotonic())
+        return await asyncio.wrap_future(future)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str | None
+    ) -> tuple[bool, str | None]:
+        """Verify a password; also return a new hash when the stored cost is outdated."""
+
+        verified, new_hash = await self.run(_verify_and_update, plain_password, hashed_password)
+        if new_hash is not None:
+            self._rehashed += 1
+        return verified, new_hash
+
+    async def hash(self, plain_password: str) -> str:
+        return await self.run(hash_password, plain_password)
+
+    def snapshot(self) -> dict[str, float | int | None]:
+        samples = sorted(self._wait_samples)
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "max_queue_depth": self._max_queue_depth,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "rehashed": self._rehashed,
+            "wait_p50_ms": percentile_ms(samples, 0.50),
+            "wait_p95_ms": percentile_ms(samples, 0.95),
+            "wait_p99_ms": percentile_ms(samples, 0.99),
+            "service_ewma_ms": (
+                round(self._service_ewma * 1000, 3) if self._service_ewma is not None else None
+            ),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _timed(self, fn: Callable[..., _T], args: tuple[object, ...], submitted_at: float) -> _T:
+        started = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait_samples.append(started - submitted_at)
+        try:
+            return fn(*args)
+        finally:
+            service = time.monotonic() - started
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._service_ewma = ewma(self._service_ewma, service)
+
+    def _retry_after(self) -> int:
+        service = self._service_ewma or 0.25
+        return max(1, math.ceil(service * (self._queued + 1) / self.workers))
+
+
+_hasher: PasswordHasher | None = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Return the per-process password hashing pool."""
+
+    global _hasher
+    if _hasher is None:
+        settings = get_settings()
+        _hasher = PasswordHasher(
+            workers=settings.password_hash_workers,
+            max_queue=settings.password_hash_max_queue,
+        )
+    return _hasher
+
+
+def shutdown_password_hasher() -> None:
+    """Stop the hashing pool; called from the application shutdown hook."""
+
+    global _hasher
+    if _hasher is not None:
+        _hasher.shutdown()
+        _hasher = None
 
 
 def utc_now_ms() -> int:
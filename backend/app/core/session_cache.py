@@ -0,0 +1,296 @@
+"""Session nonce cache so authenticated requests skip the ``user_auth`` lookup.
+
+A session is valid while the nonce stored in it matches the user's current
+``session_nonce``. The current nonce is cached per worker for a few seconds
+and in Redis (``session:nonce:{user_id}``) across workers. Login writes the
+new nonce to Redis before anything else and publishes the user id on
+``session:invalidate`` so every worker drops its local copy at once; if a
+message is lost, a stale local entry lives at most ``session_cache_ttl_seconds``.
+
+A session presenting a nonce that differs from the local copy is rechecked
+against Redis (then the database) before being rejected, so a login handled
+by another worker is accepted here before the invalidation arrives.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from .redis import get_redis, get_sync_redis
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "session:nonce:"
+_CHANNEL = "session:invalidate"
+# Cached in place of a nonce for users that do not exist.
+_MISSING = ""
+
+
+def _key(user_id: str) -> str:
+    return _KEY_PREFIX + user_id
+
+
+class SessionNonceCache:
+    """Two-tier cache of each user's current session nonce."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int, redis_ttl_seconds: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._pubsub = None
+        self._reader: asyncio.Task[None] | None = None
+
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._db_loads = 0
+        self._rejected = 0
+        self._redis_errors = 0
+        self._invalidations = 0
+        self._last_invalidation_ms = 0.0
+        self._max_invalidation_ms = 0.0
+
+    def validate(self, user_id: str, nonce: str, load: Callable[[], str | None]) -> bool:
+        """Return True when ``nonce`` is the user's current one.
+
+        ``load`` reads the nonce from the database and is only called when
+        neither tier can confirm the session.
+        """
+
+        if self._local_matches(user_id, nonce):
+            return True
+        current = self._get_redis(user_id)
+        if current is not None:
+            self._redis_hits += 1
+        else:
+            self._db_loads += 1
+            current = load() or _MISSING
+            self._set_redis(user_id, current)
+        return self._settle(user_id, nonce, current)
+
+    async def validate_async(
+        self, user_id: str, nonce: str, load: Callable[[], Awaitable[str | None]]
+    ) -> bool:
+        """:meth:`validate` for async routes; ``load`` is awaited."""
+
+        if self._local_matches(user_id, nonce):
+            return True
+        current = await self._get_redis_async(user_id)
+        if current is not None:
+            self._redis_hits += 1
+        else:
+            self._db_loads += 1
+            current = await load() or _MISSING
+            await self._set_redis_async(user_id, current)
+        return self._settle(user_id, nonce, current)
+
+    def remember(self, user_id: str, nonce: str) -> None:
+        """Record a freshly rotated nonce and tell every worker to drop the old one."""
+
+        self._set_local(user_id, nonce)
+        redis = get_sync_redis()
+        if redis is None:
+            return
+        try:
+            with redis.pipeline() as pipe:
+                pipe.set(_key(user_id), nonce, ex=self.redis_ttl_seconds)
+                pipe.publish(_CHANNEL, json.dumps({"user_id": user_id, "ts": time.time()}))
+                pipe.execute()
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._redis_errors += 1
+            logger.warning("session nonce publish failed", exc_info=True)
+            # Other workers may now trust a stale nonce for up to ttl_seconds.
+            self._delete_redis(user_id)
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {
+            "entries": len(self._entries),
+            "local_hits": self._local_hits,
+            "redis_hits": self._redis_hits,
+            "db_loads": self._db_loads,
+            "rejected": self._rejected,
+            "redis_errors": self._redis_errors,
+            "invalidations": self._invalidations,
+            "last_invalidation_ms": round(self._last_invalidation_ms, 3),
+            "max_invalidation_ms": round(self._max_invalidation_ms, 3),
+            "max_staleness_seconds": self.ttl_seconds,
+        }
+
+    async def start(self) -> None:
+        """Subscribe to invalidations; without Redis the local TTL alone bounds staleness."""
+
+        redis = get_redis()
+        if redis is None or self._reader is not None:
+            return
+        try:
+            self._pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(_CHANNEL)
+        except Exception:  # pragma: no cover - depends on redis availability
+            logger.warning("session invalidation subscribe failed", exc_info=True)
+            self._pubsub = None
+            return
+        self._reader = asyncio.create_task(self._read())
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    async def _read(self) -> None:
+        while self._pubsub is not None:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - depends on redis availability
+                logger.warning("session invalidation read failed", exc_info=True)
+                # Messages may have been missed; fall back to the database-backed tiers.
+                self.clear()
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            try:
+                payload = json.loads(message["data"])
+            except ValueError:
+                continue
+            self._invalidate(payload["user_id"], payload.get("ts"))
+
+    def _invalidate(self, user_id: str, published_at: float | None) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+        self._invalidations += 1
+        if published_at is not None:
+            elapsed = max(time.time() - published_at, 0.0) * 1000
+            self._last_invalidation_ms = elapsed
+            self._max_invalidation_ms = max(self._max_invalidation_ms, elapsed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _local_matches(self, user_id: str, nonce: str) -> bool:
+        if self._get_local(user_id) == nonce:
+            self._local_hits += 1
+            return True
+        return False
+
+    def _settle(self, user_id: str, nonce: str, current: str) -> bool:
+        self._set_local(user_id, current)
+        if current != _MISSING and current == nonce:
+            return True
+        self._rejected += 1
+        return False
+
+    def _get_local(self, user_id: str) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            nonce, expires_at = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return nonce
+
+    def _set_local(self, user_id: str, nonce: str) -> None:
+        with self._lock:
+            self._entries[user_id] = (nonce, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_redis(self, user_id: str) -> str | None:
+        redis = get_sync_redis()
+        if redis is None:
+            return None
+        try:
+            value = redis.get(_key(user_id))
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._redis_errors += 1
+            logger.warning("session nonce lookup failed", exc_info=True)
+            return None
+        return value.decode() if value is not None else None
+
+    def _set_redis(self, user_id: str, nonce: str) -> None:
+        redis = get_sync_redis()
+        if redis is None:
+            return
+        try:
+            # NX: never overwrite a nonce a concurrent login just wrote.
+            redis.set(_key(user_id), nonce, ex=self.redis_ttl_seconds, nx=True)
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._redis_errors += 1
+            logger.warning("session nonce store failed", exc_info=True)
+
+    async def _get_redis_async(self, user_id: str) -> str | None:
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            value = await redis.get(_key(user_id))
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._redis_errors += 1
+            logger.warning("session nonce lookup failed", exc_info=True)
+            return None
+        return value.decode() if value is not None else None
+
+    async def _set_redis_async(self, user_id: str, nonce: str) -> None:
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(_key(user_id), nonce, ex=self.redis_ttl_seconds, nx=True)
+        except Exception:  # pragma: no cover - depends on redis availability
+            self._redis_errors += 1
+            logger.warning("session nonce store failed", exc_info=True)
+
+    def _delete_redis(self, user_id: str) -> None:
+        redis = get_sync_redis()
+        if redis is None:
+            return
+        try:
+            redis.delete(_key(user_id))
+        except Exception:  # pragma: no cover - depends on redis availability
+            logger.warning("session nonce delete failed", exc_info=True)
+
+
+_cache: SessionNonceCache | None = None
+
+
+def get_session_cache() -> SessionNonceCache:
+    """Return the per-process session nonce cache."""
+
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = SessionNonceCache(
+            ttl_seconds=settings.session_cache_ttl_seconds,
+            max_entries=settings.session_cache_max_entries,
+            redis_ttl_seconds=settings.session_cache_redis_ttl_seconds,
+        )
+    return _cache
+
+
+async def startup_session_cache() -> None:
+    await get_session_cache().start()
+
+
+async def shutdown_session_cache() -> None:
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
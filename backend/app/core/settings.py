@@ -1,6 +1,7 @@
 """Application settings using Pydantic v2 BaseSettings."""
 
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -8,8 +9,63 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     environment: str = "development"
     database_url: str = "postgresql+psycopg://app:app@db:5432/appdb"
+    database_async: bool = False
+    database_pool_size: int = 10
+    database_max_overflow: int = 20
+    database_pool_timeout_seconds: float = 10.0
+    database_pool_recycle_seconds: int = 1800
+    database_pool_pre_ping: bool = True
+    database_pgbouncer: bool = False
     redis_url: str = "redis://redis:6379/0"
+    redis_socket_timeout_seconds: float = 0.5
+    room_events_buffer_size: int = 256
+    room_events_heartbeat_seconds: float = 15.0
+    room_events_backfill_limit: int = 1000
+    unread_counter_ttl_seconds: int = 86400
+    read_receipt_flush_seconds: float = 2.0
+    read_receipt_flush_batch: int = 1000
     ollama_host: str = "http://ollama:11434"
+    ollama_hosts: str | None = None
+    ollama_eject_after_failures: int = 3
+    ollama_eject_seconds: float = 30.0
+    ollama_latency_eject_factor: float = 4.0
+    ollama_model_affinity_ttl_seconds: float = 300.0
+    ollama_models_refresh_seconds: float = 15.0
+    ollama_max_connections: int = 100
+    ollama_max_keepalive_connections: int = 20
+    ollama_keepalive_expiry_seconds: float = 30.0
+    ollama_connect_timeout_seconds: float = 5.0
+    ollama_read_timeout_seconds: float = 300.0
+    ollama_write_timeout_seconds: float = 30.0
+    ollama_pool_timeout_seconds: float = 10.0
+    ollama_http2: bool = True
+    ollama_max_concurrency: int = 4
+    ollama_max_queue: int = 64
+    ollama_max_queue_per_user: int = 4
+    ollama_queue_timeout_seconds: float = 60.0
+    embedding_model: str = "nomic-embed-text"
+    embedding_batch_window_ms: float = 5.0
+    embedding_batch_max_inputs: int = 64
+    embedding_cache_memory_mb: int = 64
+    embedding_cache_redis_ttl_seconds: int = 60 * 60 * 24 * 7
+    retrieval_candidate_multiplier: int = 4
+    retrieval_rrf_k: int = 60
+    retrieval_exact_max_chunks: int = 20000
+    retrieval_min_ef_search: int = 40
+    retrieval_max_ef_search: int = 1000
+    retrieval_max_scan_tuples: int = 20000
+    embedding_index_mode: Literal["full", "halfvec", "binary"] = "full"
+    retrieval_rescore_multiplier: int = 4
+    ingest_upload_dir: str = "/tmp/edinfinite-ingest"
+    ingest_chunk_tokens: int = 512
+    ingest_chunk_overlap_tokens: int = 64
+    ingest_embed_batch_size: int = 32
+    ingest_queue_depth: int = 4
+    ingest_embed_attempts: int = 5
+    ingest_embed_retry_seconds: float = 1.0
+    ingest_stale_seconds: int = 600
+    ingest_copy_batch_rows: int = 5000
+    ingest_index_maintenance_work_mem: str = "1GB"
     dev_user_id: str | None = None
     allow_dev_override: bool = False
     session_secret_key: str = "dev-insecure-session-key-change-me"
@@ -18,6 +74,18 @@ class Settings(BaseSettings):
     session_cookie_samesite: str = "lax"
     session_cookie_domain: str | None = None
     session_max_age_seconds: int = 60 * 60 * 12
+    session_cache_ttl_seconds: float = 5.0
+    session_cache_max_entries: int = 50_000
+    session_cache_redis_ttl_seconds: int = 60 * 60
+    password_bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 64
+    login_max_failed_attempts: int = 5
+    login_lockout_seconds: int = 15 * 60
+    # Sized for a whole class logging in at once from one school NAT address.
+    login_ip_max_attempts: int = 300
+    login_ip_window_seconds: float = 60.0
+    login_trusted_proxies: str | None = None
     csrf_cookie_name: str = "csrf"
 
     model_config = SettingsConfigDict(
@@ -107,6 +107,8 @@ class Library(Base):
     data = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
     meta = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
     access_control = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    # Maintained by ingestion/reindex; used to choose exact vs ANN retrieval.
+    chunk_count = Column(BigInteger, nullable=False, server_default=text("0"))
     created_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
     updated_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
 
@@ -127,6 +129,7 @@ class LibraryDocument(Base):
     source = Column(Text, nullable=True)
     uri = Column(Text, nullable=True)
     title = Column(Text, nullable=True)
+    content_hash = Column(Text, nullable=True)
     meta = Column(JSONB, nullable=True, server_default=text("'{}'::jsonb"))
     created_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
     updated_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
@@ -151,6 +154,7 @@ class DocumentChunk(Base):
     content = Column(Text, nullable=False)
     embedding = Column(Vector(768), nullable=False)
     token_count = Column(Integer, nullable=True)
+    content_hash = Column(Text, nullable=True)
     meta = Column(JSONB, nullable=True)
     created_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
     content_tsv = Column(
@@ -983,6 +987,14 @@ class ClassRoom(Base):
     created_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
     updated_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
 
+    __table_args__ = (
+        Index(
+            "idx_class_room_creator_created",
+            "created_by_user_id",
+            text("created_at DESC"),
+        ),
+    )
+
 
 class ClassRoomMember(Base):
     __tablename__ = "class_room_member"
@@ -999,6 +1011,8 @@ class ClassRoomMember(Base):
     )
     created_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
 
+    __table_args__ = (Index("idx_class_room_member_user", "user_id"),)
+
 
 class ClassReadReceipt(Base):
     __tablename__ = "class_read_receipt"
@@ -1035,6 +1049,13 @@ class ClassMessage(Base):
         ForeignKey("class_message.id", ondelete="CASCADE"),
         nullable=True,
     )
+    # Top-level ancestor and distance from it; NULL and 0 for top-level messages.
+    thread_root_id = Column(
+        UUID(as_uuid=False),
+        ForeignKey("class_message.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+    thread_depth = Column(Integer, nullable=False, server_default=text("0"))
     target_user_id = Column(
         UUID(as_uuid=False),
         ForeignKey("user_profile.id", ondelete="CASCADE"),
@@ -1046,6 +1067,29 @@ class ClassMessage(Base):
     created_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
     updated_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
 
+    __table_args__ = (
+        Index(
+            "idx_class_message_room_created_id",
+            "class_room_id",
+            text("created_at DESC"),
+            text("id DESC"),
+        ),
+        Index(
+            "idx_class_message_parent_created_id",
+            "parent_id",
+            "created_at",
+            "id",
+            postgresql_where=parent_id.isnot(None),
+        ),
+        Index(
+            "idx_class_message_thread_root_created_id",
+            "thread_root_id",
+            "created_at",
+            "id",
+            postgresql_where=thread_root_id.isnot(None),
+        ),
+    )
+
 
 class ClassMessageReaction(Base):
     __tablename__ = "class_message_reaction"
@@ -1064,6 +1108,15 @@ class ClassMessageReaction(Base):
     name = Column(Text, nullable=False)
     created_at = Column(BigInteger, nullable=False, server_default=_NOW_MS)
 
+    __table_args__ = (
+        UniqueConstraint(
+            "message_id",
+            "user_id",
+            "name",
+            name="class_message_reaction_message_id_user_id_name_key",
+        ),
+    )
+
 
 class ClassAssistant(Base):
     __tablename__ = "class_assistant"
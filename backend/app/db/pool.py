@@ -0,0 +1,130 @@
+"""Connection pool configuration and telemetry for the SQLAlchemy engines."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+from app.core.metrics import WAIT_SAMPLE_SIZE, percentile_ms
+from app.core.settings import Settings
+
+
+class PoolTelemetry:
+    """Checkout waits, timeouts and connection churn for one engine's pool.
+
+    Checkout time covers waiting for a free slot, opening a new connection
+    when the pool grows and the pre-ping, i.e. everything a request waits for
+    before its first statement.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._engine: Engine | None = None
+        self._lock = threading.Lock()
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._connects = 0
+        self._pre_ping_failures = 0
+        self._invalidations = 0
+        self._wait_samples: deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._max_wait = 0.0
+
+    def record_checkout(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self._timeouts += 1
+                return
+            self._checkouts += 1
+            self._wait_samples.append(seconds)
+            self._max_wait = max(self._max_wait, seconds)
+
+    def snapshot(self) -> dict[str, object]:
+        samples = sorted(self._wait_samples)
+        pool = self._engine.pool if self._engine is not None else None
+        stats: dict[str, object] = {
+            "pool": type(pool).__name__ if pool is not None else None,
+            "checkouts": self._checkouts,
+            "timeouts": self._timeouts,
+            "connects": self._connects,
+            "pre_ping_failures": self._pre_ping_failures,
+            "invalidations": self._invalidations,
+            "checkout_wait_p50_ms": percentile_ms(samples, 0.50),
+            "checkout_wait_p95_ms": percentile_ms(samples, 0.95),
+            "checkout_wait_p99_ms": percentile_ms(samples, 0.99),
+            "checkout_wait_max_ms": round(self._max_wait * 1000, 3),
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        return stats
+
+    def instrument(self, engine: Engine) -> None:
+        """Attach connection and error listeners to a sync engine (or ``AsyncEngine.sync_engine``)."""
+
+        self._engine = engine
+
+        # Pool events registered on the engine follow it across Pool.recreate().
+        @event.listens_for(engine, "connect")
+        def _connect(dbapi_connection: Any, record: Any) -> None:
+            self._connects += 1
+
+        @event.listens_for(engine, "invalidate")
+        def _invalidate(dbapi_connection: Any, record: Any, exception: Any) -> None:
+            self._invalidations += 1
+
+        @event.listens_for(engine, "handle_error")
+        def _handle_error(context: Any) -> None:
+            if context.is_pre_ping:
+                self._pre_ping_failures += 1
+
+
+def _timed_pool(base: type[Pool], telemetry: PoolTelemetry) -> type[Pool]:
+    # A subclass per engine, because Pool.recreate() (e.g. on dispose) rebuilds
+    # the pool from its class and would drop per-instance state.
+    def connect(self: Pool) -> Any:
+        started = time.perf_counter()
+        try:
+            connection = base.connect(self)
+        except PoolTimeout:
+            telemetry.record_checkout(time.perf_counter() - started, timed_out=True)
+            raise
+        telemetry.record_checkout(time.perf_counter() - started, timed_out=False)
+        return connection
+
+    return type(f"Timed{base.__name__}", (base,), {"connect": connect})
+
+
+def engine_options(settings: Settings, telemetry: PoolTelemetry, is_async: bool) -> dict[str, Any]:
+    """``create_engine`` keyword arguments for the configured pool mode.
+
+    In PgBouncer mode (transaction pooling) SQLAlchemy keeps no pool of its
+    own and psycopg never prepares statements server-side, since consecutive
+    transactions may run on different server connections.
+    """
+
+    if settings.database_pgbouncer:
+        return {
+            "poolclass": _timed_pool(NullPool, telemetry),
+            "connect_args": {"prepare_threshold": None},
+        }
+    base = AsyncAdaptedQueuePool if is_async else QueuePool
+    return {
+        "poolclass": _timed_pool(base, telemetry),
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_timeout": settings.database_pool_timeout_seconds,
+        "pool_recycle": settings.database_pool_recycle_seconds,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+    }
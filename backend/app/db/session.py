@@ -3,21 +3,25 @@
 
 from __future__ import annotations
 
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.settings import get_settings
+from app.db.pool import PoolTelemetry, engine_options
 
 
 _settings = get_settings()
 
+pool_telemetry = PoolTelemetry("sync")
 engine = create_engine(
     _settings.database_url,
     future=True,
-    pool_pre_ping=True,
+    **engine_options(_settings, pool_telemetry, is_async=False),
 )
+pool_telemetry.instrument(engine)
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
@@ -34,3 +38,47 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+# Async engine for routes enabled by ``DATABASE_ASYNC``; created on first use so
+# deployments on the sync path never open a second pool.
+_async_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+async_pool_telemetry = PoolTelemetry("async")
+
+
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Return the async session factory, creating the async engine if needed."""
+
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        # psycopg 3 serves both engines from the same URL; SQLAlchemy picks its async dialect.
+        _async_engine = create_async_engine(
+            _settings.database_url,
+            **engine_options(_settings, async_pool_telemetry, is_async=True),
+        )
+        async_pool_telemetry.instrument(_async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(
+            bind=_async_engine,
+            autoflush=False,
+            # Attributes stay loaded after commit so responses never lazy-load.
+            expire_on_commit=False,
+        )
+    return _async_sessionmaker
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Yield an async database session for request scope."""
+
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    """Close the async pool; called from the application shutdown hook."""
+
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
@@ -4,7 +4,15 @@ from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
 
 from .api import api_router
+from .core.ollama_client import get_ollama_client, shutdown_ollama_client, startup_ollama_client
+from .core.ollama_pool import shutdown_ollama_pool, startup_ollama_pool
+from .core.redis import shutdown_redis
+from .core.room_events import shutdown_room_events
+from .core.security import shutdown_password_hasher
+from .core.session_cache import shutdown_session_cache, startup_session_cache
 from .core.settings import get_settings
+from .db.session import dispose_async_engine
+from .services.read_receipts import shutdown_read_receipts, startup_read_receipts
 
 settings = get_settings()
 
@@ -17,8 +25,23 @@ app = FastAPI(
 
 
 @app.on_event("startup")
-async def startup_event() -> None:  # pragma: no cover - placeholder for future hooks
-    _ = settings
+async def startup_event() -> None:  # pragma: no cover - exercised at process start
+    await startup_ollama_client()
+    await startup_ollama_pool(get_ollama_client())
+    await startup_read_receipts()
+    await startup_session_cache()
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:  # pragma: no cover - exercised at process exit
+    await shutdown_room_events()
+    await shutdown_read_receipts()
+    await shutdown_session_cache()
+    shutdown_password_hasher()
+    await shutdown_ollama_pool()
+    await shutdown_ollama_client()
+    await shutdown_redis()
+    await dispose_async_engine()
 
 
 app.add_middleware(
@@ -0,0 +1,168 @@
+"""Bulk ``document_chunk`` writes over PostgreSQL binary ``COPY``.
+
+Binary COPY sends each 768-dimension vector as 3KB of raw float4 instead of
+a ~8KB text literal, with no per-row statement parsing. Rows are streamed
+from any iterable and committed every ``batch_rows``, so memory stays bounded
+and a failure loses at most one batch.
+
+For large initial loads, wrap the load in :func:`deferred_vector_index`: the
+HNSW index of the configured ``embedding_index_mode`` is dropped first and
+rebuilt once at the end, which is far cheaper than maintaining the graph row
+by row. Vector search falls back to sequential scans while the index is
+absent, so reserve it for maintenance windows.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+
+from pgvector.psycopg import register_vector
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..core.settings import get_settings
+from ..db.session import SessionLocal, engine
+from .library_stats import add_chunk_count
+from .retrieval import EMBEDDING_INDEXES
+
+_COPY_SQL = (
+    "COPY document_chunk"
+    " (id, document_id, chunk_index, content, embedding, token_count, content_hash, meta)"
+    " FROM STDIN WITH (FORMAT BINARY)"
+)
+_COPY_TYPES = ["uuid", "uuid", "int4", "text", "vector", "int4", "text", "jsonb"]
+
+
+@dataclass
+class ChunkRow:
+    document_id: str
+    chunk_index: int
+    content: str
+    embedding: list[float]
+    token_count: int | None = None
+    meta: dict[str, Any] | None = None
+    id: str | None = None
+    content_hash: str | None = None
+
+
+def chunk_hash(content: str) -> str:
+    """SHA-256 of stored chunk content; matches the SQL backfill in migration 0006."""
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CopyResult:
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.rows / self.seconds, 2) if self.seconds else 0.0
+
+    def as_dict(self) -> dict[str, float | int]:
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": self.rows_per_second,
+        }
+
+
+def _driver_connection(db: Session) -> Any:
+    """Return the psycopg connection behind ``db``'s current transaction."""
+
+    raw = db.connection().connection.driver_connection
+    if raw.adapters.types.get("vector") is None:
+        register_vector(raw)
+    return raw
+
+
+def copy_chunks(db: Session, library_id: str, rows: Iterable[ChunkRow]) -> int:
+    """COPY ``rows`` in the caller's transaction and adjust ``library.chunk_count``.
+
+    The caller commits; nothing is visible until then.
+    """
+
+    written = 0
+    with _driver_connection(db).cursor() as cursor:
+        with cursor.copy(_COPY_SQL) as copy:
+            copy.set_types(_COPY_TYPES)
+            for row in rows:
+                copy.write_row(
+                    (
+                        # Binary COPY dumps uuid columns from UUID objects, not strings.
+                        uuid.UUID(row.id) if row.id else uuid.uuid4(),
+                        uuid.UUID(row.document_id),
+                        row.chunk_index,
+                        row.content,
+                        row.embedding,
+                        row.token_count,
+                        row.content_hash or chunk_hash(row.content),
+                        row.meta if row.meta is not None else {},
+                    )
+                )
+                written += 1
+    add_chunk_count(db, library_id, written)
+    return written
+
+
+def _batches(rows: Iterable[ChunkRow], size: int) -> Iterator[list[ChunkRow]]:
+    batch: list[ChunkRow] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_copy_chunks(
+    library_id: str,
+    rows: Iterable[ChunkRow],
+    batch_rows: int | None = None,
+) -> CopyResult:
+    """Stream ``rows`` into ``document_chunk``, committing every ``batch_rows``."""
+
+    size = batch_rows or get_settings().ingest_copy_batch_rows
+    result = CopyResult()
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        for batch in _batches(rows, size):
+            result.rows += copy_chunks(db, library_id, batch)
+            db.commit()
+            result.batches += 1
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+@contextmanager
+def deferred_vector_index() -> Iterator[None]:
+    """Drop the HNSW index for the duration of a bulk load, then rebuild it once.
+
+    The index is rebuilt even if the load fails so search never stays without it.
+    """
+
+    settings = get_settings()
+    index_name, index_ddl = EMBEDDING_INDEXES[settings.embedding_index_mode]
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        conn.commit()
+    try:
+        yield
+    finally:
+        with engine.connect() as conn:
+            conn.execute(
+                text("SELECT set_config('maintenance_work_mem', :value, false)"),
+                {"value": settings.ingest_index_maintenance_work_mem},
+            )
+            conn.execute(text(index_ddl))
+            conn.execute(text("ANALYZE document_chunk"))
+            conn.commit()
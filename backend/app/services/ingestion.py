@@ -0,0 +1,459 @@
+"""Streaming document ingestion: parse -> chunk -> embed -> insert.
+
+Documents flow through bounded queues, so memory stays proportional to a
+few embedding batches regardless of file size. Every written batch is
+committed on its own, so an interrupted run resumes after the highest
+committed ``chunk_index`` as long as the source file is unchanged.
+
+Run from the backend directory to ingest files or whole folders::
+
+    python -m app.services.ingestion [--defer-index] LIBRARY_ID PATH [PATH ...]
+
+``--defer-index`` drops the HNSW index for the load and rebuilds it once at
+the end; use it for large initial loads only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import hashlib
+import json
+import re
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import httpx
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+
+from ..core.admission import AdmissionRejected
+from ..core.embeddings import embed_texts
+from ..core.settings import get_settings
+from ..db.models import DocumentChunk, LibraryDocument
+from ..db.session import SessionLocal
+from .chunk_writer import ChunkRow, copy_chunks, deferred_vector_index
+from .library_stats import add_chunk_count
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is optional
+    tiktoken = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # pragma: no cover - pypdf is optional
+    PdfReader = None
+
+_READ_BLOCK_BYTES = 64 * 1024
+# Words carry their leading whitespace; whitespace ending a block stays with
+# its last word, so decoded windows never glue two blocks together.
+_WORD_TOKENS = re.compile(r"\s*\S+(?:\s+\Z)?|\s+\Z")
+
+
+class IngestInProgress(RuntimeError):
+    """Raised when another run is still ingesting the document."""
+
+
+@dataclass
+class TextChunk:
+    index: int
+    content: str
+    token_count: int
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    units: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, float | int]:
+        return {
+            "items": self.items,
+            "units": self.units,
+            "seconds": round(self.seconds, 3),
+            "items_per_second": round(self.items / self.seconds, 2) if self.seconds else 0,
+            "units_per_second": round(self.units / self.seconds, 2) if self.seconds else 0,
+        }
+
+
+@dataclass
+class IngestReport:
+    document_id: str
+    resumed_after: int
+    chunks_written: int = 0
+    stages: dict[str, StageStats] = field(default_factory=dict)
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "document_id": self.document_id,
+            "resumed_after": self.resumed_after,
+            "chunks_written": self.chunks_written,
+            "stages": {name: stage.as_dict() for name, stage in self.stages.items()},
+        }
+
+
+def file_sha256(path: Path) -> str:
+    """Hash a source file without loading it into memory."""
+
+    with path.open("rb") as handle:
+        return hashlib.file_digest(handle, "sha256").hexdigest()
+
+
+def iter_text_blocks(path: Path) -> Iterator[str]:
+    """Yield a file's text incrementally: one PDF page or one read block at a time."""
+
+    if path.suffix.lower() == ".pdf":
+        if PdfReader is None:
+            raise RuntimeError("pypdf is required to ingest PDF files")
+        # PdfReader resolves objects lazily from the file handle, page by page.
+        with path.open("rb") as handle:
+            for page in PdfReader(handle).pages:
+                yield (page.extract_text() or "") + "\n\n"
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with path.open("rb") as handle:
+        while block := handle.read(_READ_BLOCK_BYTES):
+            yield decoder.decode(block)
+        yield decoder.decode(b"", final=True)
+
+
+class _Tokenizer:
+    """tiktoken when installed, otherwise whitespace-delimited words."""
+
+    def __init__(self) -> None:
+        self._encoding = tiktoken.get_encoding("cl100k_base") if tiktoken else None
+        self.name = "tiktoken:cl100k_base" if self._encoding else "words"
+
+    def encode(self, text: str) -> list:
+        if self._encoding is not None:
+            return self._encoding.encode(text, disallowed_special=())
+        return _WORD_TOKENS.findall(text)
+
+    def decode(self, tokens: list) -> str:
+        if self._encoding is not None:
+            return self._encoding.decode(tokens)
+        return "".join(tokens)
+
+
+class TokenChunker:
+    """Split a stream of text blocks into fixed-size token windows with overlap."""
+
+    def __init__(self, chunk_tokens: int, overlap_tokens: int) -> None:
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tokenizer = _Tokenizer()
+
+    @property
+    def signature(self) -> dict[str, object]:
+        """Parameters that must match for a resumed run to line up with stored chunks."""
+
+        return {
+            "chunk_tokens": self.chunk_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "tokenizer": self.tokenizer.name,
+        }
+
+    def chunks(self, blocks: Iterable[str]) -> Iterator[TextChunk]:
+        step = self.chunk_tokens - self.overlap_tokens
+        buffer: list = []
+        index = 0
+        fresh = 0  # tokens in the buffer not yet emitted in any chunk
+        for block in blocks:
+            tokens = self.tokenizer.encode(block)
+            buffer.extend(tokens)
+            fresh += len(tokens)
+            while len(buffer) >= self.chunk_tokens:
+                chunk = self._make(index, buffer[: self.chunk_tokens])
+                if chunk is not None:
+                    yield chunk
+                    index += 1
+                del buffer[:step]
+                fresh = len(buffer) - self.overlap_tokens
+        if buffer and fresh > 0:
+            chunk = self._make(index, buffer)
+            if chunk is not None:
+                yield chunk
+
+    def _make(self, index: int, tokens: list) -> TextChunk | None:
+        content = self.tokenizer.decode(tokens).strip()
+        if not content:
+            return None
+        return TextChunk(index=index, content=content, token_count=len(tokens))
+
+
+def _take(chunks: Iterator[TextChunk], size: int, resume_after: int) -> list[TextChunk]:
+    """Pull the next ``size`` chunks that were not committed by an earlier run."""
+
+    batch: list[TextChunk] = []
+    for chunk in chunks:
+        if chunk.index <= resume_after:
+            continue
+        batch.append(chunk)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def _prepare(document_id: str, signature: dict[str, object], source_hash: str) -> tuple[str, int]:
+    """Mark the document running and return (library_id, last committed chunk_index).
+
+    The document row stays locked until the commit, so two runs cannot both
+    claim it; a run whose heartbeat went stale is assumed dead and taken over.
+    """
+
+    with SessionLocal() as db:
+        document = db.get(LibraryDocument, document_id, with_for_update=True)
+        if document is None:
+            raise LookupError(f"library_document {document_id} not found")
+        meta = dict(document.meta or {})
+        previous = dict(meta.get("ingest") or {})
+        if ingest_running(previous):
+            raise IngestInProgress(f"library_document {document_id} is already being ingested")
+        last_index = (
+            db.query(func.max(DocumentChunk.chunk_index))
+            .filter(DocumentChunk.document_id == document_id)
+            .scalar()
+        )
+        if last_index is not None and (
+            previous.get("chunking") != signature or previous.get("source_hash") != source_hash
+        ):
+            # Stored rows came from other chunk boundaries or another version of
+            # the file; appending to them would mix two sources. Start over.
+            removed = (
+                db.query(DocumentChunk)
+                .filter(DocumentChunk.document_id == document_id)
+                .delete(synchronize_session=False)
+            )
+            add_chunk_count(db, document.library_id, -removed)
+            last_index = None
+        meta["ingest"] = {
+            **previous,
+            "status": "running",
+            "chunking": signature,
+            "source_hash": source_hash,
+            "error": None,
+            "heartbeat_at": int(time.time()),
+        }
+        document.meta = meta
+        db.commit()
+        return document.library_id, -1 if last_index is None else last_index
+
+
+def ingest_running(ingest: dict[str, object]) -> bool:
+    """Whether ``meta["ingest"]`` describes a run that is still alive."""
+
+    if ingest.get("status") != "running":
+        return False
+    heartbeat = ingest.get("heartbeat_at")
+    stale_after = get_settings().ingest_stale_seconds
+    return isinstance(heartbeat, (int, float)) and time.time() - heartbeat < stale_after
+
+
+def _write_batch(
+    document_id: str,
+    library_id: str,
+    chunks: list[TextChunk],
+    vectors: list[list[float]],
+) -> None:
+    with SessionLocal() as db:
+        copy_chunks(
+            db,
+            library_id,
+            (
+                ChunkRow(
+                    document_id=document_id,
+                    chunk_index=chunk.index,
+                    content=chunk.content,
+                    embedding=vector,
+                    token_count=chunk.token_count,
+                )
+                for chunk, vector in zip(chunks, vectors)
+            ),
+        )
+        document = db.get(LibraryDocument, document_id)
+        if document is not None:
+            meta = dict(document.meta or {})
+            meta["ingest"] = {**dict(meta.get("ingest") or {}), "heartbeat_at": int(time.time())}
+            document.meta = meta
+        db.commit()
+
+
+def _retry_delay(error: Exception, attempt: int, base_seconds: float) -> float | None:
+    """Backoff before retrying an embedding batch, or None if ``error`` is permanent."""
+
+    backoff = base_seconds * 2 ** (attempt - 1)
+    if isinstance(error, AdmissionRejected):
+        return max(float(error.retry_after), backoff)
+    if isinstance(error, httpx.TransportError):
+        return backoff
+    if isinstance(error, httpx.HTTPStatusError) and (
+        error.response.status_code == 429 or error.response.status_code >= 500
+    ):
+        return backoff
+    return None
+
+
+async def _embed_with_retry(texts: list[str]) -> list[list[float]]:
+    settings = get_settings()
+    attempt = 0
+    while True:
+        try:
+            return await embed_texts(texts)
+        except (AdmissionRejected, httpx.HTTPError) as error:
+            attempt += 1
+            delay = _retry_delay(error, attempt, settings.ingest_embed_retry_seconds)
+            if delay is None or attempt >= settings.ingest_embed_attempts:
+                raise
+            await asyncio.sleep(delay)
+
+
+def _finish(
+    document_id: str,
+    status: str,
+    report: IngestReport,
+    error: str | None = None,
+    content_hash: str | None = None,
+) -> None:
+    with SessionLocal() as db:
+        document = db.get(LibraryDocument, document_id)
+        if document is None:
+            return
+        if content_hash is not None:
+            document.content_hash = content_hash
+        meta = dict(document.meta or {})
+        meta["ingest"] = {
+            **dict(meta.get("ingest") or {}),
+            "status": status,
+            "error": error,
+            "report": report.as_dict(),
+        }
+        document.meta = meta
+        db.commit()
+
+
+async def ingest_document(document_id: str, path: Path) -> IngestReport:
+    """Ingest ``path`` into ``document_id``, resuming after committed chunks."""
+
+    settings = get_settings()
+    chunker = TokenChunker(settings.ingest_chunk_tokens, settings.ingest_chunk_overlap_tokens)
+    # Hashed up front: the stored hash must describe the bytes that were chunked.
+    content_hash = await run_in_threadpool(file_sha256, path)
+    library_id, resume_after = await run_in_threadpool(
+        _prepare, document_id, chunker.signature, content_hash
+    )
+
+    report = IngestReport(document_id=document_id, resumed_after=resume_after)
+    read_stats = report.stages["read"] = StageStats("read")
+    embed_stats = report.stages["embed"] = StageStats("embed")
+    write_stats = report.stages["write"] = StageStats("write")
+
+    depth = settings.ingest_queue_depth
+    to_embed: asyncio.Queue[list[TextChunk] | None] = asyncio.Queue(maxsize=depth)
+    to_write: asyncio.Queue[tuple[list[TextChunk], list[list[float]]] | None] = asyncio.Queue(
+        maxsize=depth
+    )
+    chunks = chunker.chunks(iter_text_blocks(path))
+
+    async def read() -> None:
+        while True:
+            started = time.perf_counter()
+            batch = await run_in_threadpool(
+                _take, chunks, settings.ingest_embed_batch_size, resume_after
+            )
+            read_stats.seconds += time.perf_counter() - started
+            if not batch:
+                break
+            read_stats.items += len(batch)
+            read_stats.units += sum(chunk.token_count for chunk in batch)
+            await to_embed.put(batch)
+        await to_embed.put(None)
+
+    async def embed() -> None:
+        while (batch := await to_embed.get()) is not None:
+            started = time.perf_counter()
+            vectors = await _embed_with_retry([chunk.content for chunk in batch])
+            embed_stats.seconds += time.perf_counter() - started
+            embed_stats.items += len(batch)
+            embed_stats.units += sum(chunk.token_count for chunk in batch)
+            await to_write.put((batch, vectors))
+        await to_write.put(None)
+
+    async def write() -> None:
+        while (item := await to_write.get()) is not None:
+            batch, vectors = item
+            started = time.perf_counter()
+            await run_in_threadpool(_write_batch, document_id, library_id, batch, vectors)
+            write_stats.seconds += time.perf_counter() - started
+            write_stats.items += len(batch)
+            write_stats.units += len(batch)
+            report.chunks_written += len(batch)
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(read())
+            group.create_task(embed())
+            group.create_task(write())
+    except BaseExceptionGroup as failure:
+        error = failure.exceptions[0]
+        await run_in_threadpool(_finish, document_id, "failed", report, repr(error))
+        raise error from failure
+
+    await run_in_threadpool(_finish, document_id, "complete", report, None, content_hash)
+    return report
+
+
+def document_for_path(library_id: str, path: Path) -> str:
+    """Find the document previously created for ``path`` or create a new one."""
+
+    uri = str(path.resolve())
+    with SessionLocal() as db:
+        document = (
+            db.query(LibraryDocument)
+            .filter(LibraryDocument.library_id == library_id, LibraryDocument.uri == uri)
+            .first()
+        )
+        if document is None:
+            document = LibraryDocument(
+                id=str(uuid.uuid4()),
+                library_id=library_id,
+                source="file",
+                uri=uri,
+                title=path.name,
+                meta={"size_bytes": path.stat().st_size},
+            )
+            db.add(document)
+            db.commit()
+        return document.id
+
+
+async def _main(library_id: str, paths: list[str]) -> None:
+    for root in map(Path, paths):
+        files = sorted(p for p in root.rglob("*") if p.is_file()) if root.is_dir() else [root]
+        # One file at a time keeps memory flat for folders of any size.
+        for path in files:
+            document_id = await run_in_threadpool(document_for_path, library_id, path)
+            report = await ingest_document(document_id, path)
+            print(json.dumps({"path": str(path), **report.as_dict()}))
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    args = sys.argv[1:]
+    defer_index = "--defer-index" in args
+    args = [arg for arg in args if arg != "--defer-index"]
+    if len(args) < 2:
+        sys.exit("usage: python -m app.services.ingestion [--defer-index] LIBRARY_ID PATH [PATH ...]")
+    if defer_index:
+        with deferred_vector_index():
+            asyncio.run(_main(args[0], args[1:]))
+    else:
+        asyncio.run(_main(args[0], args[1:]))
@@ -0,0 +1,38 @@
+"""Maintenance of denormalized per-library statistics."""
+
+from __future__ import annotations
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from ..db.models import DocumentChunk, Library, LibraryDocument
+
+
+def add_chunk_count(db: Session, library_id: str, delta: int) -> None:
+    """Adjust ``library.chunk_count`` in the caller's transaction."""
+
+    if delta:
+        db.execute(
+            update(Library)
+            .where(Library.id == library_id)
+            .values(chunk_count=Library.chunk_count + delta)
+        )
+
+
+def refresh_chunk_counts(db: Session, library_ids: list[str] | None = None) -> None:
+    """Recompute ``library.chunk_count`` from ``document_chunk``.
+
+    Incremental updates cover normal ingestion; this reconciles drift such as
+    documents removed through ``ON DELETE CASCADE``.
+    """
+
+    counted = (
+        select(func.count(DocumentChunk.id))
+        .join(LibraryDocument, LibraryDocument.id == DocumentChunk.document_id)
+        .where(LibraryDocument.library_id == Library.id)
+        .scalar_subquery()
+    )
+    stmt = update(Library).values(chunk_count=counted)
+    if library_ids is not None:
+        stmt = stmt.where(Library.id.in_(library_ids))
+    db.execute(stmt)
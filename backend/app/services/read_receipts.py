@@ -0,0 +1,311 @@
+"""Write-behind batching for ``class_read_receipt``.
+
+Clients may report read positions on every scroll or focus event. Updates
+are merged per (room, user) keeping only the highest ``last_read_at`` and
+flushed to Postgres on an interval with one bulk ``INSERT ... ON CONFLICT``
+per batch; ``GREATEST`` in the upsert keeps receipts monotonic even when
+flushes race.
+
+Pending receipts live in a Redis hash, so a worker restart loses nothing.
+A flush first renames the pending hash to a processing hash and deletes it
+only after the database commit; a flusher that dies in between leaves the
+processing hash behind and the next flush (on any worker, including at
+startup) applies it first. Without Redis, receipts are merged in process
+memory and loss on a crash is bounded by the flush interval.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+
+from ..core.redis import get_redis, get_sync_redis
+from ..core.settings import get_settings
+from ..db.models import ClassReadReceipt, ClassRoom, UserProfile
+from ..db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "receipts:pending"
+_PROCESSING_KEY = "receipts:processing"
+_LOCK_KEY = "receipts:flush-lock"
+
+# Keep the larger of the stored and the new position.
+_MERGE_MAX = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current or tonumber(current) < tonumber(ARGV[2]) then
+  redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return 0
+"""
+
+# Resume an unfinished batch if one exists, otherwise claim the pending hash.
+_TAKE = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+  if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {}
+  end
+  redis.call('RENAME', KEYS[1], KEYS[2])
+end
+return redis.call('HGETALL', KEYS[2])
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ReadReceiptBuffer:
+    """Merge high-frequency read positions and flush them in bulk."""
+
+    def __init__(self, batch_size: int, lock_ttl_seconds: float) -> None:
+        self.batch_size = batch_size
+        self.lock_ttl_ms = int(lock_ttl_seconds * 1000)
+        self._local: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+        self._merged = 0
+        self._flushes = 0
+        self._flushed_receipts = 0
+        self._skipped_receipts = 0
+        self._flush_errors = 0
+        self._last_flush_ms = 0.0
+
+    def record(self, room_id: str, user_id: str, read_at: int) -> None:
+        """Merge one read position; safe to call from sync endpoints."""
+
+        self._merged += 1
+        redis = get_sync_redis()
+        if redis is not None:
+            try:
+                redis.eval(_MERGE_MAX, 1, _PENDING_KEY, f"{room_id}:{user_id}", read_at)
+                return
+            except Exception:  # pragma: no cover - depends on redis availability
+                logger.warning("read receipt merge failed; buffering locally", exc_info=True)
+        self._merge_local(room_id, user_id, read_at)
+
+    async def record_async(self, room_id: str, user_id: str, read_at: int) -> None:
+        """:meth:`record` for async routes, without blocking the event loop on Redis."""
+
+        self._merged += 1
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.eval(_MERGE_MAX, 1, _PENDING_KEY, f"{room_id}:{user_id}", read_at)
+                return
+            except Exception:  # pragma: no cover - depends on redis availability
+                logger.warning("read receipt merge failed; buffering locally", exc_info=True)
+        self._merge_local(room_id, user_id, read_at)
+
+    def pending_positions(self, user_id: str, room_ids: list[str]) -> dict[str, int]:
+        """Read positions for ``user_id`` not yet flushed to Postgres, per room."""
+
+        positions = self._pending_local(user_id, room_ids)
+        redis = get_sync_redis()
+        if redis is None or not room_ids:
+            return positions
+        fields = [f"{room_id}:{user_id}" for room_id in room_ids]
+        try:
+            with redis.pipeline(transaction=False) as pipe:
+                pipe.hmget(_PENDING_KEY, fields)
+                pipe.hmget(_PROCESSING_KEY, fields)
+                pending, processing = pipe.execute()
+        except Exception:  # pragma: no cover - depends on redis availability
+            logger.warning("pending read receipt lookup failed", exc_info=True)
+            return positions
+        return _merge_positions(positions, room_ids, pending, processing)
+
+    async def pending_positions_async(self, user_id: str, room_ids: list[str]) -> dict[str, int]:
+        positions = self._pending_local(user_id, room_ids)
+        redis = get_redis()
+        if redis is None or not room_ids:
+            return positions
+        fields = [f"{room_id}:{user_id}" for room_id in room_ids]
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hmget(_PENDING_KEY, fields)
+                pipe.hmget(_PROCESSING_KEY, fields)
+                pending, processing = await pipe.execute()
+        except Exception:  # pragma: no cover - depends on redis availability
+            logger.warning("pending read receipt lookup failed", exc_info=True)
+            return positions
+        return _merge_positions(positions, room_ids, pending, processing)
+
+    def _pending_local(self, user_id: str, room_ids: list[str]) -> dict[str, int]:
+        with self._lock:
+            return {
+                room_id: self._local[(room_id, user_id)]
+                for room_id in room_ids
+                if (room_id, user_id) in self._local
+            }
+
+    def _merge_local(self, room_id: str, user_id: str, read_at: int) -> None:
+        with self._lock:
+            key = (room_id, user_id)
+            if read_at > self._local.get(key, 0):
+                self._local[key] = read_at
+
+    def flush(self) -> int:
+        """Write merged receipts to Postgres; returns how many were written."""
+
+        started = time.perf_counter()
+        try:
+            written = self._flush_local() + self._flush_redis()
+        except Exception:
+            self._flush_errors += 1
+            raise
+        self._flushes += 1
+        self._last_flush_ms = (time.perf_counter() - started) * 1000
+        return written
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {
+            "merged": self._merged,
+            "flushes": self._flushes,
+            "flushed_receipts": self._flushed_receipts,
+            "skipped_receipts": self._skipped_receipts,
+            "flush_errors": self._flush_errors,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+            "local_pending": len(self._local),
+        }
+
+    def _flush_local(self) -> int:
+        with self._lock:
+            pending, self._local = self._local, {}
+        if not pending:
+            return 0
+        try:
+            return self._write(pending)
+        except Exception:
+            # Put the batch back, keeping any newer positions merged meanwhile.
+            with self._lock:
+                for key, read_at in pending.items():
+                    if read_at > self._local.get(key, 0):
+                        self._local[key] = read_at
+            raise
+
+    def _flush_redis(self) -> int:
+        redis = get_sync_redis()
+        if redis is None:
+            return 0
+        token = uuid.uuid4().hex
+        if not redis.set(_LOCK_KEY, token, nx=True, px=self.lock_ttl_ms):
+            return 0  # another worker is flushing
+        try:
+            flat = redis.eval(_TAKE, 2, _PENDING_KEY, _PROCESSING_KEY)
+            if not flat:
+                return 0
+            pending: dict[tuple[str, str], int] = {}
+            for field, value in zip(flat[::2], flat[1::2]):
+                room_id, _, user_id = field.decode().partition(":")
+                pending[(room_id, user_id)] = int(value)
+            written = self._write(pending)
+            redis.delete(_PROCESSING_KEY)
+            return written
+        finally:
+            redis.eval(_RELEASE, 1, _LOCK_KEY, token)
+
+    def _write(self, pending: dict[tuple[str, str], int]) -> int:
+        items = list(pending.items())
+        with SessionLocal() as db:
+            # Rooms or users deleted since the read must not poison the batch.
+            rooms = {room_id for (room_id, _), _ in items}
+            users = {user_id for (_, user_id), _ in items}
+            live_rooms = set(db.execute(select(ClassRoom.id).where(ClassRoom.id.in_(rooms))).scalars())
+            live_users = set(
+                db.execute(select(UserProfile.id).where(UserProfile.id.in_(users))).scalars()
+            )
+            rows = [
+                {"class_room_id": room_id, "user_id": user_id, "last_read_at": read_at}
+                for (room_id, user_id), read_at in items
+                if room_id in live_rooms and user_id in live_users
+            ]
+            for start in range(0, len(rows), self.batch_size):
+                stmt = insert(ClassReadReceipt).values(rows[start : start + self.batch_size])
+                db.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[ClassReadReceipt.class_room_id, ClassReadReceipt.user_id],
+                        set_={
+                            "last_read_at": func.greatest(
+                                ClassReadReceipt.last_read_at, stmt.excluded.last_read_at
+                            )
+                        },
+                    )
+                )
+            db.commit()
+        self._flushed_receipts += len(rows)
+        self._skipped_receipts += len(items) - len(rows)
+        return len(rows)
+
+
+def _merge_positions(
+    positions: dict[str, int],
+    room_ids: list[str],
+    *columns: list[bytes | None],
+) -> dict[str, int]:
+    for values in columns:
+        for room_id, value in zip(room_ids, values):
+            if value is not None and int(value) > positions.get(room_id, 0):
+                positions[room_id] = int(value)
+    return positions
+
+
+_buffer: ReadReceiptBuffer | None = None
+_flusher: asyncio.Task[None] | None = None
+
+
+def get_read_receipt_buffer() -> ReadReceiptBuffer:
+    """Return the per-process read receipt buffer."""
+
+    global _buffer
+    if _buffer is None:
+        settings = get_settings()
+        _buffer = ReadReceiptBuffer(
+            batch_size=settings.read_receipt_flush_batch,
+            lock_ttl_seconds=max(30.0, settings.read_receipt_flush_seconds * 10),
+        )
+    return _buffer
+
+
+async def _flush_periodically(interval: float) -> None:
+    buffer = get_read_receipt_buffer()
+    while True:
+        try:
+            await run_in_threadpool(buffer.flush)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("read receipt flush failed", exc_info=True)
+        await asyncio.sleep(interval)
+
+
+async def startup_read_receipts() -> None:
+    """Start the flusher; its first pass recovers a batch left by a dead worker."""
+
+    global _flusher
+    if _flusher is None:
+        interval = get_settings().read_receipt_flush_seconds
+        _flusher = asyncio.create_task(_flush_periodically(interval))
+
+
+async def shutdown_read_receipts() -> None:
+    """Stop the flusher and write whatever is still pending."""
+
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+    try:
+        await run_in_threadpool(get_read_receipt_buffer().flush)
+    except Exception:
+        logger.warning("final read receipt flush failed", exc_info=True)
@@ -0,0 +1,291 @@
+"""Incremental re-chunking of changed library documents.
+
+A changed source is re-chunked and the new chunk sequence is diffed against
+the stored one by content hash. Chunks whose text is unchanged keep their
+row and embedding (at most their ``chunk_index`` moves); only new text is
+embedded. Orphans are deleted, moved rows renumbered and new rows inserted
+in a single transaction, so readers see either the old or the new document.
+
+The new chunk texts of one document are held in memory while diffing;
+embeddings are computed only for the changed ones. Run a nightly sync with::
+
+    python -m app.services.reindex LIBRARY_ID PATH [PATH ...]
+
+The sync ends by recomputing the library's ``chunk_count``, repairing drift
+the incremental updates cannot see (e.g. documents removed by a cascade).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..core.embeddings import embed_texts
+from ..core.settings import get_settings
+from ..db.models import DocumentChunk, LibraryDocument
+from ..db.session import SessionLocal
+from .chunk_writer import ChunkRow, chunk_hash, copy_chunks
+from .ingestion import (
+    TextChunk,
+    TokenChunker,
+    document_for_path,
+    file_sha256,
+    ingest_document,
+    iter_text_blocks,
+)
+from .library_stats import add_chunk_count, refresh_chunk_counts
+
+_RENUMBER_SQL = text(
+    """
+    UPDATE document_chunk AS c
+       SET chunk_index = v.chunk_index
+      FROM unnest(CAST(:ids AS uuid[]), CAST(:indexes AS integer[])) AS v(id, chunk_index)
+     WHERE c.id = v.id
+    """
+)
+
+
+class ReindexConflict(RuntimeError):
+    """The document's chunks changed between planning and applying a reindex."""
+
+
+@dataclass(frozen=True)
+class _StoredChunk:
+    id: str
+    chunk_index: int
+    content_hash: str | None
+
+
+@dataclass
+class _Plan:
+    kept: list[str] = field(default_factory=list)
+    moves: dict[str, int] = field(default_factory=dict)
+    fresh: list[TextChunk] = field(default_factory=list)
+    orphans: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ReindexReport:
+    document_id: str
+    unchanged: bool = False
+    kept: int = 0
+    moved: int = 0
+    inserted: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "document_id": self.document_id,
+            "unchanged": self.unchanged,
+            "kept": self.kept,
+            "moved": self.moved,
+            "inserted": self.inserted,
+            "deleted": self.deleted,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def _stored_chunks(db: Session, document_id: str) -> list[_StoredChunk]:
+    rows = db.execute(
+        select(DocumentChunk.id, DocumentChunk.chunk_index, DocumentChunk.content_hash)
+        .where(DocumentChunk.document_id == document_id)
+        .order_by(DocumentChunk.chunk_index)
+    )
+    return [_StoredChunk(*row) for row in rows]
+
+
+def _load_state(document_id: str) -> tuple[LibraryDocument, list[_StoredChunk]]:
+    with SessionLocal() as db:
+        document = db.get(LibraryDocument, document_id)
+        if document is None:
+            raise LookupError(f"library_document {document_id} not found")
+        db.expunge(document)
+        return document, _stored_chunks(db, document_id)
+
+
+def _plan(chunks: list[TextChunk], stored: list[_StoredChunk]) -> _Plan:
+    """Match new chunks to stored rows by content hash, preferring rows in place."""
+
+    plan = _Plan()
+    hashes = [chunk_hash(chunk.content) for chunk in chunks]
+    at_index = {row.chunk_index: row for row in stored}
+    used: set[str] = set()
+    matched: dict[int, str] = {}
+
+    for chunk, digest in zip(chunks, hashes):
+        row = at_index.get(chunk.index)
+        if row is not None and row.content_hash == digest:
+            matched[chunk.index] = row.id
+            used.add(row.id)
+            plan.kept.append(row.id)
+
+    by_hash: dict[str | None, deque[_StoredChunk]] = defaultdict(deque)
+    for row in stored:
+        if row.id not in used:
+            by_hash[row.content_hash].append(row)
+
+    for chunk, digest in zip(chunks, hashes):
+        if chunk.index in matched:
+            continue
+        candidates = by_hash.get(digest)
+        if candidates:
+            row = candidates.popleft()
+            used.add(row.id)
+            plan.moves[row.id] = chunk.index
+        else:
+            plan.fresh.append(chunk)
+
+    plan.orphans = [row.id for row in stored if row.id not in used]
+    return plan
+
+
+def _apply(
+    document_id: str,
+    snapshot: list[_StoredChunk],
+    plan: _Plan,
+    vectors: list[list[float]],
+    chunk_total: int,
+    content_hash: str,
+    signature: dict[str, object],
+    report: ReindexReport,
+) -> None:
+    with SessionLocal() as db:
+        document = db.execute(
+            select(LibraryDocument).where(LibraryDocument.id == document_id).with_for_update()
+        ).scalar_one_or_none()
+        if document is None:
+            raise LookupError(f"library_document {document_id} not found")
+        if _stored_chunks(db, document_id) != snapshot:
+            raise ReindexConflict(f"library_document {document_id} changed during reindex")
+
+        if plan.orphans:
+            db.execute(delete(DocumentChunk).where(DocumentChunk.id.in_(plan.orphans)))
+
+        if plan.moves:
+            # The unique (document_id, chunk_index) index is checked row by row,
+            # so park moved rows above every old and new index before renumbering.
+            offset = max(max(row.chunk_index for row in snapshot) + 1, chunk_total)
+            db.execute(
+                update(DocumentChunk)
+                .where(DocumentChunk.id.in_(list(plan.moves)))
+                .values(chunk_index=DocumentChunk.chunk_index + offset)
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(
+                _RENUMBER_SQL,
+                {"ids": list(plan.moves), "indexes": list(plan.moves.values())},
+            )
+
+        if plan.fresh:
+            copy_chunks(
+                db,
+                document.library_id,
+                (
+                    ChunkRow(
+                        document_id=document_id,
+                        chunk_index=chunk.index,
+                        content=chunk.content,
+                        embedding=vector,
+                        token_count=chunk.token_count,
+                    )
+                    for chunk, vector in zip(plan.fresh, vectors)
+                ),
+            )
+        add_chunk_count(db, document.library_id, -len(plan.orphans))
+
+        meta = dict(document.meta or {})
+        meta["ingest"] = {
+            **dict(meta.get("ingest") or {}),
+            "status": "complete",
+            "chunking": signature,
+            "source_hash": content_hash,
+            "error": None,
+            "reindex": report.as_dict(),
+        }
+        document.meta = meta
+        document.content_hash = content_hash
+        db.commit()
+
+
+async def reindex_document(document_id: str, path: Path) -> ReindexReport:
+    """Bring ``document_id``'s chunks in line with the current contents of ``path``."""
+
+    started = time.perf_counter()
+    settings = get_settings()
+    report = ReindexReport(document_id=document_id)
+
+    content_hash = await run_in_threadpool(file_sha256, path)
+    document, stored = await run_in_threadpool(_load_state, document_id)
+    status = (document.meta or {}).get("ingest", {}).get("status")
+    if stored and document.content_hash == content_hash and status == "complete":
+        report.unchanged = True
+        report.kept = len(stored)
+        report.seconds = time.perf_counter() - started
+        return report
+    if not stored:
+        # Nothing to diff against; the streaming pipeline is cheaper for a first load.
+        ingested = await ingest_document(document_id, path)
+        report.inserted = ingested.chunks_written
+        report.seconds = time.perf_counter() - started
+        return report
+
+    chunker = TokenChunker(settings.ingest_chunk_tokens, settings.ingest_chunk_overlap_tokens)
+    chunks = await run_in_threadpool(lambda: list(chunker.chunks(iter_text_blocks(path))))
+    plan = _plan(chunks, stored)
+
+    vectors: list[list[float]] = []
+    size = settings.ingest_embed_batch_size
+    for start in range(0, len(plan.fresh), size):
+        batch = plan.fresh[start : start + size]
+        vectors.extend(await embed_texts([chunk.content for chunk in batch]))
+
+    report.kept = len(plan.kept)
+    report.moved = len(plan.moves)
+    report.inserted = len(plan.fresh)
+    report.deleted = len(plan.orphans)
+    report.seconds = time.perf_counter() - started
+    await run_in_threadpool(
+        _apply,
+        document_id,
+        stored,
+        plan,
+        vectors,
+        len(chunks),
+        content_hash,
+        chunker.signature,
+        report,
+    )
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+async def _main(library_id: str, paths: list[str]) -> None:
+    for root in map(Path, paths):
+        files = sorted(p for p in root.rglob("*") if p.is_file()) if root.is_dir() else [root]
+        for path in files:
+            document_id = await run_in_threadpool(document_for_path, library_id, path)
+            report = await reindex_document(document_id, path)
+            print(json.dumps({"path": str(path), **report.as_dict()}))
+    await run_in_threadpool(_refresh_library_stats, library_id)
+
+
+def _refresh_library_stats(library_id: str) -> None:
+    with SessionLocal() as db:
+        refresh_chunk_counts(db, [library_id])
+        db.commit()
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    if len(sys.argv) < 3:
+        sys.exit("usage: python -m app.services.reindex LIBRARY_ID PATH [PATH ...]")
+    asyncio.run(_main(sys.argv[1], sys.argv[2:]))
@@ -0,0 +1,401 @@
+"""Hybrid vector + full-text retrieval over ``document_chunk``."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+
+from pgvector.sqlalchemy import BIT, HALFVEC, VECTOR
+from sqlalchemy import cast, func, select, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..core.settings import get_settings
+from ..db.models import DocumentChunk, Library, LibraryDocument
+from ..db.session import SessionLocal
+
+# pgvector release that introduced hnsw.iterative_scan.
+_ITERATIVE_SCAN_VERSION = (0, 8, 0)
+_pgvector_version: tuple[int, ...] | None = None
+
+_EMBEDDING_DIM = 768
+
+# ANN index per EMBEDDING_INDEX_MODE (see migration 0007): (name, CREATE INDEX).
+EMBEDDING_INDEXES = {
+    "full": (
+        "idx_document_chunk_embedding_hnsw",
+        "CREATE INDEX IF NOT EXISTS idx_document_chunk_embedding_hnsw"
+        " ON document_chunk USING hnsw (embedding vector_cosine_ops)",
+    ),
+    "halfvec": (
+        "idx_document_chunk_embedding_halfvec_hnsw",
+        "CREATE INDEX IF NOT EXISTS idx_document_chunk_embedding_halfvec_hnsw"
+        " ON document_chunk USING hnsw ((embedding::halfvec(768)) halfvec_cosine_ops)",
+    ),
+    "binary": (
+        "idx_document_chunk_embedding_binary_hnsw",
+        "CREATE INDEX IF NOT EXISTS idx_document_chunk_embedding_binary_hnsw"
+        " ON document_chunk USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops)",
+    ),
+}
+
+
+@dataclass
+class RetrievedChunk:
+    chunk_id: str
+    document_id: str
+    library_id: str
+    chunk_index: int
+    content: str
+    score: float = 0.0
+    vector_rank: int | None = None
+    vector_distance: float | None = None
+    text_rank: int | None = None
+    text_score: float | None = None
+
+
+@dataclass
+class VectorPlan:
+    """How the ANN leg was executed, reported back to callers."""
+
+    strategy: str
+    scoped_chunks: int
+    ef_search: int | None = None
+    index: str = "full"
+
+
+@dataclass
+class HybridResult:
+    chunks: list[RetrievedChunk]
+    timings_ms: dict[str, float] = field(default_factory=dict)
+    vector_plan: VectorPlan | None = None
+
+
+def _chunk_columns():
+    return (
+        DocumentChunk.id,
+        DocumentChunk.document_id,
+        LibraryDocument.library_id,
+        DocumentChunk.chunk_index,
+        DocumentChunk.content,
+    )
+
+
+def _vector_hits(rows) -> list[RetrievedChunk]:
+    # Iterative scans in relaxed order may return rows slightly out of order.
+    rows = sorted(rows, key=lambda row: row.distance)
+    return [
+        RetrievedChunk(
+            chunk_id=row.id,
+            document_id=row.document_id,
+            library_id=row.library_id,
+            chunk_index=row.chunk_index,
+            content=row.content,
+            vector_rank=rank,
+            vector_distance=float(row.distance),
+        )
+        for rank, row in enumerate(rows, start=1)
+    ]
+
+
+def _pgvector_supports_iterative_scan(db: Session) -> bool:
+    global _pgvector_version
+    if _pgvector_version is None:
+        version = db.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        ).scalar()
+        _pgvector_version = tuple(int(part) for part in (version or "0").split(".")[:3])
+    return _pgvector_version >= _ITERATIVE_SCAN_VERSION
+
+
+def _scoped_chunk_count(db: Session, library_ids: list[str]) -> int:
+    return int(
+        db.execute(
+            select(func.coalesce(func.sum(Library.chunk_count), 0)).where(
+                Library.id.in_(library_ids)
+            )
+        ).scalar()
+    )
+
+
+def _total_chunk_estimate(db: Session) -> int:
+    # Planner statistics, not COUNT(*): this must stay O(1) as the table grows.
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'document_chunk'::regclass")
+    ).scalar()
+    return max(int(estimate or 0), 0)
+
+
+def _exact_search(
+    db: Session,
+    library_ids: list[str],
+    query_vector: list[float],
+    limit: int,
+) -> list[RetrievedChunk]:
+    """Brute-force distance over the scoped rows; always returns the true top-k.
+
+    The materialized CTE fences the scoped rows off from the HNSW index, so
+    the scan is driven by ``idx_document_chunk_doc`` instead.
+    """
+
+    scoped = (
+        select(*_chunk_columns(), DocumentChunk.embedding)
+        .join(LibraryDocument, LibraryDocument.id == DocumentChunk.document_id)
+        .where(LibraryDocument.library_id.in_(library_ids))
+        .cte("scoped")
+        .prefix_with("MATERIALIZED")
+    )
+    distance = scoped.c.embedding.cosine_distance(query_vector)
+    rows = db.execute(
+        select(
+            scoped.c.id,
+            scoped.c.document_id,
+            scoped.c.library_id,
+            scoped.c.chunk_index,
+            scoped.c.content,
+            distance.label("distance"),
+        )
+        .order_by(distance)
+        .limit(limit)
+    ).all()
+    return _vector_hits(rows)
+
+
+def _ann_search(
+    db: Session,
+    library_ids: list[str],
+    query_vector: list[float],
+    limit: int,
+) -> list[RetrievedChunk]:
+    distance = DocumentChunk.embedding.cosine_distance(query_vector)
+    rows = db.execute(
+        select(*_chunk_columns(), distance.label("distance"))
+        .join(LibraryDocument, LibraryDocument.id == DocumentChunk.document_id)
+        .where(LibraryDocument.library_id.in_(library_ids))
+        .order_by(distance)
+        .limit(limit)
+    ).all()
+    return _vector_hits(rows)
+
+
+def _quantized_distance(mode: str, query_vector: list[float]):
+    """Distance expression matching the quantized index's indexed expression."""
+
+    if mode == "halfvec":
+        return cast(DocumentChunk.embedding, HALFVEC(_EMBEDDING_DIM)).cosine_distance(
+            query_vector
+        )
+    stored = cast(func.binary_quantize(DocumentChunk.embedding), BIT(_EMBEDDING_DIM))
+    query = cast(
+        func.binary_quantize(cast(query_vector, VECTOR(_EMBEDDING_DIM))), BIT(_EMBEDDING_DIM)
+    )
+    return stored.hamming_distance(query)
+
+
+def _rescored_ann_search(
+    db: Session,
+    library_ids: list[str],
+    query_vector: list[float],
+    limit: int,
+    candidates: int,
+    mode: str,
+) -> list[RetrievedChunk]:
+    """Take ``candidates`` rows from the quantized index, re-rank on full vectors."""
+
+    shortlist = (
+        select(*_chunk_columns(), DocumentChunk.embedding)
+        .join(LibraryDocument, LibraryDocument.id == DocumentChunk.document_id)
+        .where(LibraryDocument.library_id.in_(library_ids))
+        .order_by(_quantized_distance(mode, query_vector))
+        .limit(candidates)
+        .subquery("shortlist")
+    )
+    distance = shortlist.c.embedding.cosine_distance(query_vector)
+    rows = db.execute(
+        select(
+            shortlist.c.id,
+            shortlist.c.document_id,
+            shortlist.c.library_id,
+            shortlist.c.chunk_index,
+            shortlist.c.content,
+            distance.label("distance"),
+        )
+        .order_by(distance)
+        .limit(limit)
+    ).all()
+    return _vector_hits(rows)
+
+
+def vector_search(
+    db: Session,
+    library_ids: list[str],
+    query_vector: list[float],
+    limit: int,
+) -> tuple[list[RetrievedChunk], VectorPlan]:
+    """Nearest chunks by cosine distance, planned around library selectivity.
+
+    Filtering HNSW output by library loses recall when the scoped libraries
+    are a small share of the table, so the plan is chosen per query:
+
+    * ``exact`` when the scoped libraries hold few enough chunks that a
+      brute-force scan is cheap;
+    * ``hnsw_iterative`` on pgvector >= 0.8, letting the index keep scanning
+      (bounded by ``hnsw.max_scan_tuples``) until enough rows pass the filter;
+    * ``hnsw`` otherwise, with ``hnsw.ef_search`` widened by the inverse
+      selectivity of the filter.
+
+    If an ANN plan still yields fewer than ``limit`` rows the leg falls back to
+    exact search (strategy suffixed ``+exact``), so k results are guaranteed.
+
+    With a quantized ``embedding_index_mode`` the ANN plans read
+    ``limit * retrieval_rescore_multiplier`` candidates from the halfvec or
+    binary index and re-rank them by full-precision cosine distance.
+    """
+
+    settings = get_settings()
+    mode = settings.embedding_index_mode
+    scoped_chunks = _scoped_chunk_count(db, library_ids)
+    if scoped_chunks <= settings.retrieval_exact_max_chunks:
+        plan = VectorPlan(strategy="exact", scoped_chunks=scoped_chunks)
+        return _exact_search(db, library_ids, query_vector, limit), plan
+
+    candidates = limit if mode == "full" else limit * settings.retrieval_rescore_multiplier
+    selectivity = scoped_chunks / max(_total_chunk_estimate(db), scoped_chunks)
+    ef_search = min(
+        settings.retrieval_max_ef_search,
+        max(candidates, settings.retrieval_min_ef_search, math.ceil(candidates / selectivity)),
+    )
+    # set_config(..., true) is transaction-local, like SET LOCAL, but accepts binds.
+    db.execute(
+        text("SELECT set_config('hnsw.ef_search', :ef, true)"),
+        {"ef": str(ef_search)},
+    )
+    strategy = "hnsw"
+    if _pgvector_supports_iterative_scan(db):
+        strategy = "hnsw_iterative"
+        db.execute(text("SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true)"))
+        db.execute(
+            text("SELECT set_config('hnsw.max_scan_tuples', :tuples, true)"),
+            {"tuples": str(settings.retrieval_max_scan_tuples)},
+        )
+
+    if mode == "full":
+        hits = _ann_search(db, library_ids, query_vector, limit)
+    else:
+        hits = _rescored_ann_search(db, library_ids, query_vector, limit, candidates, mode)
+    if len(hits) < min(limit, scoped_chunks):
+        hits = _exact_search(db, library_ids, query_vector, limit)
+        strategy += "+exact"
+    return hits, VectorPlan(
+        strategy=strategy,
+        scoped_chunks=scoped_chunks,
+        ef_search=ef_search,
+        index=mode,
+    )
+
+
+def text_search(
+    db: Session,
+    library_ids: list[str],
+    query: str,
+    limit: int,
+) -> list[RetrievedChunk]:
+    """Best ``ts_rank`` matches via the GIN index on ``content_tsv``."""
+
+    ts_query = func.websearch_to_tsquery("english", query)
+    rank = func.ts_rank(DocumentChunk.content_tsv, ts_query)
+    rows = db.execute(
+        select(*_chunk_columns(), rank.label("rank"))
+        .join(LibraryDocument, LibraryDocument.id == DocumentChunk.document_id)
+        .where(LibraryDocument.library_id.in_(library_ids))
+        .where(DocumentChunk.content_tsv.op("@@")(ts_query))
+        .order_by(rank.desc())
+        .limit(limit)
+    ).all()
+    return [
+        RetrievedChunk(
+            chunk_id=row.id,
+            document_id=row.document_id,
+            library_id=row.library_id,
+            chunk_index=row.chunk_index,
+            content=row.content,
+            text_rank=position,
+            text_score=float(row.rank),
+        )
+        for position, row in enumerate(rows, start=1)
+    ]
+
+
+def reciprocal_rank_fusion(
+    vector_hits: list[RetrievedChunk],
+    text_hits: list[RetrievedChunk],
+    k: int,
+    rrf_k: int,
+) -> list[RetrievedChunk]:
+    """Merge both rankings with RRF: ``score = sum(1 / (rrf_k + rank))``."""
+
+    fused: dict[str, RetrievedChunk] = {}
+    for hit in vector_hits:
+        fused[hit.chunk_id] = hit
+        hit.score = 1.0 / (rrf_k + hit.vector_rank)
+    for hit in text_hits:
+        existing = fused.get(hit.chunk_id)
+        if existing is None:
+            fused[hit.chunk_id] = hit
+            hit.score = 1.0 / (rrf_k + hit.text_rank)
+        else:
+            existing.text_rank = hit.text_rank
+            existing.text_score = hit.text_score
+            existing.score += 1.0 / (rrf_k + hit.text_rank)
+    return sorted(fused.values(), key=lambda hit: hit.score, reverse=True)[:k]
+
+
+def _timed(fn, *args):
+    """Run a search on its own session so both legs can run concurrently."""
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        result = fn(db, *args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+async def hybrid_search(
+    library_ids: list[str],
+    query: str,
+    query_vector: list[float] | None,
+    k: int,
+    candidates: int,
+    rrf_k: int,
+) -> HybridResult:
+    """Run ANN and full-text search in parallel and fuse the rankings.
+
+    Each leg fetches ``candidates`` rows on its own pooled connection. When
+    ``query_vector`` is None (embedding unavailable) only the text leg runs.
+    """
+
+    started = time.perf_counter()
+    text_leg = run_in_threadpool(_timed, text_search, library_ids, query, candidates)
+    vector_plan: VectorPlan | None = None
+    if query_vector is not None:
+        vector_leg = run_in_threadpool(_timed, vector_search, library_ids, query_vector, candidates)
+        ((vector_hits, vector_plan), vector_ms), (text_hits, text_ms) = await asyncio.gather(
+            vector_leg, text_leg
+        )
+    else:
+        (text_hits, text_ms), vector_hits, vector_ms = await text_leg, [], 0.0
+
+    fusion_started = time.perf_counter()
+    chunks = reciprocal_rank_fusion(vector_hits, text_hits, k=k, rrf_k=rrf_k)
+    finished = time.perf_counter()
+    return HybridResult(
+        chunks=chunks,
+        timings_ms={
+            "vector_ms": round(vector_ms, 3),
+            "text_ms": round(text_ms, 3),
+            "fusion_ms": round((finished - fusion_started) * 1000, 3),
+            "search_ms": round((finished - started) * 1000, 3),
+        },
+        vector_plan=vector_plan,
+    )
@@ -0,0 +1,326 @@
+"""Per-user unread message counters for class rooms.
+
+Counters live in one Redis hash per user (``unread:{user_id}``, field =
+room id). Posting a message increments the hash of every other room member;
+reading a room sets its field immediately to what is left after the new read
+position (zero unless the client reported an older position), while the
+receipt itself is written behind by :mod:`app.services.read_receipts`. A missing hash is rebuilt from
+``class_read_receipt`` with one grouped query, and every hash expires after
+``unread_counter_ttl_seconds`` so drift (e.g. membership changes) is
+reconciled periodically. Counters are only ever incremented on hashes that
+already exist, so a partially-built hash is never mistaken for a full one.
+
+A rebuild counts from receipts plus the positions still waiting in the
+receipt buffer, then installs the hash only if no counter for that user
+changed meanwhile: it sets a build token before querying, every increment or
+reset deletes it, and the install is skipped when the token is gone. A
+skipped install still answers the request from the query; the next read
+retries the rebuild.
+
+Without Redis every read falls back to the grouped query. Each entry point
+has an ``_async`` twin for routes served from the async engine.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+
+from sqlalchemy import BigInteger, CompoundSelect, Select, and_, column, func, select, union, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..core.redis import get_redis, get_sync_redis
+from ..core.settings import get_settings
+from ..db.models import ClassMessage, ClassReadReceipt, ClassRoom, ClassRoomMember
+from .read_receipts import get_read_receipt_buffer
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "unread:"
+_BUILD_PREFIX = "unread:build:"
+# Present in every complete hash, so an empty user still has a cached hash.
+_MARKER = "_"
+# Longer than any rebuild query should take; an expired token only skips an install.
+_BUILD_TTL_MS = 10_000
+
+# KEYS are (counter hash, build token) pairs, one per recipient.
+_INCR_IF_EXISTS = """
+for i = 1, #KEYS, 2 do
+  redis.call('DEL', KEYS[i + 1])
+  if redis.call('EXISTS', KEYS[i]) == 1 then
+    redis.call('HINCRBY', KEYS[i], ARGV[1], 1)
+  end
+end
+return 0
+"""
+
+_SET_IF_EXISTS = """
+redis.call('DEL', KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return 0
+"""
+
+# ARGV: build token, ttl seconds, then field/value pairs of the full hash.
+_INSTALL = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+  return 0
+end
+redis.call('DEL', KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+  redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+
+def _key(user_id: str) -> str:
+    return _KEY_PREFIX + user_id
+
+
+def _build_key(user_id: str) -> str:
+    return _BUILD_PREFIX + user_id
+
+
+def _counter_keys(user_ids) -> list[str]:
+    return [key for user_id in user_ids for key in (_key(user_id), _build_key(user_id))]
+
+
+def _install_args(token: str, counts: dict[str, int]) -> list[object]:
+    args: list[object] = [token, get_settings().unread_counter_ttl_seconds, _MARKER, 0]
+    for room_id, count in counts.items():
+        args.extend((room_id, count))
+    return args
+
+
+def visible_room_ids(user_id: str):
+    """Select of room ids the user created or is a member of."""
+
+    return union(
+        select(ClassRoom.id.label("id")).where(ClassRoom.created_by_user_id == user_id),
+        select(ClassRoomMember.class_room_id).where(ClassRoomMember.user_id == user_id),
+    )
+
+
+def _unread_statement(user_id: str, visible, pending: dict[str, int]) -> Select:
+    """Unread messages per room after the stored or still-buffered read position."""
+
+    read_at = func.coalesce(ClassReadReceipt.last_read_at, 0)
+    stmt = (
+        select(ClassMessage.class_room_id, func.count())
+        .join(visible, visible.c.id == ClassMessage.class_room_id)
+        .outerjoin(
+            ClassReadReceipt,
+            and_(
+                ClassReadReceipt.class_room_id == ClassMessage.class_room_id,
+                ClassReadReceipt.user_id == user_id,
+            ),
+        )
+    )
+    if pending:
+        buffered = values(
+            column("class_room_id", UUID(as_uuid=False)),
+            column("last_read_at", BigInteger),
+            name="buffered",
+        ).data(list(pending.items()))
+        stmt = stmt.outerjoin(buffered, buffered.c.class_room_id == ClassMessage.class_room_id)
+        read_at = func.greatest(read_at, func.coalesce(buffered.c.last_read_at, 0))
+    return stmt.where(
+        ClassMessage.created_at > read_at,
+        ClassMessage.user_id != user_id,
+    ).group_by(ClassMessage.class_room_id)
+
+
+def _remaining_statement(room_id: str, user_id: str, read_at: int) -> Select:
+    """Messages in one room still unread after ``read_at`` (or the stored receipt, if later)."""
+
+    stored = (
+        select(ClassReadReceipt.last_read_at)
+        .where(ClassReadReceipt.class_room_id == room_id, ClassReadReceipt.user_id == user_id)
+        .scalar_subquery()
+    )
+    return select(func.count()).where(
+        ClassMessage.class_room_id == room_id,
+        ClassMessage.user_id != user_id,
+        ClassMessage.created_at > func.greatest(read_at, func.coalesce(stored, 0)),
+    )
+
+
+def _recipient_statement(room_id: str) -> CompoundSelect:
+    """Everyone who can see the room: its members and its creator."""
+
+    return union(
+        select(ClassRoomMember.user_id).where(ClassRoomMember.class_room_id == room_id),
+        select(ClassRoom.created_by_user_id).where(ClassRoom.id == room_id),
+    )
+
+
+def unread_from_db(db: Session, user_id: str) -> dict[str, int]:
+    """Unread counts for all of the user's rooms from receipts, in one grouped query."""
+
+    visible = visible_room_ids(user_id).subquery("visible")
+    counts = {room_id: 0 for room_id in db.execute(select(visible.c.id)).scalars()}
+    if not counts:
+        return counts
+    pending = get_read_receipt_buffer().pending_positions(user_id, list(counts))
+    rows = db.execute(_unread_statement(user_id, visible, pending))
+    counts.update({room_id: int(count) for room_id, count in rows})
+    return counts
+
+
+def _parse_counters(cached: dict[bytes, bytes]) -> dict[str, int]:
+    return {
+        field.decode(): max(int(value), 0)
+        for field, value in cached.items()
+        if field.decode() != _MARKER
+    }
+
+
+def cached_unread_counts(db: Session, user_id: str) -> dict[str, int] | None:
+    """Counters from Redis, rebuilding a missing hash; None when Redis is unavailable."""
+
+    redis = get_sync_redis()
+    if redis is None:
+        return None
+    key = _key(user_id)
+    try:
+        cached = redis.hgetall(key)
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter lookup failed", exc_info=True)
+        return None
+    if cached:
+        return _parse_counters(cached)
+
+    token = uuid.uuid4().hex
+    try:
+        redis.set(_build_key(user_id), token, px=_BUILD_TTL_MS)
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter rebuild failed", exc_info=True)
+        return None
+    counts = unread_from_db(db, user_id)
+    try:
+        redis.eval(_INSTALL, 2, key, _build_key(user_id), *_install_args(token, counts))
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter rebuild failed", exc_info=True)
+    return counts
+
+
+def unread_counts(db: Session, user_id: str) -> dict[str, int]:
+    """Unread count per visible room, O(rooms) when counters are cached."""
+
+    cached = cached_unread_counts(db, user_id)
+    return cached if cached is not None else unread_from_db(db, user_id)
+
+
+def record_message(db: Session, room_id: str, author_id: str) -> None:
+    """Count a new message as unread for every room member except its author."""
+
+    redis = get_sync_redis()
+    if redis is None:
+        return
+    recipients = set(db.execute(_recipient_statement(room_id)).scalars())
+    recipients.discard(author_id)
+    recipients.discard(None)
+    if not recipients:
+        return
+    keys = _counter_keys(recipients)
+    try:
+        redis.eval(_INCR_IF_EXISTS, len(keys), *keys, room_id)
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter increment failed", exc_info=True)
+
+
+def reset_unread(db: Session, room_id: str, user_id: str, read_at: int) -> None:
+    """Set the user's counter for a room they have read up to ``read_at``.
+
+    The receipt must already be recorded; its buffered position is used when
+    it is ahead of ``read_at``. Reading up to the newest message counts zero
+    remaining, found with one range scan on the room's message index.
+    """
+
+    redis = get_sync_redis()
+    if redis is None:
+        return
+    pending = get_read_receipt_buffer().pending_positions(user_id, [room_id])
+    position = max(read_at, pending.get(room_id, 0))
+    remaining = db.execute(_remaining_statement(room_id, user_id, position)).scalar_one()
+    try:
+        redis.eval(_SET_IF_EXISTS, 2, _key(user_id), _build_key(user_id), room_id, remaining)
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter reset failed", exc_info=True)
+
+
+async def unread_from_db_async(db: AsyncSession, user_id: str) -> dict[str, int]:
+    visible = visible_room_ids(user_id).subquery("visible")
+    counts = {room_id: 0 for room_id in (await db.execute(select(visible.c.id))).scalars()}
+    if not counts:
+        return counts
+    pending = await get_read_receipt_buffer().pending_positions_async(user_id, list(counts))
+    rows = await db.execute(_unread_statement(user_id, visible, pending))
+    counts.update({room_id: int(count) for room_id, count in rows})
+    return counts
+
+
+async def cached_unread_counts_async(db: AsyncSession, user_id: str) -> dict[str, int] | None:
+    redis = get_redis()
+    if redis is None:
+        return None
+    key = _key(user_id)
+    try:
+        cached = await redis.hgetall(key)
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter lookup failed", exc_info=True)
+        return None
+    if cached:
+        return _parse_counters(cached)
+
+    token = uuid.uuid4().hex
+    try:
+        await redis.set(_build_key(user_id), token, px=_BUILD_TTL_MS)
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter rebuild failed", exc_info=True)
+        return None
+    counts = await unread_from_db_async(db, user_id)
+    try:
+        await redis.eval(_INSTALL, 2, key, _build_key(user_id), *_install_args(token, counts))
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter rebuild failed", exc_info=True)
+    return counts
+
+
+async def unread_counts_async(db: AsyncSession, user_id: str) -> dict[str, int]:
+    cached = await cached_unread_counts_async(db, user_id)
+    return cached if cached is not None else await unread_from_db_async(db, user_id)
+
+
+async def record_message_async(db: AsyncSession, room_id: str, author_id: str) -> None:
+    redis = get_redis()
+    if redis is None:
+        return
+    recipients = set((await db.execute(_recipient_statement(room_id))).scalars())
+    recipients.discard(author_id)
+    recipients.discard(None)
+    if not recipients:
+        return
+    keys = _counter_keys(recipients)
+    try:
+        await redis.eval(_INCR_IF_EXISTS, len(keys), *keys, room_id)
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter increment failed", exc_info=True)
+
+
+async def reset_unread_async(db: AsyncSession, room_id: str, user_id: str, read_at: int) -> None:
+    redis = get_redis()
+    if redis is None:
+        return
+    pending = await get_read_receipt_buffer().pending_positions_async(user_id, [room_id])
+    position = max(read_at, pending.get(room_id, 0))
+    remaining = (await db.execute(_remaining_statement(room_id, user_id, position))).scalar_one()
+    try:
+        await redis.eval(_SET_IF_EXISTS, 2, _key(user_id), _build_key(user_id), room_id, remaining)
+    except Exception:  # pragma: no cover - depends on redis availability
+        logger.warning("unread counter reset failed", exc_info=True)
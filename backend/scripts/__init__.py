@@ -0,0 +1 @@
+"""Operational scripts; run from the backend directory with ``python -m scripts.<name>``."""
@@ -0,0 +1,413 @@
+"""Retrieval benchmark and recall harness for the chunk ANN index.
+
+Seeds a scratch ``bench_chunk`` table (``document_chunk`` is never modified)
+from one of three corpora:
+
+* ``synthetic`` (default): clustered 768-d unit vectors, reproducible by seed;
+* ``--corpus FILE.npy``: an ``(n, 768)`` float array of real embeddings;
+* ``--from-document-chunk``: a copy of embeddings already in the database.
+
+Exact top-k for the query set is computed by sequential scan before any
+index exists. Then, for every index mode and HNSW build parameter pair
+(``m`` x ``ef_construction``), the index is built and measured at each
+``ef_search``: recall@k against the exact results, single-client latency
+p50/p95/p99, and QPS plus latency under each ``--concurrency`` level. Quantized
+modes are queried the way retrieval does: ``k * rescore_multiplier``
+candidates from the quantized index, re-ranked on full vectors.
+
+The report is JSON (stdout, or ``--output``) so runs can be diffed between
+releases::
+
+    python -m scripts.bench_retrieval --rows 1000000 --m 16,32 \\
+        --ef-construction 64,128 --ef-search 40,100,200 --concurrency 1,8,32 \\
+        --output bench-1m.json
+
+Use ``--keep`` and then ``--reuse`` to sweep again without reseeding large
+tables; ground truth is recomputed for each run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import psycopg
+from pgvector.psycopg import register_vector
+
+from app.core.settings import get_settings
+
+DIM = 768
+
+_INDEX_DDL = {
+    "full": (
+        "CREATE INDEX bench_chunk_ann ON bench_chunk"
+        " USING hnsw (embedding vector_cosine_ops)"
+    ),
+    "halfvec": (
+        "CREATE INDEX bench_chunk_ann ON bench_chunk"
+        " USING hnsw ((embedding::halfvec(768)) halfvec_cosine_ops)"
+    ),
+    "binary": (
+        "CREATE INDEX bench_chunk_ann ON bench_chunk"
+        " USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops)"
+    ),
+}
+
+_EXACT_QUERY = "SELECT id FROM bench_chunk ORDER BY embedding <=> %(q)s LIMIT %(k)s"
+
+_ANN_QUERY = {
+    "full": _EXACT_QUERY,
+    "halfvec": """
+        SELECT id FROM (
+          SELECT id, embedding FROM bench_chunk
+          ORDER BY embedding::halfvec(768) <=> %(q)s::halfvec(768)
+          LIMIT %(candidates)s
+        ) AS shortlist
+        ORDER BY embedding <=> %(q)s
+        LIMIT %(k)s
+    """,
+    "binary": """
+        SELECT id FROM (
+          SELECT id, embedding FROM bench_chunk
+          ORDER BY binary_quantize(embedding)::bit(768) <~> binary_quantize(%(q)s)::bit(768)
+          LIMIT %(candidates)s
+        ) AS shortlist
+        ORDER BY embedding <=> %(q)s
+        LIMIT %(k)s
+    """,
+}
+
+
+def _database_url(url: str | None) -> str:
+    # Settings carry the SQLAlchemy form (postgresql+psycopg://); psycopg wants libpq's.
+    return (url or get_settings().database_url).replace("+psycopg", "", 1)
+
+
+def _connect(url: str) -> psycopg.Connection:
+    conn = psycopg.connect(url)
+    register_vector(conn)
+    return conn
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _synthetic(rng: np.random.Generator, centers: np.ndarray, count: int) -> np.ndarray:
+    labels = rng.integers(0, len(centers), size=count)
+    return _unit(centers[labels] + 0.35 * rng.standard_normal((count, DIM), dtype=np.float32))
+
+
+def _create_table(conn: psycopg.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS bench_chunk")
+    conn.execute(
+        f"CREATE TABLE bench_chunk (id bigint PRIMARY KEY, embedding vector({DIM}) NOT NULL)"
+    )
+
+
+def _copy_batches(conn: psycopg.Connection, batches) -> int:
+    rows = 0
+    with conn.cursor() as cursor:
+        with cursor.copy("COPY bench_chunk (id, embedding) FROM STDIN WITH (FORMAT BINARY)") as copy:
+            copy.set_types(["int8", "vector"])
+            for vectors in batches:
+                for vector in vectors:
+                    copy.write_row((rows, vector))
+                    rows += 1
+    return rows
+
+
+def seed(conn: psycopg.Connection, args: argparse.Namespace, rng: np.random.Generator) -> np.ndarray:
+    """Load the corpus into ``bench_chunk`` and return the query vectors."""
+
+    batch = 10_000
+    if args.from_document_chunk:
+        _create_table(conn)
+        conn.execute(
+            """
+            INSERT INTO bench_chunk (id, embedding)
+            SELECT row_number() OVER () - 1, embedding FROM document_chunk LIMIT %s
+            """,
+            (args.rows,),
+        )
+    elif args.corpus:
+        corpus = np.load(args.corpus, mmap_mode="r")
+        if corpus.ndim != 2 or corpus.shape[1] != DIM:
+            raise SystemExit(f"--corpus must be an (n, {DIM}) array, got {corpus.shape}")
+        count = min(args.rows, len(corpus))
+        _create_table(conn)
+        _copy_batches(
+            conn,
+            (_unit(corpus[start : start + batch]) for start in range(0, count, batch)),
+        )
+    elif not args.reuse:
+        _create_table(conn)
+        centers = rng.standard_normal((args.clusters, DIM), dtype=np.float32)
+        _copy_batches(
+            conn,
+            (
+                _synthetic(rng, centers, min(batch, args.rows - start))
+                for start in range(0, args.rows, batch)
+            ),
+        )
+    conn.execute("ANALYZE bench_chunk")
+    conn.commit()
+
+    # Queries are stored vectors nudged off their exact position, so they
+    # follow the corpus distribution without trivially matching themselves.
+    sampled = conn.execute(
+        "SELECT embedding FROM bench_chunk ORDER BY random() LIMIT %s", (args.queries,)
+    ).fetchall()
+    base = np.stack([np.asarray(row[0].to_numpy(), dtype=np.float32) for row in sampled])
+    return _unit(base + 0.05 * rng.standard_normal(base.shape, dtype=np.float32))
+
+
+def exact_neighbours(conn: psycopg.Connection, queries: np.ndarray, k: int) -> list[set[int]]:
+    """Ground truth by sequential scan; run before any ANN index exists."""
+
+    conn.execute("DROP INDEX IF EXISTS bench_chunk_ann")
+    return [
+        {row[0] for row in conn.execute(_EXACT_QUERY, {"q": query, "k": k})} for query in queries
+    ]
+
+
+def percentiles(samples_ms: list[float]) -> dict[str, float]:
+    values = np.asarray(samples_ms)
+    return {f"p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+
+def build_index(
+    conn: psycopg.Connection,
+    mode: str,
+    m: int,
+    ef_construction: int,
+    maintenance_work_mem: str,
+) -> dict[str, object]:
+    conn.execute("DROP INDEX IF EXISTS bench_chunk_ann")
+    conn.execute("SELECT set_config('maintenance_work_mem', %s, false)", (maintenance_work_mem,))
+    started = time.perf_counter()
+    conn.execute(f"{_INDEX_DDL[mode]} WITH (m = {int(m)}, ef_construction = {int(ef_construction)})")
+    conn.commit()
+    return {
+        "build_seconds": round(time.perf_counter() - started, 3),
+        "index_bytes": conn.execute("SELECT pg_relation_size('bench_chunk_ann')").fetchone()[0],
+    }
+
+
+def _params(mode: str, k: int, rescore_multiplier: int, ef_search: int) -> tuple[int, int]:
+    candidates = k if mode == "full" else k * rescore_multiplier
+    return candidates, max(ef_search, candidates)
+
+
+def measure_recall(
+    conn: psycopg.Connection,
+    mode: str,
+    queries: np.ndarray,
+    truth: list[set[int]],
+    k: int,
+    candidates: int,
+    ef_search: int,
+) -> dict[str, object]:
+    """Single-client pass: recall@k and latency percentiles."""
+
+    conn.execute("SELECT set_config('hnsw.ef_search', %s, false)", (str(ef_search),))
+    latencies: list[float] = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = {
+            row[0]
+            for row in conn.execute(_ANN_QUERY[mode], {"q": query, "k": k, "candidates": candidates})
+        }
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(found & expected)
+    return {
+        "recall_at_k": round(hits / (k * len(queries)), 4),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def measure_throughput(
+    url: str,
+    mode: str,
+    queries: np.ndarray,
+    k: int,
+    candidates: int,
+    ef_search: int,
+    concurrency: int,
+    duration: float,
+) -> dict[str, object]:
+    """Closed-loop load: ``concurrency`` clients, one connection each, for ``duration`` s."""
+
+    connections = [_connect(url) for _ in range(concurrency)]
+    for conn in connections:
+        conn.execute("SELECT set_config('hnsw.ef_search', %s, false)", (str(ef_search),))
+    start_barrier = threading.Barrier(concurrency)
+
+    def client(worker: int) -> list[float]:
+        conn = connections[worker]
+        latencies: list[float] = []
+        position = worker
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            query = queries[position % len(queries)]
+            position += concurrency
+            started = time.perf_counter()
+            conn.execute(_ANN_QUERY[mode], {"q": query, "k": k, "candidates": candidates}).fetchall()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            per_client = list(pool.map(client, range(concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        for conn in connections:
+            conn.close()
+
+    latencies = [sample for samples in per_client for sample in samples]
+    return {
+        "concurrency": concurrency,
+        "queries": len(latencies),
+        "qps": round(len(latencies) / elapsed, 2),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def _environment(conn: psycopg.Connection) -> dict[str, str]:
+    return {
+        "server_version": conn.execute("SHOW server_version").fetchone()[0],
+        "pgvector_version": conn.execute(
+            "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+        ).fetchone()[0],
+        "client_host": platform.node(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def main(argv: list[str] | None = None) -> dict[str, object]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL from settings")
+    corpus = parser.add_mutually_exclusive_group()
+    corpus.add_argument("--corpus", type=Path, help="(n, 768) .npy array of embeddings")
+    corpus.add_argument("--from-document-chunk", action="store_true")
+    corpus.add_argument("--reuse", action="store_true", help="keep an existing bench_chunk")
+    parser.add_argument("--rows", type=int, default=100_000, help="10k to 10M")
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", default="full,halfvec,binary")
+    parser.add_argument("--m", type=_int_list, default=[16])
+    parser.add_argument("--ef-construction", type=_int_list, default=[64])
+    parser.add_argument("--ef-search", type=_int_list, default=[40, 100, 200])
+    parser.add_argument("--rescore-multiplier", type=int, default=4)
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per load level")
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="keep bench_chunk afterwards")
+    parser.add_argument("--output", type=Path, help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = set(modes) - set(_INDEX_DDL)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    url = _database_url(args.database_url)
+    rng = np.random.default_rng(args.seed)
+    runs: list[dict[str, object]] = []
+    with psycopg.connect(url) as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        conn.commit()
+        register_vector(conn)
+        environment = _environment(conn)
+
+        started = time.perf_counter()
+        queries = seed(conn, args, rng)
+        seed_seconds = time.perf_counter() - started
+        rows = conn.execute("SELECT count(*) FROM bench_chunk").fetchone()[0]
+        table_bytes = conn.execute("SELECT pg_relation_size('bench_chunk')").fetchone()[0]
+
+        started = time.perf_counter()
+        truth = exact_neighbours(conn, queries, args.k)
+        exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        for mode in modes:
+            for m in args.m:
+                for ef_construction in args.ef_construction:
+                    build = build_index(conn, mode, m, ef_construction, args.maintenance_work_mem)
+                    for ef_search in args.ef_search:
+                        candidates, effective_ef = _params(
+                            mode, args.k, args.rescore_multiplier, ef_search
+                        )
+                        run = {
+                            "mode": mode,
+                            "m": m,
+                            "ef_construction": ef_construction,
+                            "ef_search": effective_ef,
+                            "candidates": candidates,
+                            **build,
+                            **measure_recall(
+                                conn, mode, queries, truth, args.k, candidates, effective_ef
+                            ),
+                            "load": [
+                                measure_throughput(
+                                    url,
+                                    mode,
+                                    queries,
+                                    args.k,
+                                    candidates,
+                                    effective_ef,
+                                    level,
+                                    args.duration,
+                                )
+                                for level in args.concurrency
+                            ],
+                        }
+                        runs.append(run)
+                        print(json.dumps(run), file=sys.stderr, flush=True)
+
+        conn.execute("DROP INDEX IF EXISTS bench_chunk_ann")
+        if not args.keep:
+            conn.execute("DROP TABLE bench_chunk")
+        conn.commit()
+
+    config = {
+        key: str(value) if isinstance(value, Path) else value
+        for key, value in vars(args).items()
+        if key not in {"database_url", "output"}
+    }
+    report = {
+        "environment": environment,
+        "config": config,
+        "rows": rows,
+        "table_bytes": table_bytes,
+        "seed_seconds": round(seed_seconds, 3),
+        "exact_ms_per_query": round(exact_ms, 3),
+        "runs": runs,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.api import ollama_proxy
+from app.core.admission import AdmissionRejected, FairAdmissionController
+
+
+def _controller(**overrides) -> FairAdmissionController:
+    options = {
+        "max_concurrency": 1,
+        "max_queue": 16,
+        "max_queue_per_user": 2,
+        "queue_timeout_seconds": 5.0,
+    }
+    options.update(overrides)
+    return FairAdmissionController(**options)
+
+
+def test_admits_immediately_below_concurrency():
+    async def run():
+        controller = _controller(max_concurrency=2)
+        first = await controller.acquire("u1", "r1")
+        second = await controller.acquire("u2", "r1")
+        assert controller.snapshot()["active"] == 2
+        first.release()
+        second.release()
+        second.release()  # idempotent
+        assert controller.snapshot()["active"] == 0
+
+    asyncio.run(run())
+
+
+def test_rooms_take_turns():
+    async def run():
+        controller = _controller()
+        holder = await controller.acquire("owner", "busy")
+        order: list[str] = []
+
+        async def wait(user: str, room: str) -> None:
+            ticket = await controller.acquire(user, room)
+            order.append(room)
+            ticket.release()
+
+        tasks = [
+            asyncio.create_task(wait("a", "busy")),
+            asyncio.create_task(wait("b", "busy")),
+            asyncio.create_task(wait("c", "quiet")),
+        ]
+        await asyncio.sleep(0)
+        holder.release()
+        await asyncio.gather(*tasks)
+        assert order == ["busy", "quiet", "busy"]
+
+    asyncio.run(run())
+
+
+def test_per_user_queue_cap_and_system_exemption():
+    async def run():
+        controller = _controller()
+        holder = await controller.acquire("owner", "r")
+
+        async def use(user: str, room: str, system: bool = False) -> None:
+            ticket = await controller.acquire(user, room, system=system)
+            ticket.release()
+
+        waiters = [asyncio.create_task(use("u", "r")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("u", "r")
+        assert rejected.value.status_code == 429
+
+        system = [asyncio.create_task(use("system", "system", system=True)) for _ in range(4)]
+        await asyncio.sleep(0)
+        assert controller.snapshot()["queued"] == 6
+
+        holder.release()
+        await asyncio.gather(*waiters, *system)
+        assert controller.snapshot()["active"] == 0
+
+    asyncio.run(run())
+
+
+def test_queue_timeout_releases_nothing_it_did_not_get():
+    async def run():
+        controller = _controller(queue_timeout_seconds=0.01)
+        holder = await controller.acquire("owner", "r")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("u", "r")
+        assert rejected.value.detail == "ollama_queue_timeout"
+        holder.release()
+        snapshot = controller.snapshot()
+        assert snapshot["active"] == 0
+        assert snapshot["queued"] == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        controller = _controller()
+        holder = await controller.acquire("owner", "r")
+        waiter = asyncio.create_task(controller.acquire("u", "r"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        holder.release()
+        assert controller.snapshot()["active"] == 0
+        assert controller.snapshot()["queued"] == 0
+
+    asyncio.run(run())
+
+
+def _request(headers: dict[str, str], user_id: str | None = "user-1") -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+            "client": ("10.0.0.1", 1234),
+            "session": {"user_id": user_id} if user_id else {},
+        }
+    )
+
+
+def test_malformed_room_header_falls_back_without_a_query(monkeypatch):
+    def fail(*args):
+        raise AssertionError("room access must not be queried")
+
+    monkeypatch.setattr(ollama_proxy, "_can_use_room", fail)
+    keys = asyncio.run(ollama_proxy._fairness_keys(_request({"X-Class-Room-Id": "not-a-uuid"})))
+    assert keys == ("user-1", "user:user-1")
+
+
+def test_room_header_requires_access(monkeypatch):
+    room = "6f1c2a52-5f44-4d1e-9a53-2f0d8b1b7c11"
+    monkeypatch.setattr(ollama_proxy, "_can_use_room", lambda room_id, user_id: False)
+    assert asyncio.run(ollama_proxy._fairness_keys(_request({"X-Class-Room-Id": room}))) == (
+        "user-1",
+        "user:user-1",
+    )
+    monkeypatch.setattr(ollama_proxy, "_can_use_room", lambda room_id, user_id: True)
+    assert asyncio.run(ollama_proxy._fairness_keys(_request({"X-Class-Room-Id": room}))) == (
+        "user-1",
+        room,
+    )
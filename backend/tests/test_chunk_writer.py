@@ -0,0 +1,113 @@
+import uuid
+
+import psycopg
+from pgvector.psycopg.vector import register_vector_info
+from psycopg.adapt import AdaptersMap, PyFormat, Transformer
+from psycopg.pq import Format
+from psycopg.types import TypeInfo
+
+from app.services import chunk_writer
+from app.services.chunk_writer import ChunkRow, chunk_hash, copy_chunks
+
+
+class _Context:
+    """Adaptation context resembling a connection with pgvector registered."""
+
+    connection = None
+
+    def __init__(self) -> None:
+        self.adapters = AdaptersMap(psycopg.adapters)
+        register_vector_info(self, TypeInfo("vector", 90001, 90002))
+
+
+class _Copy:
+    """Dump rows the way psycopg's binary COPY does, without a server."""
+
+    def __init__(self, context: _Context) -> None:
+        self.context = context
+        self.transformer = Transformer(context)
+        self.rows: list[list[bytes | None]] = []
+        self.sql = None
+
+    def set_types(self, types: list[str]) -> None:
+        oids = [self.context.adapters.types[name].oid for name in types]
+        self.transformer.set_dumper_types(oids, Format.BINARY)
+
+    def write_row(self, row: tuple) -> None:
+        self.rows.append(self.transformer.dump_sequence(row, [PyFormat.BINARY] * len(row)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Cursor:
+    def __init__(self, copy: _Copy) -> None:
+        self._copy = copy
+
+    def copy(self, sql: str) -> _Copy:
+        self._copy.sql = sql
+        return self._copy
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Connection:
+    def __init__(self) -> None:
+        self.copy = _Copy(_Context())
+
+    def cursor(self) -> _Cursor:
+        return _Cursor(self.copy)
+
+
+def test_copy_chunks_dumps_rows_in_binary(monkeypatch):
+    connection = _Connection()
+    counted: list[tuple[str, int]] = []
+    monkeypatch.setattr(chunk_writer, "_driver_connection", lambda db: connection)
+    monkeypatch.setattr(
+        chunk_writer, "add_chunk_count", lambda db, library_id, n: counted.append((library_id, n))
+    )
+
+    document_id = str(uuid.uuid4())
+    chunk_id = str(uuid.uuid4())
+    rows = [
+        ChunkRow(document_id=document_id, chunk_index=0, content="first", embedding=[1.0, 2.0]),
+        ChunkRow(
+            document_id=document_id,
+            chunk_index=1,
+            content="second",
+            embedding=[0.5, 0.25],
+            token_count=2,
+            meta={"page": 3},
+            id=chunk_id,
+        ),
+    ]
+
+    assert copy_chunks(object(), "lib-1", iter(rows)) == 2
+    assert counted == [("lib-1", 2)]
+    assert "FORMAT BINARY" in connection.copy.sql
+
+    first, second = connection.copy.rows
+    assert uuid.UUID(bytes=bytes(first[0])).version == 4
+    assert first[1] == uuid.UUID(document_id).bytes
+    assert first[5] is None
+    assert bytes(first[6]) == chunk_hash("first").encode()
+    assert bytes(first[7]) == b"\x01{}"
+    assert second[0] == uuid.UUID(chunk_id).bytes
+    assert bytes(second[2]) == (1).to_bytes(4, "big")
+    assert bytes(second[3]) == b"second"
+    assert bytes(second[7]) == b'\x01{"page": 3}'
+
+
+def test_copy_chunks_with_no_rows_counts_nothing(monkeypatch):
+    counted: list[int] = []
+    monkeypatch.setattr(chunk_writer, "_driver_connection", lambda db: _Connection())
+    monkeypatch.setattr(chunk_writer, "add_chunk_count", lambda db, library_id, n: counted.append(n))
+    assert copy_chunks(object(), "lib-1", []) == 0
+    assert counted == [0]
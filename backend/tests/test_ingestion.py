@@ -0,0 +1,110 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.admission import AdmissionRejected
+from app.services import ingestion
+from app.services.ingestion import TokenChunker
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Pin the fallback tokenizer so expectations do not depend on tiktoken.
+    monkeypatch.setattr(ingestion, "tiktoken", None)
+
+
+def _contents(chunker: TokenChunker, blocks: list[str]) -> list[str]:
+    return [chunk.content for chunk in chunker.chunks(blocks)]
+
+
+def test_windows_overlap_and_keep_block_separators():
+    chunker = TokenChunker(4, 1)
+    assert _contents(chunker, ["alpha beta", " gamma delta epsilon"]) == [
+        "alpha beta gamma delta",
+        "delta epsilon",
+    ]
+    assert _contents(chunker, ["alpha beta\n", "gamma delta"]) == ["alpha beta\ngamma delta"]
+
+
+def test_words_split_across_blocks_are_rejoined():
+    assert _contents(TokenChunker(8, 0), ["one tw", "o three"]) == ["one two three"]
+
+
+def test_indexes_are_dense_and_tail_is_not_repeated():
+    chunks = list(TokenChunker(3, 1).chunks(["a b c d e"]))
+    assert [chunk.index for chunk in chunks] == [0, 1]
+    assert [chunk.content for chunk in chunks] == ["a b c", "c d e"]
+    assert [chunk.token_count for chunk in chunks] == [3, 3]
+
+
+def test_blank_input_yields_nothing():
+    assert _contents(TokenChunker(4, 1), ["", "   \n\n"]) == []
+
+
+def test_overlap_must_be_smaller_than_window():
+    with pytest.raises(ValueError):
+        TokenChunker(4, 4)
+
+
+def _upstream_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://ollama/api/embed")
+    return httpx.HTTPStatusError(
+        "upstream", request=request, response=httpx.Response(status_code, request=request)
+    )
+
+
+def _embed_sequence(monkeypatch, outcomes: list) -> list[float]:
+    delays: list[float] = []
+
+    async def embed_texts(texts):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr(ingestion, "embed_texts", embed_texts)
+    monkeypatch.setattr(ingestion.asyncio, "sleep", sleep)
+    return delays
+
+
+def test_embed_retries_admission_and_transient_errors(monkeypatch):
+    delays = _embed_sequence(
+        monkeypatch,
+        [
+            AdmissionRejected(429, "ollama_queue_full", retry_after=3),
+            httpx.ConnectError("refused"),
+            _upstream_error(503),
+            [[0.5]],
+        ],
+    )
+    assert asyncio.run(ingestion._embed_with_retry(["text"])) == [[0.5]]
+    base = ingestion.get_settings().ingest_embed_retry_seconds
+    assert delays == [max(3.0, base), base * 2, base * 4]
+
+
+def test_embed_gives_up_on_permanent_errors(monkeypatch):
+    delays = _embed_sequence(monkeypatch, [_upstream_error(400)])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(ingestion._embed_with_retry(["text"]))
+    assert delays == []
+
+
+def test_embed_gives_up_after_the_last_attempt(monkeypatch):
+    attempts = ingestion.get_settings().ingest_embed_attempts
+    delays = _embed_sequence(monkeypatch, [httpx.ReadTimeout("slow")] * attempts)
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(ingestion._embed_with_retry(["text"]))
+    assert len(delays) == attempts - 1
+
+
+def test_running_ingest_goes_stale(monkeypatch):
+    monkeypatch.setattr(ingestion.time, "time", lambda: 10_000.0)
+    stale = ingestion.get_settings().ingest_stale_seconds
+    assert ingestion.ingest_running({"status": "running", "heartbeat_at": 10_000 - 5})
+    assert not ingestion.ingest_running({"status": "running", "heartbeat_at": 10_000 - stale})
+    assert not ingestion.ingest_running({"status": "running"})
+    assert not ingestion.ingest_running({"status": "failed", "heartbeat_at": 10_000})
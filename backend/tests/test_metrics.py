@@ -0,0 +1,14 @@
+from app.core.metrics import ewma, percentile_ms
+
+
+def test_percentile_ms_uses_nearest_rank_in_milliseconds():
+    samples = [i / 1000 for i in range(1, 101)]
+    assert percentile_ms(samples, 0.50) == 51.0
+    assert percentile_ms(samples, 0.99) == 100.0
+    assert percentile_ms([0.25], 0.95) == 250.0
+    assert percentile_ms([], 0.5) is None
+
+
+def test_ewma_is_seeded_by_the_first_sample():
+    assert ewma(None, 2.0) == 2.0
+    assert ewma(2.0, 4.0, alpha=0.5) == 3.0
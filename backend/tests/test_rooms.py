@@ -0,0 +1,121 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy.dialects import postgresql
+
+from app.api import rooms
+from app.db.models import ClassMessage
+
+ROOM = "0b6f5c1e-4a7d-4c55-9a0f-3e2d1c0b9a88"
+MESSAGE = "5d0c7f3a-1b2e-4f6a-8c9d-0e1f2a3b4c5d"
+# The postgresql dialect renders UUID literals as bare hex.
+MESSAGE_SQL = f"'{uuid.UUID(MESSAGE).hex}'"
+
+
+def _sql(statement) -> str:
+    compiled = statement.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    return " ".join(str(compiled).split())
+
+
+def test_reply_counts_are_grouped_without_recursion():
+    sql = _sql(rooms._reply_count_statement([MESSAGE]))
+    assert "RECURSIVE" not in sql
+    assert (
+        f"WHERE class_message.thread_root_id IN ({MESSAGE_SQL}) "
+        "GROUP BY class_message.thread_root_id"
+    ) in sql
+    assert (
+        f"WHERE class_message.parent_id IN ({MESSAGE_SQL}) AND class_message.thread_depth > 1 "
+        "GROUP BY class_message.parent_id"
+    ) in sql
+
+
+def test_thread_page_seeks_on_the_thread_root_index():
+    root = ClassMessage(id=MESSAGE, class_room_id=ROOM)
+    sql = _sql(rooms._thread_page_statement(root, 4, (1700, MESSAGE), 20))
+    assert "RECURSIVE" not in sql
+    assert f"class_message.thread_root_id = {MESSAGE_SQL}" in sql
+    assert "class_message.thread_depth <= 4" in sql
+    assert f"(class_message.created_at, class_message.id) > (1700, {MESSAGE_SQL})" in sql
+    assert sql.endswith("ORDER BY class_message.created_at, class_message.id LIMIT 21")
+
+
+def test_first_thread_page_has_no_cursor():
+    root = ClassMessage(id=str(uuid.uuid4()), class_room_id=ROOM)
+    sql = _sql(rooms._thread_page_statement(root, 32, None, 100))
+    assert "(class_message.created_at, class_message.id) >" not in sql
+    assert sql.endswith("LIMIT 101")
+
+
+def _cursor(created_at: int, message_id: str) -> str:
+    return rooms._encode_cursor(ClassMessage(created_at=created_at, id=message_id))
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert rooms._decode_cursor(_cursor(1700, MESSAGE)) == (1700, MESSAGE)
+    for bad in ("not-a-cursor", _cursor(1700, "not-a-uuid")):
+        with pytest.raises(HTTPException) as rejected:
+            rooms._decode_cursor(bad)
+        assert rejected.value.detail == "invalid_cursor"
+
+
+def test_newest_message_page_reads_backwards_from_the_end():
+    sql = _sql(rooms._message_page_statement(ROOM, 50, None, None))
+    assert "(class_message.created_at, class_message.id) <" not in sql
+    assert sql.endswith("ORDER BY class_message.created_at DESC, class_message.id DESC LIMIT 51")
+
+
+def test_message_page_before_cursor_seeks_backwards():
+    sql = _sql(rooms._message_page_statement(ROOM, 50, _cursor(1700, MESSAGE), None))
+    assert f"(class_message.created_at, class_message.id) < (1700, {MESSAGE_SQL})" in sql
+    assert sql.endswith("ORDER BY class_message.created_at DESC, class_message.id DESC LIMIT 51")
+
+
+def test_message_page_after_cursor_seeks_forwards():
+    sql = _sql(rooms._message_page_statement(ROOM, 10, None, _cursor(1700, MESSAGE)))
+    assert f"(class_message.created_at, class_message.id) > (1700, {MESSAGE_SQL})" in sql
+    assert sql.endswith("ORDER BY class_message.created_at ASC, class_message.id ASC LIMIT 11")
+
+
+def test_message_page_trims_the_probe_row_and_sets_cursors():
+    newest, middle, oldest = (
+        ClassMessage(created_at=created_at, id=str(uuid.uuid4())) for created_at in (3, 2, 1)
+    )
+    response = Response()
+    page = rooms._message_page([newest, middle, oldest], 2, None, None, response)
+    assert page == [newest, middle]
+    assert response.headers["X-Cursor-Before"] == rooms._encode_cursor(middle)
+    assert response.headers["X-Cursor-After"] == rooms._encode_cursor(newest)
+
+    # Forward pages come back oldest first and are flipped to newest first.
+    response = Response()
+    page = rooms._message_page([oldest, middle], 2, None, _cursor(0, MESSAGE), response)
+    assert page == [middle, oldest]
+    assert response.headers["X-Cursor-After"] == rooms._encode_cursor(middle)
+
+
+def test_room_page_is_cut_before_the_per_room_subqueries():
+    sql = _sql(rooms._room_page_statement("user-1", 20, _cursor(1700, MESSAGE), True))
+    page = sql[sql.index("FROM (SELECT class_room.id AS id") : sql.index(") AS page")]
+    assert f"(class_room.created_at, class_room.id) < (1700, {MESSAGE_SQL})" in page
+    assert page.endswith("ORDER BY class_room.created_at DESC, class_room.id DESC LIMIT 21")
+    assert "LEFT OUTER JOIN LATERAL" in sql
+    assert "AS unread_count" in sql
+    assert sql.endswith("ORDER BY page.created_at DESC, page.id DESC")
+
+
+def test_room_page_skips_unread_counts_served_from_cache():
+    sql = _sql(rooms._room_page_statement("user-1", 20, None, False))
+    assert "unread_count" not in sql
+    assert "(class_room.created_at, class_room.id) <" not in sql
+
+
+def test_read_position_is_clamped_to_now(monkeypatch):
+    monkeypatch.setattr(rooms, "utc_now_ms", lambda: 5_000)
+    assert rooms._read_position(None) == 5_000
+    assert rooms._read_position(rooms.ReadIn()) == 5_000
+    assert rooms._read_position(rooms.ReadIn(last_read_at=4_000)) == 4_000
+    assert rooms._read_position(rooms.ReadIn(last_read_at=2**62)) == 5_000
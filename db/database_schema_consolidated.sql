@@ -196,6 +196,8 @@ CREATE TRIGGER trg_class_room_updated_at
 CREATE UNIQUE INDEX IF NOT EXISTS ux_class_room_class_name
   ON class_room (class_id, lower(name));
 CREATE INDEX IF NOT EXISTS idx_class_room_class ON class_room(class_id);
+CREATE INDEX IF NOT EXISTS idx_class_room_creator_created
+  ON class_room(created_by_user_id, created_at DESC);
 
 CREATE TABLE IF NOT EXISTS class_room_member (
   class_room_id uuid NOT NULL REFERENCES class_room(id) ON DELETE CASCADE,
@@ -203,6 +205,7 @@ CREATE TABLE IF NOT EXISTS class_room_member (
   created_at bigint NOT NULL DEFAULT now_ms(),
   PRIMARY KEY (class_room_id, user_id)
 );
+CREATE INDEX IF NOT EXISTS idx_class_room_member_user ON class_room_member(user_id);
 
 CREATE TABLE IF NOT EXISTS class_read_receipt (
   class_room_id uuid NOT NULL REFERENCES class_room(id) ON DELETE CASCADE,
@@ -291,6 +294,7 @@ CREATE TABLE IF NOT EXISTS library (
   data jsonb DEFAULT '{}'::jsonb,
   meta jsonb DEFAULT '{}'::jsonb,
   access_control jsonb DEFAULT '{}'::jsonb,
+  chunk_count bigint NOT NULL DEFAULT 0,
   created_at bigint NOT NULL DEFAULT now_ms(),
   updated_at bigint NOT NULL DEFAULT now_ms()
 );
@@ -305,6 +309,7 @@ CREATE TABLE IF NOT EXISTS library_document (
   source text,
   uri text,
   title text,
+  content_hash text,
   meta jsonb DEFAULT '{}'::jsonb,
   created_at bigint NOT NULL DEFAULT now_ms(),
   updated_at bigint NOT NULL DEFAULT now_ms()
@@ -321,6 +326,7 @@ CREATE TABLE IF NOT EXISTS document_chunk (
   content text NOT NULL,
   embedding vector(768) NOT NULL,
   token_count integer,
+  content_hash text,
   meta jsonb,
   created_at bigint NOT NULL DEFAULT now_ms(),
   content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
@@ -329,6 +335,12 @@ CREATE INDEX IF NOT EXISTS idx_document_chunk_doc ON document_chunk(document_id)
 CREATE UNIQUE INDEX IF NOT EXISTS idx_document_chunk_unique ON document_chunk(document_id, chunk_index);
 CREATE INDEX IF NOT EXISTS idx_document_chunk_embedding_hnsw
   ON document_chunk USING hnsw (embedding vector_cosine_ops);
+-- Opt-in quantized alternatives (EMBEDDING_INDEX_MODE=halfvec|binary, migration 0007)
+-- replace the index above; retrieval rescores their candidates on full vectors:
+--   CREATE INDEX idx_document_chunk_embedding_halfvec_hnsw
+--     ON document_chunk USING hnsw ((embedding::halfvec(768)) halfvec_cosine_ops);
+--   CREATE INDEX idx_document_chunk_embedding_binary_hnsw
+--     ON document_chunk USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops);
 CREATE INDEX IF NOT EXISTS idx_document_chunk_tsv_gin
   ON document_chunk USING gin (content_tsv);
 
@@ -443,6 +455,8 @@ CREATE TABLE IF NOT EXISTS class_message (
   user_id uuid NOT NULL REFERENCES user_profile(id) ON DELETE CASCADE,
   class_room_id uuid NOT NULL REFERENCES class_room(id) ON DELETE CASCADE,
   parent_id uuid REFERENCES class_message(id) ON DELETE CASCADE,
+  thread_root_id uuid REFERENCES class_message(id) ON DELETE CASCADE,
+  thread_depth integer NOT NULL DEFAULT 0,
   target_user_id uuid REFERENCES user_profile(id) ON DELETE CASCADE,
   content text NOT NULL,
   data jsonb DEFAULT '{}'::jsonb,
@@ -450,7 +464,14 @@ CREATE TABLE IF NOT EXISTS class_message (
   created_at bigint NOT NULL DEFAULT now_ms(),
   updated_at bigint NOT NULL DEFAULT now_ms()
 );
-CREATE INDEX IF NOT EXISTS idx_class_message_room ON class_message(class_room_id);
+CREATE INDEX IF NOT EXISTS idx_class_message_room_created_id
+  ON class_message(class_room_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_class_message_parent_created_id
+  ON class_message(parent_id, created_at, id)
+  WHERE parent_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_class_message_thread_root_created_id
+  ON class_message(thread_root_id, created_at, id)
+  WHERE thread_root_id IS NOT NULL;
 CREATE TRIGGER trg_class_message_updated_at
   BEFORE UPDATE ON class_message
   FOR EACH ROW EXECUTE FUNCTION set_updated_at();
@@ -11,14 +11,14 @@ CREATE INDEX IF NOT EXISTS idx_user_chat_user_pinned
   WHERE archived = false AND pinned = true;
 
 -- Class messages: room timeline, author lookups, threaded replies
-CREATE INDEX IF NOT EXISTS idx_class_message_room_created
-  ON class_message (class_room_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_class_message_room_created_id
+  ON class_message (class_room_id, created_at DESC, id DESC);
 
 CREATE INDEX IF NOT EXISTS idx_class_message_user
   ON class_message (user_id, created_at DESC);
 
-CREATE INDEX IF NOT EXISTS idx_class_message_parent
-  ON class_message (parent_id, created_at)
+CREATE INDEX IF NOT EXISTS idx_class_message_parent_created_id
+  ON class_message (parent_id, created_at, id)
   WHERE parent_id IS NOT NULL;
 
 -- Group membership lookups by user
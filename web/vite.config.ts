@@ -43,6 +43,8 @@ export default defineConfig(({ mode }) => {
           changeOrigin: true,
           secure: false,
           ws: false,
+          // Pass X-Forwarded-For so login throttling sees the real client IP.
+          xfwd: true,
           rewrite: rewriteApiPath,
         },
         '/ollama': {